@@ -0,0 +1,116 @@
+"""Teste de carga local da API (nutricional.api).
+
+Dispara requisições concorrentes contra um endpoint e mede vazão e latências.
+Com ``--start`` a própria API é iniciada em um subprocesso.
+
+    python benchmarks/api_load.py paciente.csv --start --endpoint /metrics -n 5000 -c 50
+    python benchmarks/api_load.py paciente.csv --url http://127.0.0.1:8000 --endpoint /report -n 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(values, q):
+    """Percentil ``q`` (0-100) de uma lista já ordenada"""
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def wait_until_ready(url, timeout=30):
+    client = AsyncHTTPClient()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.fetch(f'{url}/health')
+            return
+        except (ConnectionError, HTTPClientError, OSError):
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"A API não respondeu em {url}")
+
+
+async def run_load(url, endpoint, body, requests, concurrency):
+    """Executa ``requests`` POSTs com até ``concurrency`` simultâneos"""
+    AsyncHTTPClient.configure(None, max_clients=concurrency)
+    client = AsyncHTTPClient()
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                await client.fetch(f'{url}{endpoint}', method='POST', body=body, request_timeout=120)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'endpoint': endpoint,
+        'requisicoes': requests,
+        'concorrencia': concurrency,
+        'erros': errors,
+        'segundos': elapsed,
+        'req_por_segundo': (requests - errors) / elapsed,
+        'latencia_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'media': statistics.mean(latencies) if latencies else None,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga da API do Dashboard Nutricional")
+    parser.add_argument('csv', help="Arquivo CSV de paciente enviado no corpo das requisições")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--endpoint', default='/metrics', choices=['/parse', '/metrics', '/report'])
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    parser.add_argument('-c', '--concurrency', type=int, default=50)
+    parser.add_argument('--start', action='store_true', help="Inicia a API em um subprocesso")
+    args = parser.parse_args(argv)
+
+    body = Path(args.csv).read_bytes()
+    server = None
+    if args.start:
+        port = args.url.rsplit(':', 1)[-1]
+        server = subprocess.Popen([sys.executable, '-m', 'nutricional.api', '--port', port], cwd=ROOT)
+    try:
+        async def run():
+            await wait_until_ready(args.url)
+            return await run_load(args.url, args.endpoint, body, args.requests, args.concurrency)
+
+        result = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(result, indent=2))
+    return 1 if result['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
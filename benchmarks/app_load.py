@@ -0,0 +1,298 @@
+"""Teste de carga local do dashboard (Streamlit).
+
+Simula sessões concorrentes pelo ``streamlit.testing`` (AppTest), em threads
+do mesmo processo, como as sessões de um servidor: caches, fila de
+relatórios e banco de pacientes são compartilhados. Cada sessão abre o app,
+envia o arquivo de um paciente, percorre as abas ``--rounds`` vezes e,
+com ``--pdf``, gera o relatório e espera o download ficar disponível.
+Mede a vazão, as latências de cada ação (p50/p95/p99), a memória do
+processo por sessão e os tempos por etapa de ``nutricional.timing``.
+
+    python benchmarks/app_load.py --sessions 20 --rounds 3
+    python benchmarks/app_load.py pacientes/ --sessions 50 --concurrency 10 --pdf
+    python benchmarks/app_load.py --sessions 20 --same-patient   # mesmo paciente em todas (caches)
+
+Sem arquivos, usa pacientes sintéticos (um por sessão). Uma sessão de
+aquecimento roda antes da medição, para que imports e compilação do script
+não entrem nas latências. Sai com código 1 se alguma ação falhar ou se o
+p95 das interações passar de ``--max-p95-ms``.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from api_load import percentile
+from synthetic import generate_patients
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / 'dashboard_nutricional.py'
+sys.path.insert(0, str(ROOT))
+
+PDF_BUTTON = "📄 Gerar Relatório PDF"
+PDF_DOWNLOAD = "⬇️ Baixar Relatório PDF"
+
+# Intervalo entre os reruns enquanto o relatório é gerado (o fragmento do app não roda no AppTest)
+PDF_POLL_SECONDS = 0.2
+
+MIME_TYPES = {'.csv': 'text/csv', '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'}
+
+
+def share_runtime():
+    """Compartilha o runtime e o script compilado entre as sessões, como no servidor
+
+    O AppTest cria, a cada execução, um runtime simulado (``Runtime._instance``,
+    global) e um ``ScriptCache``, e desfaz o runtime ao final: com várias
+    sessões em threads, uma execução apagaria o runtime de outra, e o script
+    seria recompilado a cada rerun (o ``ast.parse`` concorrente falha no
+    Python 3.11). Aqui o primeiro runtime criado fica para todas as sessões
+    (gerenciadores de mídia e de cache compartilhados), o script é compilado
+    uma vez e o modo de teste fica ligado durante todo o teste de carga.
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    class KeepFirstInstance(type(Runtime)):
+        def __setattr__(cls, name, value):
+            if name != '_instance':
+                super().__setattr__(name, value)
+            elif value is not None and Runtime._instance is None:
+                Runtime._instance = value
+
+    class SharedRuntime(Runtime, metaclass=KeepFirstInstance):
+        pass
+
+    # O AppTest liga ``global.appTest`` só durante cada execução e restaura o
+    # valor anterior ao final, o que desligaria a opção no meio de outra sessão
+    config.set_option('global.appTest', True)
+    shared = ScriptCache()
+    app_test.Runtime = SharedRuntime
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: shared
+
+
+def rss_mb(pid='self'):
+    """Memória residente atual (MB) do processo; sem /proc, o pico do próprio processo"""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if pid == 'self' else 0.0
+
+
+def children_rss_mb():
+    """Memória residente dos processos filhos (pool de processos dos relatórios)"""
+    total = 0.0
+    for children in Path('/proc/self/task').glob('*/children'):
+        for pid in children.read_text().split():
+            total += rss_mb(pid)
+    return total
+
+
+def load_uploads(sources, sessions, same_patient, seed):
+    """Arquivos ``(nome, conteúdo, mime)`` enviados por cada sessão"""
+    if sources:
+        from nutricional.formats import iter_export_files
+
+        files = []
+        for source in sources:
+            files.extend(iter_export_files(source) if Path(source).is_dir() else [source])
+        uploads = [
+            (Path(f).name, Path(f).read_bytes(), MIME_TYPES.get(Path(f).suffix.lower(), 'application/octet-stream'))
+            for f in files
+        ]
+    else:
+        uploads = [(name, raw, 'text/csv')
+                   for name, raw in generate_patients(1 if same_patient else sessions, seed=seed)]
+    if not uploads:
+        raise SystemExit("Nenhum arquivo de paciente encontrado")
+    if same_patient:
+        uploads = uploads[:1]
+    return [uploads[i % len(uploads)] for i in range(sessions)]
+
+
+class Session:
+    """Uma sessão simulada: executa o roteiro e registra a latência de cada ação"""
+
+    def __init__(self, upload, rounds, pdf, think, timeout, record):
+        self.upload = upload
+        self.rounds = rounds
+        self.pdf = pdf
+        self.think = think
+        self.timeout = timeout
+        self.record = record
+        self.app = None
+
+    def action(self, name, func):
+        """Executa e mede uma ação; retorna False se ela falhou"""
+        start = time.perf_counter()
+        error = None
+        try:
+            func()
+            if self.app.exception:
+                error = self.app.exception[0].message
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        self.record(name, (time.perf_counter() - start) * 1000, error)
+        if self.think:
+            time.sleep(self.think)
+        return error is None
+
+    def generate_pdf(self):
+        """Pede o relatório e refaz a renderização até o download aparecer"""
+        next(b for b in self.app.button if b.label == PDF_BUTTON).click().run()
+        deadline = time.monotonic() + self.timeout
+        while not any(d.proto.label == PDF_DOWNLOAD for d in self.app.get('download_button')):
+            if self.app.exception or self.app.error:
+                raise RuntimeError(self.app.error[0].value if self.app.error else "exceção no app")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"relatório não ficou pronto em {self.timeout:.0f}s")
+            time.sleep(PDF_POLL_SECONDS)
+            self.app.run()
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(str(APP), default_timeout=self.timeout)
+        if not self.action('abrir', self.app.run):
+            return self
+        if not self.action('upload', lambda: self.app.sidebar.file_uploader[0].set_value(self.upload).run()):
+            return self
+        views = self.app.radio(key='active_tab').options
+        for _ in range(self.rounds):
+            for view in views:
+                if not self.action(f'aba {view}', lambda: self.app.radio(key='active_tab').set_value(view).run()):
+                    return self
+        if self.pdf:
+            self.action('pdf', self.generate_pdf)
+        return self
+
+
+def latency_summary(values):
+    values = sorted(values)
+    return {
+        'n': len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'media': statistics.mean(values) if values else None,
+        'max': values[-1] if values else None,
+    }
+
+
+def run_load(uploads, concurrency, rounds, pdf, think, timeout, warmup):
+    """Executa as sessões com até ``concurrency`` simultâneas e resume as medições"""
+    from nutricional.cache import figure_cache, image_cache, intake_cache, parse_cache, report_cache
+    from nutricional.timing import stage_timer
+
+    share_runtime()
+    if warmup is not None:
+        Session(warmup, 1, pdf, 0, timeout, lambda *args: None).run()
+    stage_timer.clear()
+    base_mb = rss_mb()
+
+    samples, errors = [], []
+    lock = threading.Lock()
+
+    def record(name, ms, error):
+        with lock:
+            samples.append((name, ms))
+            if error is not None:
+                errors.append({'acao': name, 'erro': error})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        sessions = list(pool.map(
+            lambda upload: Session(upload, rounds, pdf, think, timeout, record).run(), uploads
+        ))
+    elapsed = time.perf_counter() - start
+    # As sessões continuam vivas (estado e última renderização) na medição da memória
+    final_mb = rss_mb()
+
+    actions = {}
+    for name, ms in samples:
+        actions.setdefault(name, []).append(ms)
+    interactive = [ms for name, ms in samples if name != 'pdf']
+    result = {
+        'sessoes': len(sessions),
+        'concorrencia': concurrency,
+        'acoes': len(samples),
+        'erros': len(errors),
+        'segundos': elapsed,
+        'acoes_por_segundo': len(samples) / elapsed,
+        'sessoes_por_minuto': len(sessions) / elapsed * 60,
+        'latencia_ms': {
+            'interacoes': latency_summary(interactive),
+            **{name: latency_summary(values) for name, values in sorted(actions.items())},
+        },
+        'memoria_mb': {
+            'base': base_mb,
+            'final': final_mb,
+            'pico': max(final_mb, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024),
+            'por_sessao': (final_mb - base_mb) / len(sessions),
+            'processos_filhos': children_rss_mb(),
+        },
+        'caches': {
+            'parse': parse_cache.stats(),
+            'figuras': figure_cache.stats(),
+            'imagens': image_cache.stats(),
+            'consumo': intake_cache.stats(),
+            'relatorios': report_cache.stats(),
+        },
+        'etapas': stage_timer.summary(),
+        'exemplos_de_erro': errors[:5],
+    }
+    del sessions
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com sessões simuladas (AppTest)")
+    parser.add_argument('sources', nargs='*', help="Arquivos ou diretórios de pacientes (padrão: sintéticos)")
+    parser.add_argument('-s', '--sessions', type=int, default=10, help="Número de sessões simuladas")
+    parser.add_argument('-c', '--concurrency', type=int, default=None, help="Sessões simultâneas (padrão: todas)")
+    parser.add_argument('--rounds', type=int, default=2, help="Voltas pelas abas em cada sessão")
+    parser.add_argument('--pdf', action='store_true', help="Cada sessão também gera o relatório PDF")
+    parser.add_argument('--same-patient', action='store_true', help="Todas as sessões com o mesmo paciente")
+    parser.add_argument('--think-ms', type=float, default=0, help="Pausa após cada ação (tempo do usuário)")
+    parser.add_argument('--timeout', type=float, default=120, help="Limite (s) de cada renderização e do PDF")
+    parser.add_argument('--no-warmup', action='store_true', help="Não executa a sessão de aquecimento")
+    parser.add_argument('--max-p95-ms', type=float, default=None, help="Limite para o p95 das interações")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # O banco de pacientes do teste não se mistura ao da instalação (lido no import de nutricional.store)
+        os.environ.setdefault('NUTRICIONAL_STORE', str(Path(tmp) / 'pacientes.db'))
+        uploads = load_uploads(args.sources, args.sessions, args.same_patient, args.seed)
+        warmup = None if args.no_warmup else next(
+            (name, raw, 'text/csv') for name, raw in generate_patients(1, seed=args.seed + 1)
+        )
+        result = run_load(uploads, args.concurrency or args.sessions, args.rounds, args.pdf,
+                          args.think_ms / 1000, args.timeout, warmup)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    failures = []
+    if result['erros']:
+        failures.append(f"{result['erros']} ações falharam")
+    p95 = result['latencia_ms']['interacoes']['p95']
+    if args.max_p95_ms is not None and p95 is not None and p95 > args.max_p95_ms:
+        failures.append(f"p95 das interações acima de {args.max_p95_ms:.0f} ms")
+    for failure in failures:
+        print(f"FALHA: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
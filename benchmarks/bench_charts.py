@@ -0,0 +1,43 @@
+"""Construção das figuras do paciente (sem o cache de figuras) e serialização para JSON.
+
+Os gráficos são por paciente; a coorte de 1.000 pacientes (--large) mede o
+custo de construir as figuras de todos eles. Não há cenário de 100.000: o
+custo é linear, 100 vezes o de 1.000.
+"""
+import importlib.util
+
+import pytest
+from conftest import ROOT, run
+
+CHARTS = ['anthropometry', 'biochemical', 'mna_radar', 'nutrition_goals']
+SIZES = [1, pytest.param(1000, marks=pytest.mark.large)]
+
+
+@pytest.fixture(scope='module')
+def dashboard_module():
+    spec = importlib.util.spec_from_file_location('dashboard_nutricional', ROOT / 'dashboard_nutricional.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('chart', CHARTS)
+def test_chart_builder(benchmark, dashboard_module, sections, chart, size):
+    dashboards = []
+    for patient in sections(size):
+        dashboard = dashboard_module.NutritionDashboard()
+        dashboard.data = patient
+        dashboards.append(dashboard)
+    builder = f'create_{chart}_chart'
+    figures = run(benchmark, lambda: [getattr(d, builder)() for d in dashboards], size)
+    assert all(fig is not None for fig in figures)
+
+
+@pytest.mark.parametrize('chart', CHARTS)
+def test_chart_serialization(benchmark, dashboard_module, sections, chart):
+    dashboard = dashboard_module.NutritionDashboard()
+    dashboard.data = sections(1)[0]
+    fig = getattr(dashboard, f'create_{chart}_chart')()
+    spec = benchmark(fig.to_json)
+    assert spec
@@ -0,0 +1,109 @@
+"""Classificação de IMC, MNA e exames: por paciente e vetorizada na coorte."""
+import numpy as np
+import pytest
+from conftest import SIZES, run
+
+from nutricional.classification import LAB_NORMAL, MISSING, default_engine
+from nutricional.cohort import compute_cohort_metrics
+from nutricional.patient import PatientData
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_patient_metrics(benchmark, sections, size):
+    patients = sections(size)
+    result = run(benchmark, lambda: [PatientData(s).get_metrics() for s in patients], size)
+    assert all(metrics['imc_classificacao'] for metrics in result)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_cohort_metrics(benchmark, sections, cohort_table, size):
+    table = cohort_table(size)
+    metrics = run(benchmark, lambda: compute_cohort_metrics(table), size)
+    # A classificação vetorizada é a mesma de cada paciente
+    expected = [PatientData(s).get_metrics() for s in sections(size)]
+    assert metrics['imc_classificacao'].tolist() == [m['imc_classificacao'] for m in expected]
+    assert metrics['mna_classificacao'].tolist() == [m['mna_classificacao'] for m in expected]
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_imc_mna_bands(benchmark, size):
+    engine = default_engine()
+    rng = np.random.default_rng(0)
+    imc = rng.normal(25, 5, size)
+    mna = rng.uniform(0, 30, size)
+    codes = run(benchmark, lambda: (engine.imc.codes(imc), engine.mna.codes(mna)), size)
+    assert len(codes[0]) == size
+
+
+# Regras anteriores ao motor, reproduzidas como if/elif para conferência
+def legacy_imc(imc):
+    if imc < 18.5:
+        return 'Baixo peso', '#dc3545'
+    elif 18.5 <= imc < 25:
+        return 'Normal', '#28a745'
+    elif 25 <= imc < 30:
+        return 'Sobrepeso', '#fd7e14'
+    else:
+        return 'Obesidade', '#dc3545'
+
+
+def legacy_mna(score):
+    if score >= 24:
+        return 'Estado nutricional normal'
+    elif score >= 17:
+        return 'Risco de desnutrição'
+    else:
+        return 'Desnutrido'
+
+
+LEGACY_LABS = {
+    'Glicose': ('max', 100),
+    'Colesterol': ('max', 200),
+    'HDL': ('min', 40),
+    'LDL': ('max', 100),
+    'Albumina': ('min', 3.5),
+    'Hemoglobina': ('min', 14),
+}
+
+
+def legacy_altered(value, kind, limit):
+    # Exame ausente não é considerado alterado
+    if value is None or np.isnan(value):
+        return False
+    return value > limit if kind == 'max' else value < limit
+
+
+def around(*edges, eps=1e-9):
+    """Limites das faixas, vizinhos imediatos e valores a ±eps de cada um"""
+    values = [0.0, -1.0, 1e6]
+    for edge in edges:
+        values += [edge, edge - eps, edge + eps, np.nextafter(edge, -np.inf), np.nextafter(edge, np.inf)]
+    return values
+
+
+def test_imc_matches_legacy_bands():
+    engine = default_engine()
+    values = around(18.5, 25, 30)
+    codes = engine.imc.codes(values)
+    assert [(engine.imc.labels[c], engine.imc.colors[c]) for c in codes] == [legacy_imc(v) for v in values]
+    assert [engine.imc.classify_one(v) for v in values] == [legacy_imc(v) for v in values]
+    assert engine.imc.classify_one(np.nan) == (None, None)
+    assert engine.imc.codes([None, np.nan]).tolist() == [MISSING, MISSING]
+
+
+def test_mna_matches_legacy_bands():
+    engine = default_engine()
+    values = around(17, 24) + [30.0]
+    assert engine.mna.labels[engine.mna.codes(values)].tolist() == [legacy_mna(v) for v in values]
+    assert engine.mna.codes([None, np.nan]).tolist() == [MISSING, MISSING]
+
+
+@pytest.mark.parametrize('marker', list(LEGACY_LABS))
+def test_lab_matches_legacy_limit(marker):
+    engine = default_engine()
+    kind, limit = LEGACY_LABS[marker]
+    values = around(limit) + [None, np.nan]
+    codes = engine.labs[marker].codes(values)
+    altered = (codes != LAB_NORMAL) & (codes != MISSING)
+    assert altered.tolist() == [legacy_altered(v, kind, limit) for v in values]
+    assert engine.lab_reference(marker) == limit
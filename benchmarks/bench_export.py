@@ -0,0 +1,19 @@
+"""Exportação das métricas da coorte em lotes (Parquet e XLSX)."""
+import pytest
+from conftest import SIZES, run
+
+from nutricional.export import export_metrics, split_table
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_export_parquet(benchmark, cohort_table, tmp_path, size):
+    table = cohort_table(size)
+    total = run(benchmark, lambda: export_metrics(split_table(table), tmp_path / 'metricas.parquet'), size)
+    assert total == size
+
+
+@pytest.mark.parametrize('size', [1, 1000])
+def test_export_xlsx(benchmark, cohort_table, tmp_path, size):
+    table = cohort_table(size)
+    total = run(benchmark, lambda: export_metrics(split_table(table), tmp_path / 'metricas.xlsx'), size)
+    assert total == size
@@ -0,0 +1,77 @@
+"""Leitura de exportações tabulares (Parquet, Arrow IPC, XLSX) na tabela da coorte."""
+import io
+
+import pytest
+from conftest import SIZES, cached, run
+from synthetic import write_table
+
+from nutricional.formats import read_patients, read_table
+
+
+@pytest.fixture(scope='module')
+def exports(sections, tmp_path_factory):
+    """Caminho da exportação por tamanho e extensão, gravada uma vez por módulo"""
+    directory = tmp_path_factory.mktemp('exportacoes')
+
+    def write(size, suffix):
+        path = directory / f'pacientes_{size}{suffix}'
+        write_table(sections(size), path)
+        return path
+    return cached(write)
+
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.arrow'])
+@pytest.mark.parametrize('size', SIZES)
+def test_read_table(benchmark, exports, size, suffix):
+    path = exports(size, suffix)
+    table = run(benchmark, lambda: read_table(path), size)
+    assert len(table) == size
+
+
+@pytest.mark.parametrize('size', [1, 1000])
+def test_read_table_xlsx(benchmark, exports, size):
+    path = exports(size, '.xlsx')
+    table = run(benchmark, lambda: read_table(path), size)
+    assert len(table) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_read_patients_parquet(benchmark, exports, sections, size):
+    path = exports(size, '.parquet')
+    patients = run(benchmark, lambda: read_patients(path), size)
+    assert patients == sections(size)
+
+
+@pytest.mark.parametrize('suffix', ['.parquet', '.arrow', '.feather', '.ipc', '.xlsx'])
+def test_round_trip(exports, sections, suffix):
+    """Cada formato largo devolve as mesmas seções gravadas, do caminho e do upload"""
+    path = exports(1000, suffix)
+    assert read_patients(path) == sections(1000)
+    upload = io.BytesIO(path.read_bytes())
+    upload.name = path.name
+    assert read_patients(upload) == sections(1000)
+
+
+def test_round_trip_arrow_stream(exports, sections, tmp_path):
+    """Arrow IPC no formato stream (sem o rodapé do formato arquivo)"""
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(str(exports(1000, '.arrow')))).read_all()
+    path = tmp_path / 'pacientes.arrow'
+    with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    assert read_patients(path) == sections(1000)
+
+
+def test_round_trip_xlsx_sections(sections, tmp_path):
+    """XLSX por seções: uma planilha por seção com linhas ``campo | valor``"""
+    import xlsxwriter
+
+    patient = sections(1)[0]
+    path = tmp_path / 'paciente.xlsx'
+    with xlsxwriter.Workbook(str(path)) as workbook:
+        for section, values in patient.items():
+            sheet = workbook.add_worksheet(section)
+            for row, (key, value) in enumerate(values.items()):
+                sheet.write_row(row, 0, [key, value])
+    assert read_patients(path) == [patient]
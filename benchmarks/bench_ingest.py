@@ -0,0 +1,72 @@
+"""Importação em massa: leitura e validação por arquivo, em qualquer formato aceito."""
+import zipfile
+
+import pytest
+from conftest import SIZES, run
+from synthetic import write_table
+
+from nutricional.formats import FORMATS, patient_key
+from nutricional.ingest import ingest_chunk, iter_sources, run_ingest, summarize
+from nutricional.store import PatientStore
+
+
+@pytest.fixture(scope='module')
+def export_dir(corpus, sections, tmp_path_factory):
+    """Diretório com CSVs soltos, exportações largas e um ZIP com os dois"""
+    directory = tmp_path_factory.mktemp('importacao')
+    for name, raw in corpus(1000)[:3]:
+        (directory / name).write_bytes(raw)
+    patients = sections(1000)
+    write_table(patients[3:6], directory / 'lote.parquet')
+    write_table(patients[6:8], directory / 'lote.xlsx')
+    write_table(patients[8:10], directory / 'lote.feather')
+    (directory / 'notas.txt').write_text('ignorado')
+    with zipfile.ZipFile(directory / 'pacote.zip', 'w') as archive:
+        for name, raw in corpus(1000)[10:12]:
+            archive.writestr(f'csv/{name}', raw)
+        archive.write(directory / 'lote.parquet', 'tabelas/lote.parquet')
+        archive.write(directory / 'lote.xlsx', 'tabelas/lote.xlsx')
+        archive.writestr('leia-me.txt', 'ignorado')
+    return directory
+
+
+def test_iter_sources_accepts_every_format(export_dir):
+    sources = iter_sources(export_dir)
+    names = [source[1] if isinstance(source, tuple) else source for source in sources]
+    assert all(name.lower().endswith(tuple(FORMATS)) for name in names)
+    assert len(sources) == 3 + 3 + 4
+    assert (str(export_dir / 'pacote.zip'), 'tabelas/lote.xlsx') in sources
+    # Um XLSX indicado diretamente é uma exportação, não um ZIP a percorrer
+    assert iter_sources(export_dir / 'lote.xlsx') == [str(export_dir / 'lote.xlsx')]
+
+
+def test_ingest_every_format(export_dir, sections, tmp_path):
+    store = PatientStore(tmp_path / 'pacientes.db')
+    results = run_ingest(export_dir, store=store, workers=2)
+    patients = sections(1000)
+    expected = 3 + 3 + 2 + 2 + 2 + 3 + 2
+    assert len(results) == expected and not any(result['erro'] for result in results)
+    lines = sorted(r['linha'] for r in results if r['arquivo'].endswith('lote.parquet'))
+    assert lines == [1, 1, 2, 2, 3, 3]
+    # Linhas repetidas (a mesma exportação solta e no ZIP) são gravadas uma vez
+    assert store.count() == expected - 5
+    content_hash, stored = store.get_assessment(patients[4]['ADOS DO PACIENTE']['Número de Registro'])
+    assert (content_hash, stored) == (patient_key(patients[4]), patients[4])
+    summary = summarize(results, 1.0)
+    assert (summary['arquivos'], summary['pacientes'], summary['erros']) == (10, expected, 0)
+
+
+def test_unreadable_export(tmp_path):
+    path = tmp_path / 'quebrado.parquet'
+    path.write_bytes(b'nao e parquet')
+    [(result, row)] = ingest_chunk([str(path)])
+    assert result['erro'] and row is None and result['linha'] is None
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_ingest_parquet(benchmark, sections, tmp_path, size):
+    path = tmp_path / 'pacientes.parquet'
+    write_table(sections(size), path)
+    pairs = run(benchmark, lambda: ingest_chunk([str(path)]), size)
+    assert all(row is not None for _, row in pairs)
+    assert [result['linha'] for result, _ in pairs] == ([None] if size == 1 else list(range(1, size + 1)))
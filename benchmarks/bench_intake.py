@@ -0,0 +1,56 @@
+"""Consumo do registro alimentar por item (7 dias): um paciente e a coorte inteira."""
+import numpy as np
+import pytest
+from conftest import RECORD_DAYS, SIZES, cached, cohort_table_of, run
+
+from nutricional.intake import (
+    cohort_intake, daily_averages, daily_intake, food_table, intake_items, patient_intake,
+)
+from nutricional.record import FOOD_RECORD
+
+
+@pytest.fixture(scope='module')
+def record_table(records):
+    """Tabela da coorte (colunas ``"REGISTRO ALIMENTAR/n"``) por tamanho"""
+    return cached(lambda size: cohort_table_of(records(size)))
+
+
+def test_patient_intake(benchmark, records):
+    sections = records(1)[0]
+    intake = benchmark(lambda: patient_intake(sections))
+    assert len(intake['dias']) == RECORD_DAYS
+
+
+def test_daily_intake(benchmark, records):
+    """Só a média diária, como no resumo da coorte, igual à do detalhamento completo"""
+    sections = records(1)[0]
+    daily = benchmark(lambda: daily_intake(sections))
+    assert np.allclose(daily, patient_intake(sections)['media_diaria'])
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_cohort_intake(benchmark, record_table, size):
+    table = record_table(size)
+    averages = run(benchmark, lambda: cohort_intake(table), size)
+    assert averages['energia_kcal'].notna().all()
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_recompute_daily_averages(benchmark, records, size):
+    """Só o cálculo (busca na tabela, nutrientes e médias), com os itens já separados"""
+    table = food_table()
+    values, patients = [], []
+    for patient, sections in enumerate(records(size)):
+        record = sections[FOOD_RECORD].values()
+        values.extend(record)
+        patients.extend([patient] * len(record))
+    items = intake_items(values, patients=patients, table=table)
+    foods, grams = items['alimento'].cat, items['quantidade_g'].to_numpy()
+    patient_codes, days = items['paciente'].to_numpy(), items['dia'].to_numpy()
+
+    def recompute():
+        codes = table.codes(foods.categories)[foods.codes]
+        return daily_averages(patient_codes, days, table.amounts(codes, grams), size)
+
+    averages = run(benchmark, recompute, size)
+    assert averages.shape == (size, len(table.nutrients))
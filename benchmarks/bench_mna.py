@@ -0,0 +1,46 @@
+"""Pontuação do MNA a partir das respostas: um paciente e a coorte inteira (reclassificação em lote)."""
+import pytest
+from conftest import SIZES, run
+
+from nutricional.classification import DEFAULT_RULES, MISSING, MNA_NORMAL, RuleEngine
+from nutricional.mna import CHECK_DIVERGENT, CHECK_OK, array_columns, score_mna, score_one
+from nutricional.patient import PatientData
+from nutricional.record import PatientRecord, records_to_array
+from nutricional.search import PatientIndex
+
+
+def test_patient_mna(benchmark, sections):
+    patient = PatientData(sections(1)[0])
+    score = benchmark(patient.get_mna_score)
+    assert score['conferencia'] == 'Confere'
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_score_mna(benchmark, sections, size):
+    values = records_to_array(PatientRecord.from_sections(s) for s in sections(size))
+    scores = run(benchmark, lambda: score_mna(array_columns(values), size), size)
+    # Os totais sintéticos são a soma das respostas
+    assert (scores['conferencia'] == CHECK_OK).all()
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_rescore_index(benchmark, sections, size):
+    """Reclassificação de todo o banco após uma mudança de regras, sobre as colunas do índice em memória"""
+    records = [PatientRecord.from_sections(s) for s in sections(size)]
+    index = PatientIndex([{'registro': r.registro, 'nome': r.nome} for r in records], records_to_array(records))
+    engine = RuleEngine({**DEFAULT_RULES, 'mna': {**DEFAULT_RULES['mna'], 'edges': [18, 24]}})
+    scores = run(benchmark, lambda: score_mna(index.columns, size, engine), size)
+    assert len(scores['classificacao']) == size
+    assert (scores['faixa'] != MISSING).all()
+
+
+@pytest.mark.parametrize('informed', [11, 12, 13, 14])
+def test_screening_only_total(informed):
+    """Total só da triagem, confere ou não: classificado pela triagem calculada (12 pontos, normal)"""
+    answers = {'mna_a': 2, 'mna_b': 3, 'mna_c': 2, 'mna_d': 2, 'mna_e': 1, 'mna_f': 2}
+    expected = CHECK_OK if informed == 12 else CHECK_DIVERGENT
+    one = score_one(answers, informed)
+    assert (one['conferencia'], one['faixa'], one['triagem']) == (expected, MNA_NORMAL, 12)
+    batch = score_mna({**{field: [value] for field, value in answers.items()}, 'mna_total': [informed]}, 1)
+    assert (batch['conferencia'][0], batch['faixa'][0], batch['triagem'][0]) == (expected, MNA_NORMAL, 12)
+    assert batch['classificacao'][0] == one['classificacao'] == DEFAULT_RULES['mna_triagem']['labels'][MNA_NORMAL]
@@ -0,0 +1,32 @@
+"""Parse dos CSVs: seções em dicionários, registros tipados e tabela da coorte."""
+import io
+
+import pandas as pd
+import pytest
+from conftest import SIZES, run
+
+from nutricional.cohort import flatten_sections
+from nutricional.parser import parse_sections
+from nutricional.record import PatientRecord, parse_record
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_sections(benchmark, corpus, size):
+    files = corpus(size)
+    result = run(benchmark, lambda: [parse_sections(io.BytesIO(raw)) for _, raw in files], size)
+    assert len(result) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_record(benchmark, corpus, sections, size):
+    files = corpus(size)
+    result = run(benchmark, lambda: [parse_record(io.BytesIO(raw)) for _, raw in files], size)
+    # O parse direto para o registro equivale ao das seções
+    assert result == [PatientRecord.from_sections(s) for s in sections(size)]
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_cohort_table(benchmark, sections, size):
+    patients = sections(size)
+    table = run(benchmark, lambda: pd.DataFrame.from_records([flatten_sections(s) for s in patients]), size)
+    assert len(table) == size
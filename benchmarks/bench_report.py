@@ -0,0 +1,38 @@
+"""Geração dos relatórios PDF: um paciente, uma coorte em série, o lote no pool de processos e o consolidado.
+
+Os relatórios individuais vão até 1.000 pacientes (o custo é linear, por
+paciente); o consolidado, que desenha as páginas à medida que lê os
+pacientes, também é medido com 100.000.
+"""
+import io
+
+import pytest
+from conftest import run
+
+from nutricional.batch import run_batch
+from nutricional.patient import PatientData
+from nutricional.report import build_cohort_report, build_pdf_report
+
+
+def build_all(patients):
+    return [build_pdf_report(PatientData(s), io.BytesIO()) for s in patients]
+
+
+@pytest.mark.parametrize('size', [1, pytest.param(1000, marks=pytest.mark.large)])
+def test_build_pdf_report(benchmark, sections, size):
+    patients = sections(size)
+    run(benchmark, lambda: build_all(patients), size)
+
+
+@pytest.mark.large
+def test_run_batch(benchmark, corpus, tmp_path):
+    files = corpus(1000)
+    results = benchmark.pedantic(lambda: run_batch(files, output_dir=tmp_path), rounds=1, iterations=1)
+    assert not any(result['erro'] for result in results)
+
+
+@pytest.mark.parametrize('size', [1] + [pytest.param(size, marks=pytest.mark.large) for size in (1000, 100_000)])
+def test_build_cohort_report(benchmark, sections, size):
+    patients = sections(size)
+    done = run(benchmark, lambda: build_cohort_report(iter(patients), io.BytesIO()), size)
+    assert done == size
@@ -0,0 +1,99 @@
+"""Índice de busca dos pacientes armazenados: montagem e consultas."""
+import numpy as np
+import pytest
+from conftest import SIZES, cached, run
+
+from nutricional.patient import PatientData
+from nutricional.record import NUMERIC_FIELDS, numeric_values, values_to_array
+from nutricional.search import PatientIndex, tokenize
+
+
+@pytest.fixture(scope='module')
+def index_input(sections):
+    """Entradas do índice por tamanho, como carregadas de ``PatientStore.load_values``"""
+
+    def build(size):
+        records = [PatientData(s).record for s in sections(size)]
+        patients = [{'registro': record.registro, 'nome': record.nome} for record in records]
+        return patients, values_to_array([numeric_values(record) for record in records])
+    return cached(build)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_build_index(benchmark, index_input, size):
+    patients, values = index_input(size)
+    index = run(benchmark, lambda: PatientIndex(patients, values), size)
+    assert len(index) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_range_query(benchmark, index_input, size):
+    patients, values = index_input(size)
+    index = PatientIndex(patients, values)
+    # "MNA <= 17 e albumina <= 3.5"
+    positions = benchmark(lambda: index.query(ranges={'mna_total': (None, 17), 'albumina': (None, 3.5)}))
+    expected = np.flatnonzero((values['mna_total'] <= 17) & (values['albumina'] <= 3.5))
+    assert np.array_equal(positions, expected)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_prefix_query(benchmark, index_input, size):
+    patients, values = index_input(size)
+    index = PatientIndex(patients, values)
+    # "anto" encontra Antônio e Antônia (sem acento)
+    positions = benchmark(lambda: index.query('anto', ranges={'imc': (25, None)}))
+    # Busca linear equivalente: a palavra inicia um token do nome ou do registro
+    imc = values['peso_atual'] / (values['altura'] / 100) ** 2
+    expected = [
+        position for position, patient in enumerate(patients)
+        if imc[position] >= 25
+        and any(token.startswith('anto') for token in tokenize(patient['nome']) + tokenize(patient['registro']))
+    ]
+    assert positions.tolist() == expected
+
+
+def small_index(names):
+    """Índice de pacientes só com nome e registro (campos numéricos ausentes)"""
+    patients = [{'registro': registro, 'nome': nome} for nome, registro in names]
+    return PatientIndex(patients, values_to_array([[None] * len(NUMERIC_FIELDS)] * len(patients)))
+
+
+NAMES = [
+    ('José Antônio da Silva', '100234'),
+    ('ANTONIA SOUZA', '100235'),
+    ('Mariana Santo', '200100'),
+    ('João Estêvão', None),
+    (None, '300001'),
+]
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Prefixo de qualquer palavra do nome, sem diferenciar maiúsculas
+    ('anto', [0, 1]),
+    ('Mari', [2]),
+    ('santo', [2]),
+    # Acentos ignorados na busca e no nome
+    ('ANTÔ', [0, 1]),
+    ('jose', [0]),
+    ('joão', [3]),
+    ('estevao', [3]),
+    ('JOSÉ', [0]),
+    # Cada palavra restringe o resultado
+    ('jose ant', [0]),
+    ('antonia souza', [1]),
+    ('an so', [1]),
+    # Número de registro também por prefixo
+    ('1002', [0, 1]),
+    ('300001', [4]),
+    # Só o início das palavras, não o meio
+    ('tonio', []),
+    ('0234', []),
+    ('antonio x', []),
+])
+def test_prefix_match(text, expected):
+    assert small_index(NAMES).query(text).tolist() == expected
+
+
+def test_blank_query_returns_everyone():
+    index = small_index(NAMES)
+    assert index.query('').tolist() == index.query('   ').tolist() == list(range(len(NAMES)))
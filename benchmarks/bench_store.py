@@ -0,0 +1,100 @@
+"""Banco de avaliações: contribuição de cada importação e resumo incremental da coorte."""
+import copy
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from conftest import SIZES, run
+
+from nutricional.cohort import goal_metrics
+from nutricional.formats import patient_key
+from nutricional.store import PatientStore, assessment_row
+from nutricional.timeseries import build_history
+
+
+def follow_up(sections, days, calories):
+    """Nova avaliação do mesmo paciente, ``days`` dias depois (ou antes) da original"""
+    sections = copy.deepcopy(sections)
+    patient = sections['ADOS DO PACIENTE']
+    patient['Data da Avaliação'] = (date.fromisoformat(patient['Data da Avaliação']) + timedelta(days=days)).isoformat()
+    sections['ANTROPOMETRIA']['Peso Atual (kg)'] = sections['ANTROPOMETRIA']['Peso Atual (kg)'] + 4
+    sections['HISTÓRICO ALIMENTAR']['Total de Calorias'] = calories
+    # Sem registro alimentar, o atingimento vem do total do histórico
+    sections.pop('REGISTRO ALIMENTAR')
+    return sections
+
+
+def rows_of(patients, source):
+    return [assessment_row(patient_key(sections), sections, source) for sections in patients]
+
+
+def summary_values(view):
+    """Contagens exatas e médias das metas separadas (somas de ponto flutuante)"""
+    view = copy.deepcopy(view)
+    means = {goal: counts.pop('media') for goal, counts in view['metas'].items()}
+    return view, means
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_assessment_rows(benchmark, records, size):
+    patients = records(size)
+    rows = run(benchmark, lambda: rows_of(patients, 'importacao.csv'), size)
+    assert len({row[0] for row in rows}) == size
+
+
+def test_incremental_summary_matches_rebuild(records, tmp_path):
+    patients = records(1000)[:300]
+    store = PatientStore(tmp_path / 'pacientes.db')
+    store.add_rows(rows_of(patients[:180], 'primeira.csv'))
+    # Avaliações mais recentes de parte dos pacientes, outras antigas (que não
+    # substituem a atual) e pacientes novos, em lotes e fora de ordem
+    store.add_rows(rows_of([follow_up(s, 30, 900) for s in patients[:60]], 'retorno.csv'))
+    store.add_rows(rows_of([follow_up(s, -30, 3000) for s in patients[60:90]] + patients[180:], 'segunda.csv'))
+    store.add_rows(rows_of([follow_up(s, 60, 1200) for s in patients[:30]], 'retorno2.csv'))
+    store.add_rows(rows_of([follow_up(s, -60, 1800) for s in patients[210:240]], 'antigas.csv'))
+    incremental = store.summary()
+
+    store.rebuild_summary()
+    rebuilt = store.summary()
+    counts, means = summary_values(incremental)
+    rebuilt_counts, rebuilt_means = summary_values(rebuilt)
+    assert counts == rebuilt_counts
+    assert means == pytest.approx(rebuilt_means)
+    assert incremental['pacientes'] == len(patients)
+
+    # Atingimento das metas igual ao da coorte (registro alimentar ou histórico)
+    goals = goal_metrics(store.load_table())
+    for goal in ('calorias', 'proteinas'):
+        ratios = goals[f'atingimento_{goal}'].dropna().to_numpy()
+        assert rebuilt['metas'][goal]['pacientes'] == len(ratios)
+        assert rebuilt['metas'][goal]['media'] == pytest.approx(np.mean(ratios))
+
+
+def test_assessment_without_registro(records, tmp_path):
+    patient, other = copy.deepcopy(records(1000)[:2])
+    del patient['ADOS DO PACIENTE']['Número de Registro']
+    store = PatientStore(tmp_path / 'pacientes.db')
+    store.add_rows(rows_of([patient, other], 'sem_registro.csv'))
+    content_hash = patient_key(patient)
+    # Procurada pelo hash, não pelo texto 'None'
+    assert store.get_assessment(None, content_hash) == (content_hash, patient)
+    assert store.get_assessment(None, patient_key(other)) is None
+    assert store.get_assessment(None) is None
+    assert store.list_assessments(None) == []
+
+
+def test_history_keeps_last_imported(records, tmp_path):
+    """Duas avaliações do paciente na mesma data: a série usa a importada por último"""
+    first = records(1000)[0]
+    store = PatientStore(tmp_path / 'pacientes.db')
+    corrections = [follow_up(first, 0, calories) for calories in (1500, 1600, 1700)]
+    for weight, sections in zip((60.0, 70.0, 80.0), corrections):
+        sections['ANTROPOMETRIA']['Peso Atual (kg)'] = weight
+        store.add_rows(rows_of([sections], 'correcao.csv'))
+    history = store.load_history([first['ADOS DO PACIENTE']['Número de Registro']])
+    assert history['peso'].tolist() == [80.0]
+
+    # Também fora de ordem na tabela, pela coluna importado_em
+    table = store.load_table(latest_only=False)
+    table['importado_em'] = ['2024-01-01T10:00:02', '2024-01-01T10:00:03', '2024-01-01T10:00:01']
+    assert build_history(table)['peso'].tolist() == [70.0]
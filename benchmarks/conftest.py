@@ -0,0 +1,97 @@
+"""Configuração da suíte de benchmarks (pytest-benchmark).
+
+    python -m pytest benchmarks/                      # 1 e 1.000 pacientes
+    python -m pytest benchmarks/ --large              # inclui 100.000 pacientes
+    python -m pytest benchmarks/ --benchmark-save=base
+    python -m pytest benchmarks/ --benchmark-compare=0001 --benchmark-compare-fail=median:10%
+"""
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic import generate_patients  # noqa: E402
+
+from nutricional.parser import parse_sections  # noqa: E402
+
+SEED = 42
+
+# Dias do registro alimentar dos pacientes de ``records``
+RECORD_DAYS = 7
+
+# Tamanhos da coorte; 100 mil apenas com --large
+SIZES = [1, 1000, pytest.param(100_000, marks=pytest.mark.large)]
+
+
+def pytest_addoption(parser):
+    parser.addoption('--large', action='store_true', help="Executa também os cenários marcados como large")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--large'):
+        return
+    skip = pytest.mark.skip(reason="use --large para executar")
+    for item in items:
+        if 'large' in item.keywords:
+            item.add_marker(skip)
+
+
+def run(benchmark, func, size):
+    """Executa o benchmark com menos rodadas para coortes grandes"""
+    if size >= 100_000:
+        return benchmark.pedantic(func, rounds=1, iterations=1)
+    if size >= 1000:
+        return benchmark.pedantic(func, rounds=5, iterations=1, warmup_rounds=1)
+    return benchmark(func)
+
+
+def cached(build):
+    """Função ``get(*chave)`` que monta cada valor com ``build(*chave)`` uma única vez"""
+    built = {}
+
+    def get(*key):
+        if key not in built:
+            built[key] = build(*key)
+        return built[key]
+    return get
+
+
+def cohort_table_of(patients):
+    """Tabela colunar da coorte (``"SEÇÃO/campo"``) a partir das seções dos pacientes"""
+    import pandas as pd
+
+    from nutricional.cohort import flatten_sections
+
+    return pd.DataFrame.from_records([flatten_sections(s) for s in patients])
+
+
+@pytest.fixture(scope='session')
+def corpus():
+    """Arquivos sintéticos ``[(nome, bytes)]`` por tamanho, gerados uma vez por sessão"""
+    return cached(lambda size: list(generate_patients(size, seed=SEED)))
+
+
+@pytest.fixture(scope='session')
+def sections(corpus):
+    """Seções já processadas por tamanho"""
+    return cached(lambda size: [parse_sections(io.BytesIO(raw)) for _, raw in corpus(size)])
+
+
+@pytest.fixture(scope='session')
+def cohort_table(sections):
+    """Tabela da coorte por tamanho"""
+    return cached(lambda size: cohort_table_of(sections(size)))
+
+
+@pytest.fixture(scope='session')
+def records():
+    """Seções com registro alimentar de 7 dias por tamanho"""
+    return cached(lambda size: [
+        parse_sections(io.BytesIO(raw))
+        for _, raw in generate_patients(size, seed=SEED, food_record_days=RECORD_DAYS)
+    ])
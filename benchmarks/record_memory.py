@@ -0,0 +1,92 @@
+"""Benchmark de memória e de acesso: seções em dicionários x PatientRecord x array estruturado.
+
+Faz o parse do mesmo CSV ``--patients`` vezes (cada parse cria suas próprias
+chaves e valores, como arquivos diferentes) e compara, para a coorte inteira,
+a memória alocada (``tracemalloc``) e o tempo de calcular o IMC de todos os
+pacientes em cada representação.
+
+    python benchmarks/record_memory.py paciente.csv --patients 10000
+"""
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from nutricional.parser import parse_sections  # noqa: E402
+from nutricional.record import parse_record, records_to_array  # noqa: E402
+
+
+def measure_memory(build):
+    """Memória (bytes) retida pelo resultado de ``build()``"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def best_of(func, repeat):
+    """Menor tempo (ms) de ``repeat`` execuções"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def imc_from_sections(cohort):
+    return [
+        s['ANTROPOMETRIA']['Peso Atual (kg)'] / (s['ANTROPOMETRIA']['Altura (cm)'] / 100) ** 2
+        for s in cohort
+    ]
+
+
+def imc_from_records(cohort):
+    return [r.peso_atual / (r.altura / 100) ** 2 for r in cohort]
+
+
+def imc_from_array(array):
+    return array['peso_atual'] / (array['altura'] / 100) ** 2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara a memória e o acesso das representações do paciente")
+    parser.add_argument('csv', help="Arquivo CSV de paciente usado como modelo")
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    raw = Path(args.csv).read_bytes()
+    n = args.patients
+
+    sections, sections_bytes = measure_memory(lambda: [parse_sections(io.BytesIO(raw)) for _ in range(n)])
+    records, records_bytes = measure_memory(lambda: [parse_record(io.BytesIO(raw)) for _ in range(n)])
+    array, array_bytes = measure_memory(lambda: records_to_array(records))
+
+    result = {
+        'pacientes': n,
+        'memoria_bytes_por_paciente': {
+            'secoes': sections_bytes / n,
+            'registro': records_bytes / n,
+            'array_estruturado': array_bytes / n,
+        },
+        'imc_da_coorte_ms': {
+            'secoes': best_of(lambda: imc_from_sections(sections), args.repeat),
+            'registro': best_of(lambda: imc_from_records(records), args.repeat),
+            'array_estruturado': best_of(lambda: imc_from_array(array), args.repeat),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Benchmark de inicialização do dashboard.
+
+Mede, em interpretadores novos, o tempo de importação do script (imports e
+configuração da página, sem renderizar) e o tempo da primeira renderização
+pelo ``streamlit.testing``; também verifica quais dependências pesadas foram
+carregadas na inicialização.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --repeat 10 --max-import-ms 1500 --max-render-ms 3000
+
+Sai com código 1 se algum limite for ultrapassado ou se uma dependência que
+deveria ser carregada sob demanda aparecer na inicialização.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / 'dashboard_nutricional.py'
+
+# Devem ser importados apenas nos caminhos que os usam
+LAZY_MODULES = ['pandas', 'plotly.express', 'reportlab', 'matplotlib', 'seaborn']
+
+IMPORT_SNIPPET = """
+import json, runpy, sys, time
+start = time.perf_counter()
+runpy.run_path({app!r}, run_name='startup_benchmark')
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+RENDER_SNIPPET = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'exception': bool(at.exception)}}))
+"""
+
+
+def run_snippet(snippet):
+    """Executa o trecho em um interpretador novo e retorna o JSON impresso"""
+    output = subprocess.run(
+        [sys.executable, '-c', snippet.format(app=str(APP), lazy=LAZY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(repeat):
+    """Repete as medições e resume a mediana e o pior caso"""
+    imports = [run_snippet(IMPORT_SNIPPET) for _ in range(repeat)]
+    renders = [run_snippet(RENDER_SNIPPET) for _ in range(repeat)]
+    import_ms = [r['ms'] for r in imports]
+    render_ms = [r['ms'] for r in renders]
+    return {
+        'import_ms_median': statistics.median(import_ms),
+        'import_ms_max': max(import_ms),
+        'first_render_ms_median': statistics.median(render_ms),
+        'first_render_ms_max': max(render_ms),
+        'loaded_at_startup': sorted({m for r in imports for m in r['loaded']}),
+        'render_exception': any(r['exception'] for r in renders),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização do dashboard")
+    parser.add_argument('--repeat', type=int, default=5, help="Número de execuções de cada medição")
+    parser.add_argument('--max-import-ms', type=float, default=None, help="Limite para a mediana da importação")
+    parser.add_argument('--max-render-ms', type=float, default=None, help="Limite para a mediana da primeira renderização")
+    args = parser.parse_args(argv)
+
+    result = measure(args.repeat)
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if result['loaded_at_startup']:
+        failures.append(f"dependências carregadas na inicialização: {', '.join(result['loaded_at_startup'])}")
+    if result['render_exception']:
+        failures.append("a primeira renderização gerou uma exceção")
+    if args.max_import_ms is not None and result['import_ms_median'] > args.max_import_ms:
+        failures.append(f"importação acima de {args.max_import_ms:.0f} ms")
+    if args.max_render_ms is not None and result['first_render_ms_median'] > args.max_render_ms:
+        failures.append(f"primeira renderização acima de {args.max_render_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FALHA: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""Gerador de CSVs sintéticos de pacientes no layout por seções do prontuário.
+
+Os arquivos seguem exatamente o formato lido por ``load_csv_data`` (título da
+seção, linhas ``chave,valor`` e uma linha vazia entre seções), com valores
+plausíveis e reprodutíveis pela semente. Uma fração pode ser gerada com
+defeitos (vírgula decimal, seção faltando, linhas sem valor, bytes inválidos)
+para exercitar a validação.
+
+    python benchmarks/synthetic.py --patients 1000 --output pacientes/
+    python benchmarks/synthetic.py --patients 100000 --zip pacientes.zip --malformed 0.02
+    python benchmarks/synthetic.py --patients 100000 --table pacientes.parquet
+    python benchmarks/synthetic.py --patients 1000 --output pacientes/ --food-record-days 7
+
+Com ``--table``, os pacientes vão para uma única exportação larga (uma linha
+por paciente, colunas ``"SEÇÃO/campo"``) em Parquet, Arrow IPC ou XLSX,
+conforme a extensão. Com ``--food-record-days``, cada paciente inclui um
+registro alimentar por item (seção ``REGISTRO ALIMENTAR``) com os alimentos
+da tabela de composição.
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+import zipfile
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from nutricional.mna import ITEMS, MEASURED, SCREENING  # noqa: E402
+from nutricional.parser import coerce_value  # noqa: E402
+from nutricional.record import FIELDS  # noqa: E402
+
+FIRST_NAMES = ['Maria', 'José', 'Ana', 'João', 'Antônia', 'Francisco', 'Francisca', 'Antônio', 'Adriana', 'Carlos']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes']
+COMPLAINTS = ['Perda de apetite, cansaço', 'Dificuldade para mastigar', 'Perda de peso recente', 'Constipação']
+DIETS = ['Hiperproteica', 'Hipossódica', 'Branda', 'Geral', 'Pastosa']
+RESTRICTIONS = ['Lactose', 'Glúten', 'Nenhuma', 'Açúcar']
+SUPPLEMENTS = ['Whey protein', 'Suplemento hipercalórico', 'Nenhum']
+
+# Fração de pacientes só com a triagem do MNA (itens A-F, total de até 14 pontos)
+MNA_SCREENING_ONLY = 0.2
+
+# Refeição -> alimentos da tabela de composição e porção típica (g) do registro alimentar
+FOOD_RECORD_MEALS = {
+    'Café da Manhã': [('Pão, trigo, francês', 50), ('Leite, de vaca, integral', 200), ('Café, infusão 10%', 100),
+                      ('Manteiga, com sal', 10), ('Mamão, Papaia, cru', 150)],
+    'Lanche da Manhã': [('Banana, prata, crua', 80), ('Iogurte, natural', 170),
+                        ('Biscoito, salgado, cream cracker', 24)],
+    'Almoço': [('Arroz, tipo 1, cozido', 120), ('Feijão, carioca, cozido', 90),
+               ('Frango, peito, sem pele, grelhado', 100), ('Carne, bovina, patinho, sem gordura, grelhado', 100),
+               ('Batata, inglesa, cozida', 120), ('Alface, crespa, crua', 30), ('Tomate, com semente, cru', 50)],
+    'Lanche da Tarde': [('Maçã, Fuji, com casca, crua', 130), ('Pão, trigo, forma, integral', 50),
+                        ('Queijo, minas, frescal', 30)],
+    'Jantar': [('Sopa, de legumes com carne, caseira', 300), ('Arroz, tipo 1, cozido', 100),
+               ('Ovo, de galinha, inteiro, cozido/10minutos', 50), ('Abóbora, cabotian, cozida', 80),
+               ('Chuchu, cozido', 80)],
+    'Ceia': [('Leite, de vaca, integral', 200), ('Biscoito, doce, maisena', 20)],
+}
+
+MALFORMATIONS = ('virgula_decimal', 'secao_ausente', 'linha_sem_valor', 'bytes_invalidos')
+
+
+def food_record(rng, days):
+    """Registro alimentar de ``days`` dias: item -> ``"dia,refeição,alimento,gramas"``"""
+    record = {}
+    for day in range(1, days + 1):
+        for meal, foods in FOOD_RECORD_MEALS.items():
+            for food, portion in rng.sample(foods, rng.randint(1, min(3, len(foods)))):
+                record[str(len(record) + 1)] = f'{day},{meal},{food},{round(portion * rng.uniform(0.5, 1.5))}'
+    return record
+
+
+def mna_answers(rng, measures):
+    """Respostas do MNA (pergunta -> pontos), total e diagnóstico
+
+    F, Q e R saem das medidas do paciente, como no questionário; uma fração
+    dos pacientes tem só a triagem, com o total da triagem.
+    """
+    items = SCREENING if rng.random() < MNA_SCREENING_ONLY else ITEMS
+    answers = {}
+    for item in items:
+        if item.letter in MEASURED:
+            field, edges, points = MEASURED[item.letter]
+            value = points[sum(measures[field] >= edge for edge in edges)]
+        else:
+            # O maior de dois sorteios: respostas mais favoráveis são mais comuns
+            value = max(rng.choice(item.points), rng.choice(item.points))
+        answers[FIELDS[item.field].key] = value
+    total = sum(answers.values())
+    normal, risk = (12, 8) if items is SCREENING else (24, 17)
+    diagnosis = 'Normal' if total >= normal else 'Risco de desnutrição' if total >= risk else 'Desnutrido'
+    return answers, total, diagnosis
+
+
+def patient_sections(index, rng, food_record_days=0):
+    """Seções de um paciente sintético (dicionário ordenado seção -> campos)"""
+    sex = rng.choice(['Feminino', 'Masculino'])
+    height = round(rng.gauss(172 if sex == 'Masculino' else 160, 7))
+    imc = max(14.0, rng.gauss(25, 5))
+    weight = round(imc * (height / 100) ** 2, 1)
+    birth = date(1930, 1, 1) + timedelta(days=rng.randrange(365 * 60))
+    assessment = date(2020, 1, 1) + timedelta(days=rng.randrange(365 * 5))
+    arm = round(rng.gauss(27, 3), 1)
+    calf = round(rng.gauss(33, 3), 1)
+    measures = {'imc': weight / (height / 100) ** 2, 'circunferencia_braco': arm, 'circunferencia_panturrilha': calf}
+    mna_items, mna_total, diagnosis = mna_answers(rng, measures)
+    calories = rng.randrange(1400, 2600, 50)
+
+    sections = {
+        'ADOS DO PACIENTE': {
+            'Nome': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'Data de Nascimento': birth.isoformat(),
+            'Sexo': sex,
+            'Telefone': f'119{rng.randrange(10 ** 7, 10 ** 8)}',
+            'Número de Registro': str(100000 + index),
+            'Data da Avaliação': assessment.isoformat(),
+        },
+        'ANAMNESE': {
+            'Queixa Principal': rng.choice(COMPLAINTS),
+        },
+        'ANTROPOMETRIA': {
+            'Peso Atual (kg)': f'{weight:.1f}',
+            'Peso Usual (kg)': f'{weight + rng.uniform(-2, 6):.1f}',
+            'Altura (cm)': str(height),
+            'Circunferência do Braço (cm)': f'{arm:.1f}',
+            'Circunferência da Panturrilha (cm)': f'{calf:.1f}',
+            'Percentual de Gordura Corporal (%)': f'{rng.gauss(28, 6):.1f}',
+            'Massa Muscular (kg)': f'{rng.gauss(22, 4):.1f}',
+            'Relação Cintura/Quadril': f'{rng.gauss(0.9, 0.05):.2f}',
+        },
+        'AVALIAÇÃO MNA': {
+            **{question: f'{value:g}' for question, value in mna_items.items()},
+            'Pontuação Total': f'{mna_total:.1f}',
+            'Diagnóstico': diagnosis,
+        },
+        'EXAMES BIOQUÍMICOS': {
+            'Glicose (mg/dL)': str(rng.randrange(70, 180)),
+            'Colesterol total (mg/dL)': str(rng.randrange(140, 280)),
+            'HDL (mg/dL)': str(rng.randrange(30, 80)),
+            'LDL (mg/dL)': str(rng.randrange(60, 190)),
+            'Albumina (g/dL)': f'{rng.uniform(2.5, 5.0):.1f}',
+            'Hemoglobina (g/dL)': f'{rng.uniform(9.0, 17.0):.1f}',
+            'Ferritina (ng/mL)': str(rng.randrange(15, 300)),
+            'Ureia (mg/dL)': str(rng.randrange(15, 60)),
+            'Createina (mg/dL)': f'{rng.uniform(0.5, 1.5):.1f}',
+        },
+        'PRESCRIÇÃO DIETÉTICA': {
+            'Tipo de Dieta': rng.choice(DIETS),
+            'Meta Calórica (Kcal/dia)': str(calories),
+            'Meta de Proteína (g/dia)': str(rng.randrange(50, 120)),
+            'Meta de Carboidratos (g/dia)': str(rng.randrange(150, 320)),
+            'Meta de Gordura (g/dia)': str(rng.randrange(40, 90)),
+            'Restrições Alimentare': rng.choice(RESTRICTIONS),
+            'Suplementos Nutricionais': rng.choice(SUPPLEMENTS),
+            'Plano Alimentar Detalhado': 'Café: pão integral, leite; Almoço: arroz, feijão, frango',
+        },
+        'HISTÓRICO ALIMENTAR': {
+            'Total de Calorias': str(calories - rng.randrange(0, 600)),
+            'Total de Proteínas': str(rng.randrange(35, 110)),
+            'Total de Carboidratos': str(rng.randrange(120, 300)),
+            'Total de Gorduras': str(rng.randrange(30, 90)),
+        },
+    }
+    if food_record_days:
+        sections['REGISTRO ALIMENTAR'] = food_record(rng, food_record_days)
+    return sections
+
+
+def render_csv(sections):
+    """Escreve as seções no layout do prontuário (aspas apenas quando necessário)"""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    for section, values in sections.items():
+        writer.writerow([section])
+        for key, value in values.items():
+            writer.writerow([key, value])
+        output.write('\n')
+    return output.getvalue()
+
+
+def malform(sections, text, kind, rng):
+    """Aplica um defeito ao paciente; retorna os bytes do arquivo"""
+    if kind == 'virgula_decimal':
+        anthro = sections['ANTROPOMETRIA']
+        anthro['Peso Atual (kg)'] = anthro['Peso Atual (kg)'].replace('.', ',')
+        return render_csv(sections).encode('utf-8')
+    if kind == 'secao_ausente':
+        del sections[rng.choice(['ANTROPOMETRIA', 'AVALIAÇÃO MNA', 'EXAMES BIOQUÍMICOS'])]
+        return render_csv(sections).encode('utf-8')
+    if kind == 'linha_sem_valor':
+        return text.replace('Altura (cm),', 'Altura (cm)\nlixo,,,\n', 1).encode('utf-8')
+    return text.encode('utf-8')[:200] + b'\xff\xfe' + text.encode('utf-8')[200:]
+
+
+def generate_patient(index, seed=0, malformed_rate=0.0, food_record_days=0):
+    """Bytes do CSV do paciente ``index``; reprodutível para a mesma semente"""
+    rng = random.Random(seed * 1_000_003 + index)
+    sections = patient_sections(index, rng, food_record_days)
+    text = render_csv(sections)
+    if malformed_rate and rng.random() < malformed_rate:
+        return malform(sections, text, rng.choice(MALFORMATIONS), rng)
+    return text.encode('utf-8')
+
+
+def generate_patients(count, seed=0, malformed_rate=0.0, food_record_days=0):
+    """Gera ``(nome, bytes)`` de ``count`` pacientes"""
+    for index in range(count):
+        yield f'paciente_{index:06d}.csv', generate_patient(index, seed, malformed_rate, food_record_days)
+
+
+def write_table(patients, path):
+    """Grava seções de pacientes em uma exportação larga (.parquet, .arrow/.feather ou .xlsx)
+
+    ``patients`` são seções como as de ``patient_sections`` ou já processadas
+    por ``parse_sections``; os valores são gravados convertidos (números como
+    números), como em uma exportação tabular do prontuário.
+    """
+    columns = {}
+    for index, sections in enumerate(patients):
+        for section, values in sections.items():
+            for key, value in values.items():
+                name = f'{section}/{key}'
+                if name not in columns:
+                    columns[name] = [None] * index
+                columns[name].append(coerce_value(value) if isinstance(value, str) else value)
+        for column in columns.values():
+            if len(column) <= index:
+                column.append(None)
+
+    suffix = Path(path).suffix.lower()
+    if suffix == '.xlsx':
+        import xlsxwriter
+
+        with xlsxwriter.Workbook(str(path), {'constant_memory': True}) as workbook:
+            sheet = workbook.add_worksheet('pacientes')
+            sheet.write_row(0, 0, list(columns))
+            for row, values in enumerate(zip(*columns.values()), start=1):
+                sheet.write_row(row, 0, values)
+        return
+
+    import pyarrow as pa
+
+    table = pa.table(columns)
+    if suffix == '.parquet':
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera CSVs sintéticos de pacientes")
+    parser.add_argument('--patients', type=int, default=1000)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="Diretório de saída")
+    target.add_argument('--zip', help="Arquivo ZIP de saída")
+    target.add_argument('--table', help="Exportação larga de saída (.parquet, .arrow, .feather ou .xlsx)")
+    parser.add_argument('--malformed', type=float, default=0.0, help="Fração de arquivos com defeitos (0-1)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--food-record-days', type=int, default=0, help="Dias de registro alimentar por paciente")
+    args = parser.parse_args(argv)
+
+    if args.table:
+        rng_sections = (
+            patient_sections(index, random.Random(args.seed * 1_000_003 + index), args.food_record_days)
+            for index in range(args.patients)
+        )
+        write_table(rng_sections, args.table)
+        print(f"{args.patients} pacientes gerados em {args.table}")
+        return 0
+
+    patients = generate_patients(args.patients, args.seed, args.malformed, args.food_record_days)
+    if args.zip:
+        with zipfile.ZipFile(args.zip, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, raw in patients:
+                archive.writestr(name, raw)
+    else:
+        output = Path(args.output)
+        output.mkdir(parents=True, exist_ok=True)
+        for name, raw in patients:
+            (output / name).write_bytes(raw)
+    print(f"{args.patients} pacientes gerados em {args.zip or args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
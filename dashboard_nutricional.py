@@ -1,22 +1,28 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import numpy as np
-from datetime import datetime, timedelta
-import base64
+from datetime import datetime
 from io import BytesIO
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-import matplotlib.pyplot as plt
-import seaborn as sns
+import importlib.util
+import csv
+import json
+import os
+from pathlib import Path
+import tempfile
 import warnings
+import zipfile
 warnings.filterwarnings('ignore')
 
+# pandas, plotly.express e reportlab são importados sob demanda (modo coorte
+# e geração de PDF) para não pesar na inicialização de cada sessão
+from nutricional.cache import figure_cache, get_report, image_cache, put_report
+from nutricional.classification import MNA_NORMAL, MNA_RISK
+from nutricional.mna import ITEMS as MNA_ITEMS
+from nutricional.formats import UPLOAD_TYPES, iter_export_files, load_patients
+from nutricional.patient import PatientData
+from nutricional.record import FOOD_RECORD, PatientRecord, validate_record
+from nutricional.store import default_store
+from nutricional.timing import METRICS_FILE, measure, profile_once, stage_timer, timed
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard Nutricional",
@@ -46,100 +52,151 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class NutritionDashboard:
+# Painel de desempenho no sidebar (tempos por etapa, caches e cProfile)
+DEBUG_PANEL = os.environ.get('NUTRICIONAL_DEBUG', '') not in ('', '0')
+
+# Gráficos incluídos no relatório PDF
+PDF_CHARTS = [
+    ("anthropometry", "Dados Antropométricos"),
+    ("biochemical", "Exames Bioquímicos"),
+    ("mna_radar", "Perfil MNA"),
+    ("nutrition_goals", "Metas Nutricionais vs Consumo Atual"),
+]
+CHART_IMAGE_WIDTH, CHART_IMAGE_HEIGHT = 900, 500
+
+class NutritionDashboard(PatientData):
+    """Modelo do paciente de uma sessão, mantido entre reruns em ``st.session_state``
+    
+    Os valores derivados (métricas, validação, gráficos decodificados) ficam em
+    ``derived`` e são calculados uma vez por conteúdo: interações com widgets
+    os reaproveitam, e só um novo conteúdo (outro upload ou avaliação) os descarta.
+    """
     def __init__(self):
-        self.data = {}
+        super().__init__()
+        self.content_hash = None
+        # Origem carregada: ID do upload ou ('banco', registro, data), e os pacientes do arquivo
+        self.source_id = None
+        self.source_patients = None
+        self.derived = {}
+    
+    def set_patient(self, content_hash, sections):
+        """Troca o paciente do modelo; o mesmo conteúdo mantém os valores derivados"""
+        if content_hash == self.content_hash:
+            return
+        self.content_hash = content_hash
+        self.data = {section: dict(values) for section, values in sections.items()}
+        self.derived = {}
+    
+    def derive(self, key, compute):
+        """Valor derivado do paciente atual, calculado na primeira chamada"""
+        if key not in self.derived:
+            self.derived[key] = compute()
+        return self.derived[key]
+    
+    def get_intake(self):
+        """Consumo do registro alimentar, calculado uma vez por conteúdo (cache compartilhado por sessões)"""
+        from nutricional.intake import patient_intake
+        
+        return self.derive('consumo', lambda: patient_intake(self.data, key=self.content_hash))
+    
+    def get_daily_intake(self):
+        """Média diária do consumo calculado em ``get_intake`` (mesmo cache)"""
+        intake = self.get_intake()
+        return None if intake is None else intake['media_diaria']
+    
+    def get_mna_score(self):
+        """Pontuação do MNA calculada das respostas, uma vez por conteúdo"""
+        return self.derive('mna', super().get_mna_score)
+
+    def food_table_key(self):
+        """Fingerprint da tabela de composição usada no consumo, ou '' sem registro alimentar
+        
+        Entra nas chaves dos gráficos e do relatório: trocar a tabela
+        (NUTRICIONAL_FOOD_TABLE) muda o consumo calculado.
+        """
+        if FOOD_RECORD not in self.data:
+            return ''
+        from nutricional.intake import food_table
         
+        return food_table().fingerprint
+    
+    @property
+    def metrics(self):
+        """Métricas do paciente (``get_metrics``), calculadas uma vez por conteúdo"""
+        return self.derive('metricas', self.get_metrics)
+    
+    def snapshot(self):
+        """Cópia do paciente atual para tarefas em segundo plano (a sessão pode trocar de paciente)"""
+        copy = NutritionDashboard()
+        copy.rules = self.rules
+        copy.content_hash = self.content_hash
+        copy.data = self.data
+        copy.derived = self.derived
+        return copy
+    
+    @timed()
     def load_csv_data(self, file):
-        """Carrega e processa os dados do CSV"""
-        try:
-            # Lê o arquivo CSV
-            content = file.read().decode('utf-8')
-            lines = content.strip().split('\n')
-            
-            current_section = None
-            section_data = {}
-            
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('""'):
-                    if current_section and section_data:
-                        self.data[current_section] = section_data
-                        section_data = {}
-                    continue
-                
-                if ',' not in line:
-                    current_section = line
-                    section_data = {}
-                    continue
-                
-                parts = line.split(',', 1)
-                if len(parts) == 2:
-                    key, value = parts[0].strip(), parts[1].strip().strip('"')
-                    if value and value != '':
-                        try:
-                            # Tenta converter para número
-                            if '.' in value:
-                                section_data[key] = float(value)
-                            else:
-                                section_data[key] = int(value) if value.isdigit() else value
-                        except:
-                            section_data[key] = value
-            
-            # Adiciona a última seção
-            if current_section and section_data:
-                self.data[current_section] = section_data
-                
-            return True
-        except Exception as e:
-            st.error(f"Erro ao carregar arquivo: {str(e)}")
-            return False
-    
-    def get_patient_info(self):
-        """Extrai informações básicas do paciente"""
-        if 'ADOS DO PACIENTE' in self.data:
-            return self.data['ADOS DO PACIENTE']
-        return {}
-    
-    def get_anthropometry_data(self):
-        """Extrai dados antropométricos"""
-        if 'ANTROPOMETRIA' in self.data:
-            return self.data['ANTROPOMETRIA']
-        return {}
-    
-    def get_biochemical_data(self):
-        """Extrai dados de exames bioquímicos"""
-        if 'EXAMES BIOQUÍMICOS' in self.data:
-            return self.data['EXAMES BIOQUÍMICOS']
-        return {}
-    
-    def get_mna_data(self):
-        """Extrai dados da avaliação MNA"""
-        if 'AVALIAÇÃO MNA' in self.data:
-            return self.data['AVALIAÇÃO MNA']
-        return {}
-    
-    def calculate_imc(self):
-        """Calcula o IMC"""
-        anthro = self.get_anthropometry_data()
-        if 'Peso Atual (kg)' in anthro and 'Altura (cm)' in anthro:
-            peso = anthro['Peso Atual (kg)']
-            altura = anthro['Altura (cm)'] / 100
-            return peso / (altura ** 2)
-        return None
+        """Carrega e processa os dados do arquivo (CSV, XLSX, Parquet ou Arrow)
+        
+        Exportações com vários pacientes mostram um seletor no sidebar.
+        """
+        # O mesmo upload (reruns, interações) não é lido de novo; um novo
+        # upload é lido reutilizando o parse de conteúdos idênticos (outras sessões)
+        file_id = getattr(file, 'file_id', None)
+        if file_id is None or file_id != self.source_id:
+            try:
+                patients = load_patients(file)
+            except (UnicodeDecodeError, ValueError, OSError, csv.Error, zipfile.BadZipFile) as e:
+                st.error(f"Erro ao carregar arquivo: {type(e).__name__}: {e}")
+                return False
+            if not patients:
+                st.error("Nenhum paciente encontrado no arquivo.")
+                return False
+            # O nome vem do registro, que aceita os aliases da seção (DADOS DO PACIENTE)
+            labels = [
+                f"{PatientRecord.from_sections(values).nome or 'Paciente'} ({i})"
+                for i, (_, values) in enumerate(patients, start=1)
+            ]
+            self.source_id, self.source_patients = file_id, (patients, labels)
+        
+        patients, labels = self.source_patients
+        key, sections = patients[0]
+        if len(patients) > 1:
+            key, sections = patients[st.sidebar.selectbox(
+                f"Paciente do arquivo ({len(patients)})", range(len(patients)), format_func=labels.__getitem__
+            )]
+        self.set_patient(key, sections)
+        
+        validation = self.derive('validacao', lambda: validate_record(self.record))
+        if validation['secoes_ausentes']:
+            st.warning(f"⚠️ Seções ausentes: {', '.join(validation['secoes_ausentes'])}")
+        if validation['campos_ausentes']:
+            st.warning(f"⚠️ Campos ausentes: {', '.join(validation['campos_ausentes'])}")
+        for failure in validation['falhas_conversao']:
+            st.warning(f"⚠️ Valor não numérico em {failure['campo']}: {failure['valor']!r}")
+        return True
     
-    def classify_imc(self, imc):
-        """Classifica o IMC"""
-        if imc < 18.5:
-            return "Baixo peso", "#dc3545"
-        elif 18.5 <= imc < 25:
-            return "Normal", "#28a745"
-        elif 25 <= imc < 30:
-            return "Sobrepeso", "#fd7e14"
-        else:
-            return "Obesidade", "#dc3545"
+    def load_stored_patient(self, store, registro, content_hash=None):
+        """Carrega uma avaliação do banco de pacientes (consultada só quando a seleção muda)"""
+        source_id = ('banco', store.path, registro, content_hash)
+        if source_id != self.source_id:
+            assessment = store.get_assessment(registro, content_hash)
+            if assessment is None:
+                st.error("Avaliação não encontrada no banco de pacientes.")
+                return False
+            self.source_id, self.source_patients = source_id, None
+            self.set_patient(*assessment)
+        return True
+    
+    def list_assessments(self, store):
+        """Avaliações armazenadas do paciente (recalculadas quando o banco recebe avaliações)"""
+        registro = self.get_patient_info().get('Número de Registro')
+        if registro is None:
+            return []
+        return self.derive(('avaliacoes', store.path, store.count()), lambda: store.list_assessments(registro))
     
-    def create_anthropometry_chart(self):
+    @timed()
+    def create_anthropometry_chart(self, template="plotly_white"):
         """Cria gráfico de dados antropométricos"""
         anthro = self.get_anthropometry_data()
         
@@ -164,12 +221,13 @@ class NutritionDashboard:
             title="Dados Antropométricos",
             xaxis_title="Medidas",
             yaxis_title="Valores",
-            template="plotly_white"
+            template=template
         )
         
         return fig
     
-    def create_biochemical_chart(self):
+    @timed()
+    def create_biochemical_chart(self, template="plotly_white"):
         """Cria gráfico de exames bioquímicos"""
         bio = self.get_biochemical_data()
         
@@ -184,14 +242,8 @@ class NutritionDashboard:
         }
         
         # Valores de referência
-        reference_values = {
-            'Glicose': 100,
-            'Colesterol': 200,
-            'HDL': 40,
-            'LDL': 100,
-            'Albumina': 35,  # 3.5 * 10
-            'Hemoglobina': 14
-        }
+        reference_values = {name: self.rules.lab_reference(name) for name in markers}
+        reference_values['Albumina'] *= 10  # Multiplicado para visualização
         
         fig = go.Figure()
         
@@ -214,39 +266,40 @@ class NutritionDashboard:
             title="Exames Bioquímicos vs Valores de Referência",
             xaxis_title="Marcadores",
             yaxis_title="Valores",
-            template="plotly_white",
+            template=template,
             barmode='group'
         )
         
         return fig
     
-    def create_mna_radar_chart(self):
-        """Cria gráfico radar da avaliação MNA"""
-        mna = self.get_mna_data()
+    @timed()
+    def create_mna_radar_chart(self, template=None):
+        """Cria gráfico radar da avaliação MNA
+        
+        Cada item respondido (A-R) aparece como percentual do seu máximo, já
+        que os itens valem de 1 a 3 pontos; o passar do mouse mostra os pontos.
+        """
+        points = self.get_mna_score()['pontos']
         
         categories = []
         values = []
+        hover = []
         
-        # Mapeia as questões MNA para categorias mais legíveis
-        mna_mapping = {
-            'A. Nos últimos três meses houve diminuição da ingesta alimentar devido a perda de apetite, problemas digestivos ou dificuldade para mastigar ou deglutir?': 'Ingesta Alimentar',
-            'B. Perda de peso nos últimos 3 meses': 'Perda de Peso',
-            'C. Mobilidade': 'Mobilidade',
-            'D. Passou por algum stress psicológico ou doença aguda nos últimos três meses?': 'Stress/Doença',
-            'E. Problemas neuropsicológicos': 'Neuropsicológico',
-            'F. Índice de Massa Corporal (IMC)': 'IMC'
-        }
-        
-        for question, category in mna_mapping.items():
-            if question in mna:
-                categories.append(category)
-                values.append(mna[question])
+        for item in MNA_ITEMS:
+            value = points[item.letter]
+            if value is not None:
+                maximum = max(item.points)
+                categories.append(f"{item.letter}. {item.label}")
+                values.append(value / maximum * 100)
+                hover.append(f"{value:g} de {maximum:g} pontos")
         
         fig = go.Figure()
         
         fig.add_trace(go.Scatterpolar(
             r=values,
             theta=categories,
+            customdata=hover,
+            hovertemplate='%{theta}: %{customdata}<extra></extra>',
             fill='toself',
             name='Avaliação MNA',
             line_color='#2E8B57'
@@ -256,37 +309,49 @@ class NutritionDashboard:
             polar=dict(
                 radialaxis=dict(
                     visible=True,
-                    range=[0, 3]
+                    range=[0, 100],
+                    ticksuffix='%'
                 )),
             showlegend=True,
             title="Perfil MNA - Mini Avaliação Nutricional"
         )
+        if template is not None:
+            fig.update_layout(template=template)
         
         return fig
     
-    def create_nutrition_goals_chart(self):
-        """Cria gráfico de metas nutricionais"""
-        if 'PRESCRIÇÃO DIETÉTICA' in self.data and 'HISTÓRICO ALIMENTAR' in self.data:
+    @timed()
+    def create_nutrition_goals_chart(self, template="plotly_white"):
+        """Cria gráfico de metas nutricionais
+        
+        O consumo é a média diária do registro alimentar por item, quando houver,
+        ou os totais informados no histórico alimentar.
+        """
+        if 'PRESCRIÇÃO DIETÉTICA' in self.data and ('HISTÓRICO ALIMENTAR' in self.data or self.get_intake() is not None):
             prescription = self.data['PRESCRIÇÃO DIETÉTICA']
-            history = self.data['HISTÓRICO ALIMENTAR']
+            # Mesmo consumo do resumo e de ``cohort.goal_metrics`` (``get_goal_intake``)
+            consumed = {
+                nutrient: 0 if value is None else round(value, 1) if isinstance(value, float) else value
+                for nutrient, value in self.get_goal_intake().items()
+            }
             
             # Metas vs Consumo atual
             nutrients = {
                 'Calorias': {
                     'Meta': prescription.get('Meta Calórica (Kcal/dia)', 0),
-                    'Atual': history.get('Total de Calorias', 0)
+                    'Atual': consumed['calorias']
                 },
                 'Proteínas': {
                     'Meta': prescription.get('Meta de Proteína (g/dia)', 0),
-                    'Atual': history.get('Total de Proteínas', 0)
+                    'Atual': consumed['proteinas']
                 },
                 'Carboidratos': {
                     'Meta': prescription.get('Meta de Carboidratos (g/dia)', 0),
-                    'Atual': history.get('Total de Carboidratos', 0)
+                    'Atual': consumed['carboidratos']
                 },
                 'Gorduras': {
                     'Meta': prescription.get('Meta de Gordura (g/dia)', 0),
-                    'Atual': history.get('Total de Gorduras', 0)
+                    'Atual': consumed['gorduras']
                 }
             }
             
@@ -314,7 +379,7 @@ class NutritionDashboard:
                 title="Metas Nutricionais vs Consumo Atual",
                 xaxis_title="Nutrientes",
                 yaxis_title="Quantidade",
-                template="plotly_white",
+                template=template,
                 barmode='group'
             )
             
@@ -322,136 +387,653 @@ class NutritionDashboard:
         
         return None
     
-    def generate_pdf_report(self):
-        """Gera relatório em PDF"""
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Título
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.HexColor('#2E8B57'),
-            alignment=1
+    @timed()
+    def create_meal_intake_chart(self, template="plotly_white"):
+        """Cria gráfico da energia consumida por refeição em cada dia do registro alimentar"""
+        intake = self.get_intake()
+        if intake is None:
+            return None
+        
+        per_meal = intake['refeicoes']['energia_kcal']
+        days = per_meal.index.get_level_values('dia')
+        fig = go.Figure()
+        for meal in intake['media_refeicoes'].index:
+            values = per_meal.xs(meal, level='refeicao')
+            fig.add_trace(go.Bar(name=meal, x=[f"Dia {day}" for day in values.index], y=values.round(1).tolist()))
+        
+        fig.update_layout(
+            title=f"Energia por Refeição ({days.nunique()} dias de registro)",
+            xaxis_title="Dia",
+            yaxis_title="Energia (kcal)",
+            template=template,
+            barmode='stack'
         )
-        story.append(Paragraph("Relatório Nutricional", title_style))
-        story.append(Spacer(1, 20))
         
-        # Informações do paciente
-        patient_info = self.get_patient_info()
-        if patient_info:
-            story.append(Paragraph("Dados do Paciente", styles['Heading2']))
-            
-            patient_data = [
-                ['Nome:', patient_info.get('Nome', 'N/A')],
-                ['Data de Nascimento:', patient_info.get('Data de Nascimento', 'N/A')],
-                ['Sexo:', patient_info.get('Sexo', 'N/A')],
-                ['Telefone:', patient_info.get('Telefone', 'N/A')],
-                ['Registro:', str(patient_info.get('Número de Registro', 'N/A'))]
-            ]
-            
-            patient_table = Table(patient_data, colWidths=[2*inch, 3*inch])
-            patient_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            story.append(patient_table)
-            story.append(Spacer(1, 20))
-        
-        # Dados antropométricos
-        anthro = self.get_anthropometry_data()
-        if anthro:
-            story.append(Paragraph("Avaliação Antropométrica", styles['Heading2']))
-            
-            imc = self.calculate_imc()
-            imc_classification, _ = self.classify_imc(imc) if imc else ("N/A", "")
-            
-            anthro_data = [
-                ['Peso Atual:', f"{anthro.get('Peso Atual (kg)', 'N/A')} kg"],
-                ['Altura:', f"{anthro.get('Altura (cm)', 'N/A')} cm"],
-                ['IMC:', f"{imc:.1f}" if imc else "N/A"],
-                ['Classificação IMC:', imc_classification],
-                ['Circunferência do Braço:', f"{anthro.get('Circunferência do Braço (cm)', 'N/A')} cm"],
-                ['% Gordura Corporal:', f"{anthro.get('Percentual de Gordura Corporal (%)', 'N/A')}%"]
-            ]
-            
-            anthro_table = Table(anthro_data, colWidths=[2.5*inch, 2.5*inch])
-            anthro_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            story.append(anthro_table)
-            story.append(Spacer(1, 20))
-        
-        # Avaliação MNA
-        mna = self.get_mna_data()
-        if mna:
-            story.append(Paragraph("Avaliação MNA", styles['Heading2']))
-            
-            mna_data = [
-                ['Pontuação Total:', str(mna.get('Pontuação Total', 'N/A'))],
-                ['Diagnóstico:', mna.get('Diagnóstico', 'N/A')]
-            ]
-            
-            mna_table = Table(mna_data, colWidths=[2.5*inch, 2.5*inch])
-            mna_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            story.append(mna_table)
-            story.append(Spacer(1, 20))
-        
-        # Prescrição dietética
-        if 'PRESCRIÇÃO DIETÉTICA' in self.data:
-            prescription = self.data['PRESCRIÇÃO DIETÉTICA']
-            story.append(Paragraph("Prescrição Dietética", styles['Heading2']))
-            
-            prescription_data = [
-                ['Tipo de Dieta:', prescription.get('Tipo de Dieta', 'N/A')],
-                ['Meta Calórica:', f"{prescription.get('Meta Calórica (Kcal/dia)', 'N/A')} kcal/dia"],
-                ['Meta de Proteína:', f"{prescription.get('Meta de Proteína (g/dia)', 'N/A')} g/dia"],
-                ['Restrições:', prescription.get('Restrições Alimentare', 'Nenhuma')]
-            ]
+        return fig
+
+    def get_chart(self, chart, template=None):
+        """Retorna a figura (``go.Figure``) de um gráfico do paciente
+        
+        As figuras ficam no cache por (hash do conteúdo, tabela de composição,
+        gráfico, tema); um novo upload tem outro hash e gera novas figuras.
+        ``chart`` é o nome do método sem ``create_``/``_chart``. A figura é
+        compartilhada entre as sessões e não deve ser alterada.
+        """
+        return self.derive(('grafico', chart, template), lambda: self._load_chart(chart, template))
+    
+    def _load_chart(self, chart, template):
+        # Guarda a própria figura: st.plotly_chart valida de novo uma especificação
+        # em dict (tão caro quanto construir a figura), mas não um go.Figure
+        key = (self.content_hash, self.food_table_key(), chart, template)
+        fig = figure_cache.get(key)
+        if fig is None:
+            builder = getattr(self, f'create_{chart}_chart')
+            fig = builder() if template is None else builder(template=template)
+            if fig is None:
+                return None
+            figure_cache.put(key, fig)
+        return fig
+    
+    def get_chart_image(self, chart, width=CHART_IMAGE_WIDTH, height=CHART_IMAGE_HEIGHT, scale=2):
+        """Renderiza um gráfico como PNG (cacheado), ou None sem o kaleido"""
+        if importlib.util.find_spec('kaleido') is None:
+            return None
+        key = (self.content_hash, self.food_table_key(), chart, width, height, scale)
+        png = image_cache.get(key)
+        if png is None:
+            import plotly.io as pio
             
-            prescription_table = Table(prescription_data, colWidths=[2.5*inch, 2.5*inch])
-            prescription_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            story.append(prescription_table)
-        
-        doc.build(story)
-        buffer.seek(0)
-        return buffer
+            fig = self.get_chart(chart)
+            if fig is None:
+                return None
+            png = pio.to_image(fig, format='png', width=width, height=height, scale=scale)
+            image_cache.put(key, png, size=len(png))
+        return png
+    
+    @timed()
+    def generate_pdf_report(self, include_charts=True, queue=None):
+        """Gera relatório em PDF, reaproveitando relatórios idênticos do cache
+        
+        Com ``queue`` (``JobQueue``), o PDF é montado em um processo do pool da fila.
+        Retorna os bytes do PDF, os mesmos guardados no cache (sem cópia).
+        """
+        from nutricional.report import build_pdf_report, render_pdf, report_cache_key
+        
+        # A chave usa só os nomes dos gráficos existentes: as imagens (kaleido)
+        # são renderizadas apenas quando o relatório não está no cache
+        charts = []
+        if include_charts and importlib.util.find_spec('kaleido') is not None:
+            charts = [(chart, title) for chart, title in PDF_CHARTS if self.get_chart(chart) is not None]
+        
+        key = report_cache_key(
+            self.content_hash, self.rules, [chart for chart, _ in charts], food_table=self.food_table_key()
+        )
+        pdf = get_report(key)
+        if pdf is None:
+            aspect = CHART_IMAGE_HEIGHT / CHART_IMAGE_WIDTH
+            images = [(title, self.get_chart_image(chart), aspect) for chart, title in charts]
+            if queue is None:
+                buffer = BytesIO()
+                build_pdf_report(self, buffer, charts=images)
+                pdf = buffer.getvalue()
+            else:
+                pdf = queue.run_in_process(render_pdf, self.data, images)
+            put_report(key, pdf)
+        return pdf
+    
+    def submit_pdf_report(self):
+        """Enfileira a geração do relatório em segundo plano; retorna o ID da tarefa
+        
+        Sessões que pedem o mesmo relatório (mesmo conteúdo e regras) compartilham a tarefa.
+        """
+        from nutricional.jobs import report_queue
+        
+        return report_queue.submit(
+            self.snapshot().generate_pdf_report, queue=report_queue,
+            key=('relatorio', self.content_hash, self.rules.fingerprint)
+        )
+
+# Filtros do sidebar sobre o índice dos pacientes armazenados (campo -> rótulo)
+SEARCH_FILTERS = {
+    'mna_total': "Score MNA",
+    'imc': "IMC (kg/m²)",
+    'albumina': "Albumina (g/dL)",
+    'hemoglobina': "Hemoglobina (g/dL)",
+    'peso_atual': "Peso Atual (kg)",
+}
+
+# Pacientes listados no seletor após a busca (os demais são apenas contados)
+SEARCH_MAX_OPTIONS = 500
+
+def search_stored_patients(index):
+    """Busca por nome/registro e filtros por faixa no sidebar; retorna os pacientes encontrados"""
+    text = st.sidebar.text_input("🔎 Buscar paciente", placeholder="Nome ou número de registro")
+    ranges = {}
+    with st.sidebar.expander("Filtros"):
+        for field, label in SEARCH_FILTERS.items():
+            bounds = index.bounds(field)
+            if bounds is None or bounds[0] == bounds[1]:
+                continue
+            low, high = st.slider(label, bounds[0], bounds[1], bounds)
+            # Na faixa completa o filtro não é aplicado (mantém quem não tem o campo)
+            if (low, high) != bounds:
+                ranges[field] = (low, high)
+    with measure('search_patients'):
+        positions = index.query(text, ranges)
+    return index.select(positions[:SEARCH_MAX_OPTIONS]), len(positions)
+
+def select_stored_assessment():
+    """Seleciona no sidebar um paciente e uma avaliação do banco de pacientes"""
+    from nutricional.search import patient_index
+    
+    store = default_store()
+    index = patient_index(store)
+    if not len(index):
+        st.sidebar.info("Nenhum paciente armazenado. Salve uploads ou use `python -m nutricional.store ingest`.")
+        return None
+    
+    patients, found = search_stored_patients(index)
+    if not patients:
+        st.sidebar.warning("Nenhum paciente atende à busca e aos filtros.")
+        return None
+    st.sidebar.caption(
+        f"{found} de {len(index)} pacientes" + (f" (exibindo {len(patients)})" if found > len(patients) else "")
+    )
+    # Opções pela posição: nome e registro podem se repetir entre pacientes
+    position = st.sidebar.selectbox(
+        "Paciente", range(len(patients)), format_func=lambda i: patient_label(patients[i])
+    )
+    patient = patients[position]
+    registro = patient['registro']
+    if registro is None:
+        # Sem registro, a avaliação (a única do "paciente") é identificada pelo hash
+        return None, patient['content_hash']
+    # A avaliação é escolhida pelo hash: o paciente pode ter duas na mesma data (ou sem data)
+    assessments = {
+        assessment['content_hash']: assessment_label(assessment) for assessment in store.list_assessments(registro)
+    }
+    content_hash = st.sidebar.selectbox("Avaliação", list(assessments), format_func=assessments.get)
+    return registro, content_hash
+
+def patient_label(patient):
+    """Rótulo de um paciente armazenado: nome e número de registro"""
+    return f"{patient['nome'] or 'Sem nome'} ({patient['registro'] or 'sem registro'})"
+
+def assessment_label(assessment):
+    """Rótulo de uma avaliação armazenada: data (ou a falta dela) e arquivo de origem"""
+    label = assessment['data_avaliacao'] or f"Sem data (importada em {assessment['importado_em'][:10]})"
+    return f"{label} — {assessment['arquivo']}" if assessment['arquivo'] else label
+
+# Intervalo (segundos) entre as consultas ao estado de um relatório em geração
+REPORT_POLL_SECONDS = 1.0
+
+# Apenas o fragmento é reexecutado durante a espera, não a página inteira
+@st.fragment(run_every=REPORT_POLL_SECONDS)
+def poll_report_job(job_id):
+    """Mostra o andamento da tarefa; ao terminar, reexecuta a página para exibir o resultado"""
+    from nutricional.jobs import PENDING, RUNNING, report_queue
+    
+    status = report_queue.status(job_id)
+    if status is None or status['estado'] not in (PENDING, RUNNING):
+        st.rerun()
+    label = "Aguardando na fila" if status['estado'] == PENDING else "Gerando relatório"
+    st.info(f"⏳ {label}... ({status['segundos']:.0f}s)")
+
+def render_report_job(dashboard, file_name):
+    """Botão do relatório PDF: enfileira a geração e acompanha a tarefa da sessão"""
+    from nutricional.jobs import DONE, PENDING, RUNNING, report_queue
+    
+    jobs = st.session_state.setdefault('report_jobs', {})
+    if st.button("📄 Gerar Relatório PDF", type="primary"):
+        jobs[dashboard.content_hash] = dashboard.submit_pdf_report()
+    
+    job_id = jobs.get(dashboard.content_hash)
+    if job_id is None:
+        return
+    status = report_queue.status(job_id)
+    if status is None:
+        del jobs[dashboard.content_hash]
+        st.info("O relatório gerado expirou. Gere-o novamente.")
+    elif status['estado'] in (PENDING, RUNNING):
+        poll_report_job(job_id)
+    elif status['estado'] == DONE:
+        st.download_button(
+            label="⬇️ Baixar Relatório PDF",
+            data=report_queue.result(job_id),
+            file_name=file_name,
+            mime="application/pdf"
+        )
+        st.success("✅ Relatório gerado com sucesso!")
+    else:
+        del jobs[dashboard.content_hash]
+        st.error(f"❌ Erro ao gerar o relatório: {status['erro']}")
+
+def render_chart(fig):
+    """Exibe uma figura Plotly, medindo a serialização (plotly.io.to_json) e o envio ao navegador"""
+    with measure('render_chart'):
+        st.plotly_chart(fig, use_container_width=True)
+
+def render_intake(dashboard, intake):
+    """Consumo calculado do registro alimentar: energia por refeição, médias e totais diários"""
+    from nutricional.intake import NUTRIENTS
+    
+    st.markdown("**Registro Alimentar:**")
+    fig_meals = dashboard.get_chart("meal_intake")
+    if fig_meals:
+        render_chart(fig_meals)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Média diária por refeição:**")
+        st.dataframe(intake['media_refeicoes'].rename(columns=NUTRIENTS).round(1), use_container_width=True)
+    with col2:
+        st.markdown("**Total por dia:**")
+        st.dataframe(intake['dias'].rename(columns=NUTRIENTS).round(1), use_container_width=True)
+    
+    if intake['nao_encontrados']:
+        st.warning(
+            f"⚠️ {len(intake['nao_encontrados'])} alimentos não encontrados na tabela de composição "
+            f"(não somados): {', '.join(intake['nao_encontrados'])}"
+        )
+
+HISTORY_WINDOWS = {"30 dias": "30D", "90 dias": "90D", "6 meses": "182D", "1 ano": "365D"}
+
+def create_history_chart(history, column, window, reference=None):
+    """Evolução de uma série do paciente: avaliações e média móvel, reduzidas por LTTB"""
+    from nutricional.timeseries import TREND_SERIES, downsample, rolling_stats
+    
+    title, unit = TREND_SERIES[column]
+    dates, values = downsample(history['data_avaliacao'], history[column])
+    stats = rolling_stats(history, column, window)
+    mean_dates, mean_values = downsample(stats['data_avaliacao'], stats['media'])
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=dates, y=values, mode='markers', name='Avaliações', marker_color='#2E8B57'))
+    fig.add_trace(go.Scatter(x=mean_dates, y=mean_values, mode='lines', name='Média móvel', line_color='#FF6B6B'))
+    if reference is not None:
+        fig.add_hline(y=reference, line_dash='dash', line_color='gray', annotation_text='Referência')
+    fig.update_layout(
+        title=f"{title} ({unit})",
+        xaxis_title="Data da avaliação",
+        yaxis_title=unit,
+        template="plotly_white",
+        height=350
+    )
+    return fig
+
+def render_patient_history(dashboard, registro, assessments):
+    """Aba de evolução: séries das avaliações armazenadas do paciente"""
+    from nutricional.timeseries import TREND_LABS, TREND_SERIES
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        columns = st.multiselect(
+            "Séries",
+            list(TREND_SERIES),
+            default=list(TREND_SERIES),
+            format_func=lambda column: TREND_SERIES[column][0]
+        )
+    with col2:
+        window = HISTORY_WINDOWS[st.selectbox("Janela da média móvel", list(HISTORY_WINDOWS), index=1)]
+    
+    # As figuras mudam apenas quando o conjunto de avaliações muda
+    hashes = tuple(assessment['content_hash'] for assessment in assessments)
+    history = None
+    for column in columns:
+        key = ('history', hashes, column, window)
+        fig = figure_cache.get(key)
+        if fig is None:
+            if history is None:
+                history = default_store().load_history([registro])
+            reference = dashboard.rules.lab_reference(TREND_LABS[column]) if column in TREND_LABS else None
+            fig = create_history_chart(history, column, window, reference)
+            figure_cache.put(key, fig)
+        render_chart(fig)
+
+EXPORT_MIME_TYPES = {
+    '.parquet': 'application/vnd.apache.parquet',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+def render_metrics_export(table):
+    """Exporta as métricas calculadas de todos os pacientes da coorte (Parquet ou XLSX)"""
+    from nutricional.export import export_metrics, split_table
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        suffix = st.selectbox("Formato", list(EXPORT_MIME_TYPES), format_func=lambda s: s.lstrip('.').upper())
+    with col2:
+        st.caption("IMC, MNA, exames alterados e metas vs consumo de cada paciente, gravados em lotes.")
+    if st.button("📤 Exportar Métricas"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / f"metricas_coorte{suffix}"
+            with st.spinner("Exportando métricas..."):
+                total = export_metrics(split_table(table), path)
+            st.download_button(
+                label=f"⬇️ Baixar Métricas ({total} pacientes)",
+                data=path.read_bytes(),
+                file_name=f"metricas_coorte_{datetime.now().strftime('%Y%m%d')}{suffix}",
+                mime=EXPORT_MIME_TYPES[suffix]
+            )
+
+def render_cohort_history():
+    """Evolução da coorte armazenada: mediana e intervalo interquartil por mês"""
+    from nutricional.timeseries import TREND_SERIES, cohort_trend
+    
+    st.markdown("**Evolução da Coorte:**")
+    column = st.selectbox("Série", list(TREND_SERIES), format_func=lambda column: TREND_SERIES[column][0])
+    store = default_store()
+    key = ('cohort_history', store.path, store.count(), column)
+    fig = figure_cache.get(key)
+    if fig is None:
+        title, unit = TREND_SERIES[column]
+        trend = cohort_trend(store.load_history(), column)
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=trend['data_avaliacao'], y=trend['p75'], mode='lines', line_width=0, showlegend=False))
+        fig.add_trace(go.Scatter(
+            x=trend['data_avaliacao'], y=trend['p25'], mode='lines', line_width=0,
+            fill='tonexty', fillcolor='rgba(46, 139, 87, 0.2)', name='P25-P75'
+        ))
+        fig.add_trace(go.Scatter(x=trend['data_avaliacao'], y=trend['mediana'], mode='lines+markers', name='Mediana', line_color='#2E8B57'))
+        fig.update_layout(
+            title=f"{title} ({unit}) por mês",
+            xaxis_title="Mês",
+            yaxis_title=unit,
+            template="plotly_white",
+            height=400
+        )
+        figure_cache.put(key, fig)
+    render_chart(fig)
+
+def create_summary_charts(summary, rules):
+    """Gráficos do resumo da coorte armazenada (IMC, MNA, exames e metas)"""
+    from nutricional.summary import GOAL_BANDS
+    
+    imc_labels = [label for label in rules.imc.labels[:-1] if label in summary['imc']]
+    fig_imc = go.Figure(go.Bar(
+        x=imc_labels,
+        y=[summary['imc'][label] for label in imc_labels],
+        marker_color='#2E8B57'
+    ))
+    fig_imc.update_layout(title="Classificação do IMC", yaxis_title="Pacientes", template="plotly_white")
+    
+    mna_labels = [label for label in rules.mna.labels[:-1] if label in summary['mna']]
+    fig_mna = go.Figure(go.Pie(
+        labels=mna_labels,
+        values=[summary['mna'][label] for label in mna_labels],
+        marker_colors=[rules.mna.colors[list(rules.mna.labels).index(label)] for label in mna_labels],
+        hole=0.4
+    ))
+    fig_mna.update_layout(title="Prevalência de Risco (MNA)", template="plotly_white")
+    
+    labs = summary['exames']
+    fig_labs = go.Figure(go.Bar(
+        x=list(labs),
+        y=[fraction * 100 for fraction in labs.values()],
+        marker_color='#FF6B6B'
+    ))
+    fig_labs.update_layout(title="Exames Fora da Referência", yaxis_title="% de pacientes", template="plotly_white")
+    
+    fig_goals = go.Figure()
+    goal_names = {'calorias': 'Calorias', 'proteinas': 'Proteínas'}
+    for label, color in zip(GOAL_BANDS.labels[:-1], GOAL_BANDS.colors[:-1]):
+        fig_goals.add_trace(go.Bar(
+            name=label,
+            y=[goal_names.get(goal, goal) for goal in summary['metas']],
+            x=[goal['faixas'].get(label, 0) / goal['pacientes'] * 100 for goal in summary['metas'].values()],
+            orientation='h',
+            marker_color=color
+        ))
+    fig_goals.update_layout(
+        title="Atingimento das Metas (consumo / prescrição)",
+        barmode='stack',
+        xaxis_title="% de pacientes",
+        template="plotly_white"
+    )
+    return {'imc': fig_imc, 'mna': fig_mna, 'exames': fig_labs, 'metas': fig_goals}
+
+def render_store_summary(dashboard):
+    """Aba da coorte armazenada: resumo pré-calculado no banco, sem percorrer os pacientes"""
+    summary = default_store().summary()
+    if not summary['pacientes']:
+        st.info("Nenhum paciente armazenado. Salve avaliações ou use `python -m nutricional.ingest`.")
+        return
+    
+    total = summary['pacientes']
+    at_risk = sum(count for label, count in summary['mna'].items() if label != dashboard.rules.mna.labels[MNA_NORMAL])
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Pacientes", total)
+    with col2:
+        st.metric("Risco/Desnutrição (MNA)", f"{at_risk / total:.0%}")
+    for column, goal, title in ((col3, 'calorias', "Meta Calórica (média)"), (col4, 'proteinas', "Meta Proteica (média)")):
+        with column:
+            if goal in summary['metas']:
+                st.metric(title, f"{summary['metas'][goal]['media']:.0%}")
+            else:
+                st.metric(title, "N/A")
+    
+    # O resumo muda apenas quando há novas importações
+    version = json.dumps(summary, sort_keys=True)
+    charts = {}
+    for chart in ('imc', 'mna', 'exames', 'metas'):
+        charts[chart] = figure_cache.get(('store_summary', version, chart))
+    if any(fig is None for fig in charts.values()):
+        charts = create_summary_charts(summary, dashboard.rules)
+        for chart, fig in charts.items():
+            figure_cache.put(('store_summary', version, chart), fig)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        render_chart(charts['imc'])
+        render_chart(charts['exames'])
+    with col2:
+        render_chart(charts['mna'])
+        render_chart(charts['metas'])
+
+def render_cohort_view():
+    """Visão de coorte: vários pacientes analisados em conjunto"""
+    import pandas as pd
+    import plotly.express as px
+    from nutricional.cohort import compute_cohort_metrics, lab_flag_rates, load_cohort
+    
+    uploaded_files = st.sidebar.file_uploader(
+        "Selecione os arquivos dos pacientes",
+        type=UPLOAD_TYPES,
+        accept_multiple_files=True,
+        help="Arquivos CSV (um por paciente) ou exportações XLSX, Parquet e Arrow com um paciente por linha"
+    )
+    directory = st.sidebar.text_input(
+        "Ou informe um diretório no servidor",
+        help="Todos os arquivos CSV, XLSX, Parquet e Arrow do diretório (e subdiretórios) serão carregados"
+    )
+    use_store = st.sidebar.checkbox(
+        "Incluir pacientes armazenados",
+        help="Inclui a avaliação mais recente de cada paciente do banco de pacientes"
+    )
+    
+    sources = list(uploaded_files or [])
+    if directory:
+        if Path(directory).is_dir():
+            sources.extend(iter_export_files(directory))
+        else:
+            st.sidebar.error("❌ Diretório não encontrado.")
+    
+    if not sources and not use_store:
+        st.info("👆 Faça upload dos arquivos dos pacientes ou informe um diretório para analisar a coorte.")
+        return
+    
+    if sources and st.sidebar.button("💾 Salvar no banco de pacientes"):
+        added = default_store().ingest(sources)
+        st.sidebar.success(f"✅ {added} avaliações novas salvas")
+    
+    try:
+        tables = []
+        if sources:
+            tables.append(load_cohort(sources))
+        if use_store:
+            tables.append(default_store().load_table())
+        table = pd.concat(tables, ignore_index=True)
+    except Exception as e:
+        st.error(f"Erro ao carregar a coorte: {str(e)}")
+        return
+    
+    metrics = compute_cohort_metrics(table)
+    st.sidebar.success(f"✅ {len(table)} pacientes carregados")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Pacientes", len(metrics))
+    with col2:
+        st.metric("IMC Médio", f"{metrics['imc'].mean():.1f}")
+    with col3:
+        st.metric("Score MNA Médio", f"{metrics['mna_total'].mean():.1f}")
+    with col4:
+        at_risk = metrics['mna_total'].lt(24).sum()
+        st.metric("Risco/Desnutrição (MNA)", f"{at_risk}")
+    
+    divergent = int(metrics['mna_conferencia'].eq('Divergente').sum())
+    if divergent:
+        st.warning(f"⚠️ {divergent} paciente(s) com Pontuação Total do MNA diferente da soma das respostas")
+    
+    st.markdown("---")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        imc_counts = metrics['imc_classificacao'].value_counts()
+        fig_imc = px.bar(
+            x=imc_counts.index, y=imc_counts.values,
+            labels={'x': 'Classificação', 'y': 'Pacientes'},
+            title="Classificação do IMC", template="plotly_white"
+        )
+        fig_imc.update_traces(marker_color='#2E8B57')
+        render_chart(fig_imc)
+    
+    with col2:
+        fig_mna = px.histogram(
+            metrics, x='mna_total', color='mna_classificacao', nbins=30,
+            labels={'mna_total': 'Pontuação MNA', 'mna_classificacao': 'Diagnóstico'},
+            title="Distribuição do Score MNA", template="plotly_white"
+        )
+        render_chart(fig_mna)
+    
+    rates = lab_flag_rates(metrics) * 100
+    fig_labs = px.bar(
+        x=rates.index, y=rates.values,
+        labels={'x': 'Exame', 'y': '% de pacientes'},
+        title="Exames Fora da Referência", template="plotly_white"
+    )
+    fig_labs.update_traces(marker_color='#FF6347')
+    render_chart(fig_labs)
+    
+    st.markdown("**Pacientes:**")
+    st.dataframe(metrics, use_container_width=True)
+    render_metrics_export(table)
+    
+    if use_store:
+        render_cohort_history()
+
+    st.markdown("---")
+    
+    # Relatórios em lote, gerados em paralelo e compactados em um ZIP
+    if sources and st.button("📄 Gerar Relatórios PDF da Coorte", type="primary"):
+        from nutricional.batch import run_batch
+        
+        progress_bar = st.progress(0.0, text="Gerando relatórios...")
+        
+        def update_progress(done, total, result):
+            progress_bar.progress(done / total, text=f"{done}/{total} relatórios ({result['arquivo']})")
+        
+        # Exportações tabulares geram um relatório por linha (``run_batch``)
+        batch_sources = [
+            (source.name, source.getvalue()) if hasattr(source, 'getvalue') else source
+            for source in sources
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_path = Path(tmp_dir) / "relatorios_nutricionais.zip"
+            results = run_batch(batch_sources, zip_path=zip_path, progress=update_progress)
+            with open(zip_path, 'rb') as zip_file:
+                st.download_button(
+                    label="⬇️ Baixar Relatórios (ZIP)",
+                    data=zip_file,
+                    file_name=f"relatorios_nutricionais_{datetime.now().strftime('%Y%m%d')}.zip",
+                    mime="application/zip"
+                )
+        
+        failures = [result for result in results if result['erro']]
+        if failures:
+            st.warning(f"⚠️ {len(failures)} de {len(results)} relatórios falharam.")
+        else:
+            st.success(f"✅ {len(results)} relatórios gerados com sucesso!")
+        st.dataframe(pd.DataFrame(results), use_container_width=True)
+    
+    # Relatório consolidado: resumo e uma seção por paciente, montado em partes e gravado em arquivo temporário
+    if st.button("📑 Gerar Relatório Consolidado da Coorte"):
+        from nutricional.cohort import iter_table_sections
+        from nutricional.report import build_cohort_report
+        
+        progress_bar = st.progress(0.0, text="Gerando relatório consolidado...")
+        
+        def update_consolidated(done):
+            if done % 100 == 0 or done == len(table):
+                progress_bar.progress(done / len(table), text=f"{done}/{len(table)} pacientes")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = Path(tmp_dir) / "relatorio_coorte.pdf"
+            build_cohort_report(iter_table_sections(table), str(pdf_path), metrics, progress=update_consolidated)
+            with open(pdf_path, 'rb') as pdf_file:
+                st.download_button(
+                    label="⬇️ Baixar Relatório Consolidado",
+                    data=pdf_file,
+                    file_name=f"relatorio_coorte_{datetime.now().strftime('%Y%m%d')}.pdf",
+                    mime="application/pdf"
+                )
+        st.success(f"✅ Relatório consolidado com {len(table)} pacientes gerado!")
+
+def session_dashboard():
+    """Modelo do paciente da sessão, criado no primeiro acesso e reaproveitado nos reruns"""
+    if 'dashboard' not in st.session_state:
+        st.session_state['dashboard'] = NutritionDashboard()
+    return st.session_state['dashboard']
 
 def main():
     st.markdown('<h1 class="main-header">🍎 Dashboard Nutricional</h1>', unsafe_allow_html=True)
     
-    dashboard = NutritionDashboard()
+    dashboard = session_dashboard()
     
     # Sidebar
     st.sidebar.title("📁 Carregar Dados")
-    uploaded_file = st.sidebar.file_uploader(
-        "Selecione o arquivo CSV do paciente",
-        type=['csv'],
-        help="Faça upload do arquivo CSV com os dados nutricionais do paciente"
-    )
+    mode = st.sidebar.radio("Modo", ["Paciente", "Coorte"], horizontal=True)
+    
+    if mode == "Coorte":
+        render_cohort_view()
+        return
+    
+    origin = st.sidebar.radio("Origem", ["Upload", "Pacientes armazenados"], horizontal=True)
+    
+    uploaded_file = None
+    stored_assessment = None
+    if origin == "Upload":
+        uploaded_file = st.sidebar.file_uploader(
+            "Selecione o arquivo do paciente",
+            type=UPLOAD_TYPES,
+            help="Arquivo CSV com os dados nutricionais do paciente, ou uma exportação XLSX, Parquet ou Arrow"
+        )
+    else:
+        stored_assessment = select_stored_assessment()
     
-    if uploaded_file is not None:
-        if dashboard.load_csv_data(uploaded_file):
-            st.sidebar.success("✅ Arquivo carregado com sucesso!")
+    if uploaded_file is not None or stored_assessment is not None:
+        if uploaded_file is not None:
+            loaded = dashboard.load_csv_data(uploaded_file)
+        else:
+            loaded = dashboard.load_stored_patient(default_store(), *stored_assessment)
+        
+        if loaded:
+            if uploaded_file is not None:
+                st.sidebar.success("✅ Arquivo carregado com sucesso!")
+                if st.sidebar.button("💾 Salvar no banco de pacientes"):
+                    default_store().add(dashboard.content_hash, dashboard.data, uploaded_file.name)
+                    st.sidebar.success("✅ Avaliação salva no banco de pacientes")
             
             # Informações básicas do paciente
             patient_info = dashboard.get_patient_info()
@@ -459,15 +1041,18 @@ def main():
             if patient_info:
                 st.sidebar.markdown("### 👤 Informações do Paciente")
                 st.sidebar.write(f"**Nome:** {patient_info.get('Nome', 'N/A')}")
-                st.sidebar.write(f"**Idade:** {2025 - int(patient_info.get('Data de Nascimento', '1900').split('-')[0])} anos")
+                age = dashboard.derive('idade', dashboard.get_patient_age)
+                st.sidebar.write(f"**Idade:** {age if age is not None else 'N/A'} anos")
                 st.sidebar.write(f"**Sexo:** {patient_info.get('Sexo', 'N/A')}")
             
             # Layout principal
             col1, col2, col3, col4 = st.columns(4)
             
-            # Métricas principais
+            # Métricas principais (calculadas uma vez por paciente, no modelo da sessão)
             anthro = dashboard.get_anthropometry_data()
-            imc = dashboard.calculate_imc()
+            mna = dashboard.get_mna_data()
+            metrics = dashboard.metrics
+            imc = metrics['imc']
             
             with col1:
                 peso = anthro.get('Peso Atual (kg)', 0)
@@ -478,26 +1063,40 @@ def main():
                 st.metric("Altura", f"{altura} cm")
             
             with col3:
-                if imc:
-                    classification, color = dashboard.classify_imc(imc)
-                    st.metric("IMC", f"{imc:.1f}", help=f"Classificação: {classification}")
+                if imc is not None:
+                    st.metric("IMC", f"{imc:.1f}", help=f"Classificação: {metrics['imc_classificacao']}")
                 else:
                     st.metric("IMC", "N/A")
             
             with col4:
-                mna = dashboard.get_mna_data()
                 mna_score = mna.get('Pontuação Total', 0)
                 st.metric("Score MNA", f"{mna_score}")
             
             st.markdown("---")
             
             # Abas para diferentes visualizações
-            tab1, tab2, tab3, tab4 = st.tabs(["📊 Antropometria", "🧪 Exames", "🎯 Avaliação MNA", "🍽️ Nutrição"])
+            # Apenas a aba selecionada é executada; com st.tabs todas as abas
+            # (e seus gráficos) seriam construídas a cada rerun
+            views = ["📊 Antropometria", "🧪 Exames", "🎯 Avaliação MNA", "🍽️ Nutrição"]
+            # A evolução aparece quando há mais de uma avaliação armazenada do paciente
+            registro = patient_info.get('Número de Registro')
+            assessments = dashboard.list_assessments(default_store())
+            if len(assessments) > 1:
+                views.append("📈 Evolução")
+            views.append("🏥 Coorte")
+            
+            active_tab = st.radio(
+                "Visualização",
+                views,
+                horizontal=True,
+                label_visibility="collapsed",
+                key="active_tab"
+            )
             
-            with tab1:
+            if active_tab == "📊 Antropometria":
                 st.subheader("Dados Antropométricos")
-                fig_anthro = dashboard.create_anthropometry_chart()
-                st.plotly_chart(fig_anthro, use_container_width=True)
+                fig_anthro = dashboard.get_chart("anthropometry")
+                render_chart(fig_anthro)
                 
                 # Tabela detalhada
                 col1, col2 = st.columns(2)
@@ -522,10 +1121,10 @@ def main():
                     for key, value in composition.items():
                         st.write(f"• {key}: {value}")
             
-            with tab2:
+            elif active_tab == "🧪 Exames":
                 st.subheader("Exames Bioquímicos")
-                fig_bio = dashboard.create_biochemical_chart()
-                st.plotly_chart(fig_bio, use_container_width=True)
+                fig_bio = dashboard.get_chart("biochemical")
+                render_chart(fig_bio)
                 
                 bio = dashboard.get_biochemical_data()
                 col1, col2, col3 = st.columns(3)
@@ -534,7 +1133,7 @@ def main():
                     st.markdown("**Metabolismo:**")
                     st.write(f"• Glicose: {bio.get('Glicose (mg/dL)', 'N/A')} mg/dL")
                     st.write(f"• Ureia: {bio.get('Ureia (mg/dL)', 'N/A')} mg/dL")
-                    st.write(f"• Creatinina: {bio.get('Createina (mg/dL)', 'N/A')} mg/dL")
+                    st.write(f"• Creatinina: {'N/A' if dashboard.record.creatinina is None else dashboard.record.creatinina} mg/dL")
                 
                 with col2:
                     st.markdown("**Lipídios:**")
@@ -548,37 +1147,60 @@ def main():
                     st.write(f"• Hemoglobina: {bio.get('Hemoglobina (g/dL)', 'N/A')} g/dL")
                     st.write(f"• Ferritina: {bio.get('Ferritina (ng/mL)', 'N/A')} ng/mL")
             
-            with tab3:
+            elif active_tab == "🎯 Avaliação MNA":
                 st.subheader("Mini Avaliação Nutricional (MNA)")
-                fig_mna = dashboard.create_mna_radar_chart()
-                st.plotly_chart(fig_mna, use_container_width=True)
+                fig_mna = dashboard.get_chart("mna_radar")
+                render_chart(fig_mna)
                 
-                mna = dashboard.get_mna_data()
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.markdown("**Resultado:**")
-                    score = mna.get('Pontuação Total', 0)
-                    diagnosis = mna.get('Diagnóstico', 'N/A')
+                    mna_score = dashboard.get_mna_score()
+                    screening, assessment = mna_score['triagem'], mna_score['avaliacao']
+                    st.write(f"• Triagem (A-F): {'N/A' if screening is None else f'{screening:g}'} / 14")
+                    st.write(f"• Avaliação global (G-R): {'N/A' if assessment is None else f'{assessment:g}'} / 16")
+                    if mna_score['calculado'] is not None:
+                        st.write(f"• Total calculado: {mna_score['calculado']:g} / 30 "
+                                 f"(informado: {mna.get('Pontuação Total', 'N/A')})")
+                    if mna_score['conferencia'] == 'Divergente':
+                        st.warning(f"⚠️ O total informado ({mna.get('Pontuação Total')}) "
+                                   "não confere com a soma das respostas")
+                    if mna_score['invalidos']:
+                        st.warning(f"⚠️ {mna_score['invalidos']} resposta(s) fora dos pontos do questionário")
                     
-                    if score >= 24:
-                        st.success(f"Score: {score} - Estado nutricional normal")
-                    elif score >= 17:
-                        st.warning(f"Score: {score} - {diagnosis}")
+                    # Classificação pelo total calculado (ou, incompleto, pelo informado ou pela triagem)
+                    score = mna_score['pontuacao'] if mna_score['pontuacao'] is not None else screening
+                    label = mna_score['classificacao']
+                    if label is None:
+                        st.info("Score: N/A - respostas insuficientes para classificar")
+                    elif mna_score['faixa'] == MNA_NORMAL:
+                        st.success(f"Score: {score:g} - {label}")
+                    elif mna_score['faixa'] == MNA_RISK:
+                        st.warning(f"Score: {score:g} - {label}")
                     else:
-                        st.error(f"Score: {score} - Desnutrido")
+                        st.error(f"Score: {score:g} - {label}")
                 
                 with col2:
                     st.markdown("**Interpretação:**")
                     st.write("• 24-30 pontos: Estado nutricional normal")
                     st.write("• 17-23.5 pontos: Risco de desnutrição")
                     st.write("• < 17 pontos: Desnutrição")
-            
-            with tab4:
+                    st.markdown("**Só a triagem (A-F):**")
+                    st.write("• 12-14 pontos: Estado nutricional normal")
+                    st.write("• 8-11 pontos: Risco de desnutrição")
+                    st.write("• 0-7 pontos: Desnutrição")
+
+            elif active_tab == "🍽️ Nutrição":
                 st.subheader("Prescrição vs Consumo Nutricional")
-                fig_nutrition = dashboard.create_nutrition_goals_chart()
+                fig_nutrition = dashboard.get_chart("nutrition_goals")
                 if fig_nutrition:
-                    st.plotly_chart(fig_nutrition, use_container_width=True)
+                    render_chart(fig_nutrition)
+                
+                # Registro alimentar por item: detalhamento por refeição e por dia
+                intake = dashboard.get_intake()
+                if intake is not None:
+                    render_intake(dashboard, intake)
                 
                 # Plano alimentar
                 if 'PRESCRIÇÃO DIETÉTICA' in dashboard.data:
@@ -596,29 +1218,31 @@ def main():
                     
                     with col2:
                         st.markdown("**Restrições e Suplementos:**")
-                        st.write(f"• Restrições: {prescription.get('Restrições Alimentare', 'Nenhuma')}")
+                        restrictions = dashboard.record.restricoes_alimentares
+                        st.write(f"• Restrições: {'Nenhuma' if restrictions is None else restrictions}")
                         st.write(f"• Suplementos: {prescription.get('Suplementos Nutricionais', 'Nenhum')}")
             
+            elif active_tab == "📈 Evolução":
+                st.subheader(f"Evolução ({len(assessments)} avaliações)")
+                render_patient_history(dashboard, registro, assessments)
+            
+            elif active_tab == "🏥 Coorte":
+                st.subheader("Coorte Armazenada")
+                render_store_summary(dashboard)
+            
             st.markdown("---")
             
-            # Botão para gerar PDF
-            if st.button("📄 Gerar Relatório PDF", type="primary"):
-                with st.spinner("Gerando relatório..."):
-                    pdf_buffer = dashboard.generate_pdf_report()
-                    
-                    st.download_button(
-                        label="⬇️ Baixar Relatório PDF",
-                        data=pdf_buffer.getvalue(),
-                        file_name=f"relatorio_nutricional_{patient_info.get('Nome', 'paciente').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                        mime="application/pdf"
-                    )
-                    st.success("✅ Relatório gerado com sucesso!")
+            # Relatório PDF gerado em segundo plano, sem bloquear a sessão
+            render_report_job(
+                dashboard,
+                f"relatorio_nutricional_{patient_info.get('Nome', 'paciente').replace(' ', '_')}_{dashboard.content_hash[:8]}.pdf"
+            )
         
         else:
             st.error("❌ Erro ao carregar o arquivo. Verifique o formato dos dados.")
     
     else:
-        st.info("👆 Faça upload de um arquivo CSV para começar a análise.")
+        st.info("👆 Faça upload de um arquivo do paciente (CSV, XLSX, Parquet ou Arrow) para começar a análise.")
         
         # Instruções
         st.markdown("""
@@ -645,5 +1269,48 @@ def main():
         - ✅ Interface responsiva e intuitiva
         """)
 
+def render_debug_panel():
+    """Painel de depuração (NUTRICIONAL_DEBUG=1): tempos por etapa, caches e cProfile"""
+    import nutricional.timing as timing
+    from nutricional.cache import parse_cache, report_cache
+    from nutricional.jobs import report_queue
+    
+    with st.sidebar.expander("⏱️ Desempenho"):
+        rows = stage_timer.summary()
+        if rows:
+            st.dataframe(
+                [{key: round(value, 2) if isinstance(value, float) else value for key, value in row.items()} for row in rows],
+                hide_index=True
+            )
+        else:
+            st.write("Nenhuma etapa medida ainda.")
+        st.json({
+            'parse': parse_cache.stats(),
+            'figuras': figure_cache.stats(),
+            'imagens': image_cache.stats(),
+            'relatorios': report_cache.stats(),
+            'tarefas': report_queue.stats(),
+        }, expanded=False)
+        st.download_button(
+            "⬇️ Métricas (Prometheus)",
+            data=stage_timer.prometheus_text(),
+            file_name="nutricional.prom",
+            mime="text/plain"
+        )
+        if timing.last_profile:
+            st.markdown("**cProfile da renderização capturada:**")
+            st.code(timing.last_profile)
+
+def run():
+    """Renderiza a página medindo o tempo total (e com cProfile, se NUTRICIONAL_PROFILE)"""
+    try:
+        with profile_once(), measure('main'):
+            main()
+        if DEBUG_PANEL:
+            render_debug_panel()
+    finally:
+        if METRICS_FILE:
+            stage_timer.write_prometheus(METRICS_FILE)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run()
\ No newline at end of file
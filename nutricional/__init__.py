@@ -0,0 +1 @@
+"""Núcleo do Dashboard Nutricional, independente da interface Streamlit."""
@@ -0,0 +1,151 @@
+"""API HTTP/JSON sem interface para parse, métricas e relatórios.
+
+Usa o mesmo parser, cache e motor de classificação do dashboard. O corpo
+das requisições POST é o CSV do paciente, exatamente como exportado. O parse
+e as métricas rodam em threads (mantendo o cache do processo) e os PDFs, no
+pool de processos, sem bloquear o loop de eventos.
+
+    python -m nutricional.api --port 8000 --workers 4
+    python -m nutricional.api --address 0.0.0.0   # aceita conexões de outras máquinas
+
+Endpoints:
+
+    GET  /health          estado do serviço e contadores dos caches
+    POST /parse           seções do CSV em JSON
+    POST /metrics         IMC, MNA e exames classificados
+    POST /report          relatório em PDF (gerado no pool de processos)
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+import tornado.web
+
+from .cache import get_report, load_sections, parse_cache, put_report, report_cache
+from .patient import PatientData
+
+# Sem autenticação, a API escuta apenas na máquina local, a menos que outro endereço seja pedido
+DEFAULT_ADDRESS = '127.0.0.1'
+
+
+def patient_metrics(sections):
+    """IMC, MNA e exames classificados de um paciente"""
+    return PatientData(sections).get_metrics()
+
+
+class JSONHandler(tornado.web.RequestHandler):
+    """Base dos endpoints com respostas (e erros) em JSON"""
+
+    def write_json(self, payload):
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+        self.write(json.dumps(payload, ensure_ascii=False, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        self.write_json({'erro': self._reason, 'status': status_code})
+
+
+class PatientHandler(JSONHandler):
+    """Base dos endpoints que recebem o CSV de um paciente no corpo"""
+
+    async def run_in_thread(self, func, *args):
+        """Executa ``func`` no pool de threads padrão, fora do loop de eventos"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def load_patient(self):
+        """Faz o parse do corpo da requisição (com cache pelo hash do conteúdo)"""
+        if not self.request.body:
+            raise tornado.web.HTTPError(400, reason="Corpo vazio: envie o CSV do paciente")
+        try:
+            return await self.run_in_thread(load_sections, io.BytesIO(self.request.body))
+        except (UnicodeDecodeError, ValueError, csv.Error) as e:
+            raise tornado.web.HTTPError(400, reason=f"CSV inválido: {e}")
+
+
+class HealthHandler(JSONHandler):
+    def get(self):
+        self.write_json({
+            'status': 'ok',
+            'parse_cache': parse_cache.stats(),
+            'report_cache': report_cache.stats(),
+        })
+
+
+class ParseHandler(PatientHandler):
+    async def post(self):
+        key, sections = await self.load_patient()
+        self.write_json({'content_hash': key, 'secoes': sections})
+
+
+class MetricsHandler(PatientHandler):
+    async def post(self):
+        key, sections = await self.load_patient()
+        metrics = await self.run_in_thread(patient_metrics, sections)
+        metrics['content_hash'] = key
+        self.write_json(metrics)
+
+
+class ReportHandler(PatientHandler):
+    def initialize(self, executor):
+        self.executor = executor
+
+    async def post(self):
+        from .report import render_pdf, report_cache_key
+
+        key, sections = await self.load_patient()
+        patient = PatientData(sections)
+        report_key = report_cache_key(key, patient.rules)
+        pdf = get_report(report_key)
+        if pdf is None:
+            # O ReportLab é CPU-bound: roda fora do loop de eventos
+            loop = asyncio.get_running_loop()
+            pdf = await loop.run_in_executor(self.executor, render_pdf, sections)
+            put_report(report_key, pdf)
+        self.set_header('Content-Type', 'application/pdf')
+        self.set_header('Content-Disposition', f'attachment; filename="relatorio_nutricional_{key[:8]}.pdf"')
+        self.write(pdf)
+
+
+def make_app(executor):
+    """Cria a aplicação Tornado com os endpoints da API"""
+    return tornado.web.Application([
+        (r'/health', HealthHandler),
+        (r'/parse', ParseHandler),
+        (r'/metrics', MetricsHandler),
+        (r'/report', ReportHandler, {'executor': executor}),
+    ])
+
+
+async def serve(port, workers, address=DEFAULT_ADDRESS):
+    # Encerra de forma limpa em SIGINT/SIGTERM, finalizando os processos do pool
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        app = make_app(executor)
+        server = app.listen(port, address=address)
+        print(f"API do Dashboard Nutricional em http://{address}:{port}", flush=True)
+        await stop.wait()
+        server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API HTTP/JSON do Dashboard Nutricional")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--address', default=DEFAULT_ADDRESS,
+                        help=f"Endereço de escuta (padrão: {DEFAULT_ADDRESS}; 0.0.0.0 para todas as interfaces)")
+    parser.add_argument('--workers', type=int, default=None, help="Processos para gerar PDFs (padrão: núcleos da CPU)")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.port, args.workers, args.address))
+
+
+if __name__ == '__main__':
+    main()
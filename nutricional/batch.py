@@ -0,0 +1,220 @@
+"""Geração de relatórios PDF em lote, em paralelo entre os núcleos da CPU.
+
+Uso pela linha de comando::
+
+    python -m nutricional.batch pacientes/ --output relatorios/
+    python -m nutricional.batch pacientes/ --zip relatorios.zip --workers 4
+    python -m nutricional.batch pacientes/ --pdf coorte.pdf
+
+Cada relatório é gravado em disco (ou adicionado ao ZIP) assim que fica
+pronto; a falha em um arquivo é registrada e não interrompe o lote. Com
+``--pdf``, todos os pacientes vão para um único relatório consolidado.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from .formats import iter_export_files, read_patients, source_format
+from .parser import parse_sections
+from .patient import PatientData
+from .report import build_cohort_report, build_pdf_report
+
+
+def report_name(source_name):
+    """Nome do PDF gerado a partir do nome do arquivo de origem"""
+    return f'relatorio_{Path(source_name).stem}.pdf'
+
+
+def report_names(source_names):
+    """Nomes distintos dos PDFs, na ordem das fontes
+
+    Arquivos de subdiretórios diferentes podem ter o mesmo nome
+    (``a/paciente.csv`` e ``b/paciente.csv``): as repetições recebem um
+    sufixo (``relatorio_paciente_2.pdf``), para que nenhum relatório
+    sobrescreva outro.
+    """
+    used = set()
+    names = []
+    for source_name in source_names:
+        stem = Path(report_name(source_name)).stem
+        name, suffix = f'{stem}.pdf', 1
+        while name.lower() in used:
+            suffix += 1
+            name = f'{stem}_{suffix}.pdf'
+        used.add(name.lower())
+        names.append(name)
+    return names
+
+
+def render_report(source, output_dir, pdf_name=None):
+    """Gera o PDF de um arquivo de paciente (executado no processo do pool)
+
+    ``source`` é um caminho, uma tupla ``(nome, bytes)`` de um upload ou
+    ``(nome, seções)`` de um paciente lido de uma exportação tabular.
+    ``pdf_name`` é o nome do PDF (padrão: ``report_name`` da origem).
+    Retorna o caminho do PDF e o tempo de geração em segundos.
+    """
+    start = time.perf_counter()
+    name, sections = load_source(source)
+    output = Path(output_dir) / (pdf_name or report_name(name))
+    build_pdf_report(PatientData(sections), str(output))
+    return str(output), time.perf_counter() - start
+
+
+def load_source(source):
+    """Nome e seções de um item de ``expand_sources`` (caminho, ``(nome, bytes)`` ou ``(nome, seções)``)"""
+    if isinstance(source, tuple):
+        name, content = source
+        return name, content if isinstance(content, dict) else parse_sections(io.BytesIO(content))
+    with open(source, 'rb') as file:
+        return Path(source).name, parse_sections(file)
+
+
+def _source_name(source):
+    return source[0] if isinstance(source, tuple) else Path(source).name
+
+
+def expand_sources(sources):
+    """Expande exportações tabulares (XLSX, Parquet, Arrow) em um item ``(nome, seções)`` por paciente
+
+    Os CSVs (caminhos ou ``(nome, bytes)``) passam inalterados.
+    """
+    for source in sources:
+        name = _source_name(source)
+        if source_format(name) == 'csv':
+            yield source
+            continue
+        if isinstance(source, tuple):
+            source = io.BytesIO(source[1])
+        for i, sections in enumerate(read_patients(source, name), start=1):
+            yield f'{Path(name).stem}_{i}', sections
+
+
+def run_batch(sources, output_dir=None, zip_path=None, workers=None, progress=None):
+    """Gera os relatórios de todos os arquivos em um pool de processos
+
+    Os PDFs vão para ``output_dir`` ou, se ``zip_path`` for informado, são
+    adicionados ao ZIP um a um à medida que ficam prontos. ``progress`` é
+    chamado com ``(concluídos, total, resultado)`` após cada relatório.
+    Retorna uma lista de resultados ``{'arquivo', 'pdf', 'segundos', 'erro'}``.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = iter_export_files(sources)
+    sources = list(expand_sources(sources))
+    if zip_path is None and output_dir is None:
+        raise ValueError("Informe output_dir ou zip_path")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        target_dir = tmp_dir if zip_path is not None else output_dir
+        os.makedirs(target_dir, exist_ok=True)
+        archive = zipfile.ZipFile(zip_path, 'w') if zip_path is not None else None
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                names = report_names(_source_name(source) for source in sources)
+                futures = {
+                    pool.submit(render_report, source, target_dir, name): source
+                    for source, name in zip(sources, names)
+                }
+                for future in as_completed(futures):
+                    result = {'arquivo': _source_name(futures[future]), 'pdf': None, 'segundos': None, 'erro': None}
+                    try:
+                        pdf_path, seconds = future.result()
+                        result['segundos'] = seconds
+                        if archive is not None:
+                            archive.write(pdf_path, arcname=Path(pdf_path).name)
+                            os.remove(pdf_path)
+                            result['pdf'] = Path(pdf_path).name
+                        else:
+                            result['pdf'] = pdf_path
+                    except Exception as e:
+                        result['erro'] = f'{type(e).__name__}: {e}'
+                    results.append(result)
+                    if progress is not None:
+                        progress(len(results), len(sources), result)
+        finally:
+            if archive is not None:
+                archive.close()
+    return results
+
+
+def build_consolidated_report(sources, output, progress=None):
+    """Gera um único PDF com o resumo da coorte e uma seção por paciente
+
+    As fontes são lidas duas vezes, em lotes: primeiro as métricas do resumo
+    (``export.iter_source_tables``), depois as seções de cada paciente, que
+    vão para o PDF em partes (``report.build_cohort_report``). Um arquivo que
+    não pode ser lido fica fora do resumo e das seções, sem interromper o
+    relatório. Retorna o número de pacientes e a lista de falhas
+    (``{'arquivo', 'erro'}``).
+    """
+    import pandas as pd
+
+    from .cohort import compute_cohort_metrics
+    from .export import iter_source_tables
+
+    if isinstance(sources, (str, Path)):
+        sources = iter_export_files(sources)
+    sources = list(sources)
+    failures = []
+    metrics = pd.concat(
+        [compute_cohort_metrics(table) for table in iter_source_tables(sources, errors=failures)], ignore_index=True
+    ) if sources else None
+    failed = {failure['arquivo'] for failure in failures}
+
+    def patients():
+        for source in sources:
+            if str(source) in failed:
+                continue
+            try:
+                for item in expand_sources([source]):
+                    yield load_source(item)[1]
+            except Exception as e:
+                failures.append({'arquivo': str(source), 'erro': f'{type(e).__name__}: {e}'})
+
+    done = build_cohort_report(patients(), output, metrics, progress=progress)
+    return done, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera relatórios PDF de todos os pacientes de um diretório")
+    parser.add_argument('directory', help="Diretório com os arquivos dos pacientes (CSV, XLSX, Parquet ou Arrow)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="Diretório de saída dos PDFs")
+    target.add_argument('--zip', help="Arquivo ZIP de saída")
+    target.add_argument('--pdf', help="Relatório consolidado (um único PDF com todos os pacientes)")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: núcleos da CPU)")
+    args = parser.parse_args(argv)
+
+    def progress(done, total, result):
+        if result['erro']:
+            print(f"[{done}/{total}] ERRO {result['arquivo']}: {result['erro']}", file=sys.stderr)
+        else:
+            print(f"[{done}/{total}] {result['arquivo']} -> {result['pdf']} ({result['segundos']:.2f}s)")
+
+    start = time.perf_counter()
+    if args.pdf:
+        def patient_progress(done):
+            if done % 1000 == 0:
+                print(f"{done} pacientes", file=sys.stderr)
+
+        total, failures = build_consolidated_report(args.directory, args.pdf, progress=patient_progress)
+        for failure in failures:
+            print(f"ERRO {failure['arquivo']}: {failure['erro']}", file=sys.stderr)
+        print(f"{total} pacientes em {args.pdf}, {len(failures)} falhas em {time.perf_counter() - start:.1f}s")
+        return 1 if failures else 0
+    results = run_batch(args.directory, output_dir=args.output, zip_path=args.zip,
+                        workers=args.workers, progress=progress)
+    failures = sum(1 for r in results if r['erro'])
+    print(f"{len(results) - failures} relatórios gerados, {failures} falhas em {time.perf_counter() - start:.1f}s")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
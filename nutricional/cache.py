@@ -0,0 +1,226 @@
+"""Caches compartilhados entre sessões e reruns do Streamlit.
+
+O script principal é reexecutado a cada interação, mas os módulos importados
+permanecem em memória no processo do servidor; por isso os caches vivem aqui.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .parser import parse_sections
+
+
+def content_hash(raw):
+    """Retorna o hash SHA-256 do conteúdo (bytes) de um arquivo"""
+    return hashlib.sha256(raw).hexdigest()
+
+
+def file_hash(file, chunk_size=64 * 1024):
+    """Calcula o hash SHA-256 de um arquivo em blocos, sem carregá-lo inteiro
+
+    Retorna o hash e o tamanho em bytes; a posição do arquivo é restaurada.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    start = file.tell()
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(start)
+    return digest.hexdigest(), size
+
+
+class LRUCache:
+    """Cache LRU limitado por número de entradas e por tamanho total em bytes"""
+
+    def __init__(self, max_entries=128, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Busca uma entrada, marcando-a como a mais recente"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, size=1):
+        """Armazena uma entrada e remove as menos usadas se o limite for excedido"""
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Remove todas as entradas e zera os contadores"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class DiskCache:
+    """Cache de bytes em disco, limitado pelo tamanho total dos arquivos
+
+    Cada entrada é um arquivo no diretório; ao exceder ``max_bytes`` são
+    removidas as entradas acessadas há mais tempo (pela data de modificação,
+    atualizada a cada leitura).
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, suffix=''):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}{self.suffix}')
+
+    def get(self, key, default=None):
+        """Lê uma entrada, marcando-a como a mais recente"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return default
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Grava uma entrada (de forma atômica) e aplica o limite de tamanho"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(self.suffix) and not entry.name.endswith('.tmp'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        """Retorna contadores de uso do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+# Resultado do parse dos uploads, indexado pelo hash do conteúdo do arquivo
+parse_cache = LRUCache(max_entries=256, max_bytes=128 * 1024 * 1024)
+
+# Figuras Plotly (go.Figure, não alteradas depois de guardadas), por (hash do
+# conteúdo, gráfico, tema); limitado pelo número de figuras
+figure_cache = LRUCache(max_entries=1024)
+
+# Gráficos rasterizados (PNG) para o relatório em PDF
+image_cache = LRUCache(max_entries=512, max_bytes=128 * 1024 * 1024)
+
+# Consumo calculado do registro alimentar, por (hash do conteúdo, tabela de composição)
+intake_cache = LRUCache(max_entries=1024, max_bytes=64 * 1024 * 1024)
+
+# Relatórios PDF prontos, em memória e, opcionalmente, em disco
+# (diretório indicado em NUTRICIONAL_REPORT_CACHE_DIR)
+report_cache = LRUCache(max_entries=128, max_bytes=128 * 1024 * 1024)
+report_disk_cache = (
+    DiskCache(os.environ['NUTRICIONAL_REPORT_CACHE_DIR'], suffix='.pdf')
+    if os.environ.get('NUTRICIONAL_REPORT_CACHE_DIR') else None
+)
+
+
+def get_report(key):
+    """Busca um PDF no cache em memória e, se ausente, no cache em disco"""
+    pdf = report_cache.get(key)
+    if pdf is None and report_disk_cache is not None:
+        pdf = report_disk_cache.get(key)
+        if pdf is not None:
+            report_cache.put(key, pdf, size=len(pdf))
+    return pdf
+
+
+def put_report(key, pdf):
+    """Armazena um PDF nos caches em memória e em disco"""
+    report_cache.put(key, pdf, size=len(pdf))
+    if report_disk_cache is not None:
+        report_disk_cache.put(key, pdf)
+
+
+def load_sections(file):
+    """Faz o parse do arquivo reaproveitando o cache pelo hash do conteúdo
+
+    Retorna o hash do conteúdo e o dicionário de seções (compartilhado com o
+    cache, portanto não deve ser modificado).
+    """
+    file.seek(0)
+    key, size = file_hash(file)
+    sections = parse_cache.get(key)
+    if sections is None:
+        sections = parse_sections(file)
+        parse_cache.put(key, sections, size=size)
+    return key, sections
@@ -0,0 +1,182 @@
+"""Motor de classificação vetorizado para IMC, MNA e exames laboratoriais.
+
+As faixas ficam em tabelas de limites (``DEFAULT_RULES`` ou um JSON no mesmo
+formato) e cada classificação é um único ``np.digitize`` sobre o array inteiro.
+Os códigos retornados indexam ``labels``/``colors``; ``-1`` indica valor ausente.
+
+Formato de uma tabela::
+
+    {"edges": [18.5, 25, 30],
+     "labels": ["Baixo peso", "Normal", "Sobrepeso", "Obesidade"],
+     "colors": ["#dc3545", "#28a745", "#fd7e14", "#dc3545"],
+     "group_by": "sexo" | "idade",          # opcional
+     "groups": {"Feminino": [...], "65": [...]}}   # limites por grupo
+
+Com ``group_by: "idade"`` a chave do grupo é a idade mínima a partir da qual
+os limites se aplicam. Exames usam ``low``/``high`` (faixa normal inclusiva) em
+vez de ``edges``.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+
+MISSING = -1
+
+# Faixas da tabela MNA padrão
+MNA_MALNOURISHED, MNA_RISK, MNA_NORMAL = 0, 1, 2
+
+LAB_LABELS = ['Baixo', 'Normal', 'Alto']
+LAB_COLORS = ['#fd7e14', '#28a745', '#dc3545']
+LAB_NORMAL = 1
+
+DEFAULT_RULES = {
+    'imc': {
+        'edges': [18.5, 25, 30],
+        'labels': ['Baixo peso', 'Normal', 'Sobrepeso', 'Obesidade'],
+        'colors': ['#dc3545', '#28a745', '#fd7e14', '#dc3545'],
+    },
+    'mna': {
+        'edges': [17, 24],
+        'labels': ['Desnutrido', 'Risco de desnutrição', 'Estado nutricional normal'],
+        'colors': ['#dc3545', '#fd7e14', '#28a745'],
+    },
+    # Triagem do MNA (itens A-F, até 14 pontos)
+    'mna_triagem': {
+        'edges': [8, 12],
+        'labels': ['Desnutrido', 'Risco de desnutrição', 'Estado nutricional normal'],
+        'colors': ['#dc3545', '#fd7e14', '#28a745'],
+    },
+    'labs': {
+        'Glicose': {'field': 'Glicose (mg/dL)', 'high': 100, 'reference': 100},
+        'Colesterol': {'field': 'Colesterol total (mg/dL)', 'high': 200, 'reference': 200},
+        'HDL': {'field': 'HDL (mg/dL)', 'low': 40, 'reference': 40},
+        'LDL': {'field': 'LDL (mg/dL)', 'high': 100, 'reference': 100},
+        'Albumina': {'field': 'Albumina (g/dL)', 'low': 3.5, 'reference': 3.5},
+        'Hemoglobina': {'field': 'Hemoglobina (g/dL)', 'low': 14, 'reference': 14},
+    },
+}
+
+
+class BandTable:
+    """Tabela de faixas com limites crescentes, rótulos e cores"""
+
+    def __init__(self, edges, labels, colors, group_by=None, groups=None):
+        if len(labels) != len(edges) + 1 or len(colors) != len(labels):
+            raise ValueError("A tabela precisa de um rótulo e uma cor a mais que o número de limites")
+        self.edges = np.asarray(edges, dtype=float)
+        self.labels = np.array(list(labels) + [None], dtype=object)
+        self.colors = np.array(list(colors) + [None], dtype=object)
+        self.group_by = group_by
+        groups = groups or {}
+        self.group_keys = list(groups)
+        # Linha 0 são os limites padrão; as demais, os de cada grupo
+        self.group_edges = np.vstack([self.edges] + [np.asarray(e, dtype=float) for e in groups.values()])
+        if group_by == 'idade':
+            order = np.argsort([float(k) for k in self.group_keys])
+            self.group_keys = [self.group_keys[i] for i in order]
+            self.group_edges = self.group_edges[np.r_[0, order + 1]]
+            self.age_cutoffs = np.array([float(k) for k in self.group_keys])
+
+    def _group_index(self, sex=None, age=None):
+        """Índice da linha de limites a usar para cada valor"""
+        if self.group_by == 'sexo' and sex is not None:
+            sex = np.asarray(sex, dtype=object)
+            index = np.zeros(sex.shape, dtype=np.intp)
+            for i, key in enumerate(self.group_keys, start=1):
+                index[sex == key] = i
+            return index
+        if self.group_by == 'idade' and age is not None:
+            age = np.asarray(age, dtype=float)
+            index = np.searchsorted(self.age_cutoffs, age, side='right')
+            index[np.isnan(age)] = 0
+            return index
+        return None
+
+    def codes(self, values, sex=None, age=None):
+        """Classifica um array de valores, retornando os códigos das faixas"""
+        values = np.asarray(values, dtype=float)
+        index = self._group_index(sex, age)
+        if index is None:
+            codes = np.digitize(values, self.edges).astype(np.int8)
+        else:
+            edges = self.group_edges[np.broadcast_to(index, values.shape)]
+            codes = (values[..., None] >= edges).sum(axis=-1).astype(np.int8)
+        codes[np.isnan(values)] = MISSING
+        return codes
+
+    def classify(self, values, sex=None, age=None):
+        """Retorna códigos, rótulos e cores de um array de valores"""
+        codes = self.codes(values, sex, age)
+        return codes, self.labels[codes], self.colors[codes]
+
+    def classify_one(self, value, sex=None, age=None):
+        """Classifica um único valor, retornando (rótulo, cor)"""
+        sex = None if sex is None else [sex]
+        age = None if age is None else [age]
+        code = self.codes([value], sex, age)[0]
+        return self.labels[code], self.colors[code]
+
+
+def lab_table(spec):
+    """Monta a tabela de faixas de um exame a partir de low/high inclusivos"""
+    def edges(low=None, high=None):
+        # O próximo float após ``high`` torna o limite superior inclusivo
+        return [
+            -np.inf if low is None else low,
+            np.inf if high is None else np.nextafter(high, np.inf),
+        ]
+
+    groups = {
+        key: edges(*bounds) for key, bounds in spec.get('groups', {}).items()
+    }
+    return BandTable(
+        edges(spec.get('low'), spec.get('high')),
+        LAB_LABELS,
+        LAB_COLORS,
+        group_by=spec.get('group_by'),
+        groups=groups,
+    )
+
+
+class RuleEngine:
+    """Conjunto de tabelas de classificação (IMC, MNA, triagem do MNA e exames)"""
+
+    def __init__(self, rules=None):
+        rules = rules or DEFAULT_RULES
+        self.rules = rules
+        # Identifica o conjunto de regras (por exemplo, em chaves de cache)
+        self.fingerprint = hashlib.sha256(
+            json.dumps(rules, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+        self.imc = BandTable(**rules['imc'])
+        self.mna = BandTable(**rules['mna'])
+        self.mna_screening = BandTable(**rules.get('mna_triagem', DEFAULT_RULES['mna_triagem']))
+        self.labs = {name: lab_table(spec) for name, spec in rules['labs'].items()}
+
+    @classmethod
+    def from_json(cls, path):
+        """Carrega as tabelas de um arquivo JSON no formato de DEFAULT_RULES"""
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+        merged = {**DEFAULT_RULES, **rules}
+        return cls(merged)
+
+    def lab_field(self, name):
+        """Campo da seção EXAMES BIOQUÍMICOS correspondente ao exame"""
+        return self.rules['labs'][name]['field']
+
+    def lab_reference(self, name):
+        """Valor de referência exibido nos gráficos"""
+        return self.rules['labs'][name].get('reference')
+
+
+@lru_cache(maxsize=1)
+def default_engine():
+    """Motor de regras padrão, ou o do JSON indicado em NUTRICIONAL_RULES"""
+    path = os.environ.get('NUTRICIONAL_RULES')
+    if path:
+        return RuleEngine.from_json(path)
+    return RuleEngine()
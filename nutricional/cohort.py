@@ -0,0 +1,208 @@
+"""Modo coorte: vários pacientes normalizados em uma única tabela colunar.
+
+Cada paciente vira uma linha e cada campo do CSV vira uma coluna nomeada
+``"SEÇÃO/campo"``; as métricas são calculadas sobre colunas inteiras.
+"""
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cache import load_sections
+from .classification import LAB_NORMAL, MISSING, default_engine
+from .formats import iter_export_files, read_table, source_format
+from .intake import cohort_intake, goal_intake
+from .mna import CHECK_LABELS, score_mna
+from .record import FIELDS, MNA, NUTRITION_GOALS, mna_item_field
+
+SOURCE_COLUMN = 'arquivo'
+
+WEIGHT = 'ANTROPOMETRIA/Peso Atual (kg)'
+HEIGHT = 'ANTROPOMETRIA/Altura (cm)'
+MNA_TOTAL = 'AVALIAÇÃO MNA/Pontuação Total'
+REGISTRY = 'ADOS DO PACIENTE/Número de Registro'
+NAME = 'ADOS DO PACIENTE/Nome'
+SEX = 'ADOS DO PACIENTE/Sexo'
+BIRTH_DATE = 'ADOS DO PACIENTE/Data de Nascimento'
+LAB_SECTION = 'EXAMES BIOQUÍMICOS'
+
+
+def field_column(name):
+    """Coluna da tabela da coorte de um campo do registro (``"SEÇÃO/campo"``)"""
+    field = FIELDS[name]
+    return f'{field.section}/{field.key}'
+
+
+# Nutriente -> (meta da prescrição, consumo do histórico alimentar), como no gráfico de metas
+NUTRIENT_GOALS = {
+    nutrient: (field_column(f'meta_{nutrient}'), field_column(f'consumo_{nutrient}'))
+    for nutrient in NUTRITION_GOALS
+}
+
+
+def flatten_sections(sections):
+    """Achata o dicionário de seções em um registro {"SEÇÃO/campo": valor}"""
+    return {
+        f'{section}/{key}': value
+        for section, values in sections.items()
+        for key, value in values.items()
+    }
+
+
+def iter_table_sections(table, chunk_size=1000):
+    """Seções de cada paciente da tabela da coorte (o inverso de ``flatten_sections``)
+
+    As linhas são convertidas em lotes, sem copiar a tabela inteira.
+    """
+    from .formats import unflatten_row
+
+    for start in range(0, len(table), chunk_size):
+        for row in table.iloc[start:start + chunk_size].to_dict('records'):
+            yield unflatten_row(row)
+
+
+def iter_patient_files(directory, pattern='*.csv'):
+    """Lista os arquivos de pacientes de um diretório (recursivamente)"""
+    return sorted(Path(directory).rglob(pattern))
+
+
+def load_cohort(sources, errors=None):
+    """Carrega vários arquivos de pacientes em uma tabela com uma linha por paciente
+
+    ``sources`` pode ser um diretório ou uma lista de caminhos/arquivos abertos
+    (por exemplo, os retornados pelo ``file_uploader`` com múltiplos arquivos).
+    Exportações tabulares (XLSX, Parquet, Arrow) contribuem com todas as suas
+    linhas (``nutricional.formats``). Com ``errors`` (lista), um arquivo que
+    não pode ser lido é pulado e registrado como ``{'arquivo', 'erro'}``; sem
+    ela, o erro é propagado.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = iter_export_files(sources)
+
+    records = []
+    tables = []
+    for source in sources:
+        name = Path(source).name if isinstance(source, (str, Path)) else getattr(source, 'name', '')
+        try:
+            if source_format(name) != 'csv':
+                tables.append(read_table(source, name))
+                continue
+            if isinstance(source, (str, Path)):
+                with open(source, 'rb') as file:
+                    _, sections = load_sections(file)
+            else:
+                _, sections = load_sections(source)
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append({'arquivo': str(source) if isinstance(source, (str, Path)) else name,
+                           'erro': f'{type(e).__name__}: {e}'})
+            continue
+        if not isinstance(source, (str, Path)):
+            name = getattr(source, 'name', str(len(records)))
+        record = flatten_sections(sections)
+        record[SOURCE_COLUMN] = name
+        records.append(record)
+
+    if not tables:
+        return pd.DataFrame.from_records(records)
+    if records:
+        tables.insert(0, pd.DataFrame.from_records(records))
+    return pd.concat(tables, ignore_index=True)
+
+
+def numeric_column(table, column):
+    """Retorna a coluna como float, com NaN onde ausente ou não numérica"""
+    if column not in table:
+        return pd.Series(np.nan, index=table.index, dtype=float)
+    return pd.to_numeric(table[column], errors='coerce').astype(float)
+
+
+def age_column(table, reference_year=None):
+    """Idade aproximada a partir do ano da data de nascimento (AAAA-MM-DD)"""
+    if BIRTH_DATE not in table:
+        return pd.Series(np.nan, index=table.index, dtype=float)
+    reference_year = reference_year or date.today().year
+    years = pd.to_numeric(table[BIRTH_DATE].astype(str).str[:4], errors='coerce')
+    return reference_year - years
+
+
+def mna_columns(table):
+    """Colunas de ``mna.score_mna`` (itens pela letra da pergunta, total e medidas) da tabela da coorte"""
+    columns = {}
+    for column in table.columns:
+        section, _, key = str(column).partition('/')
+        field = mna_item_field(key) if section == MNA else None
+        if field is not None:
+            values = numeric_column(table, column).to_numpy()
+            # Mesma pergunta com textos diferentes entre arquivos: vale a primeira coluna preenchida
+            if field in columns:
+                values = np.where(np.isnan(columns[field]), values, columns[field])
+            columns[field] = values
+    columns['mna_total'] = numeric_column(table, MNA_TOTAL).to_numpy()
+    for field in ('circunferencia_braco', 'circunferencia_panturrilha'):
+        columns[field] = numeric_column(table, field_column(field)).to_numpy()
+    return columns
+
+
+def compute_cohort_metrics(table, engine=None):
+    """Calcula IMC, pontuação e classificação MNA e alterações laboratoriais de toda a coorte"""
+    engine = engine or default_engine()
+    peso = numeric_column(table, WEIGHT)
+    altura = numeric_column(table, HEIGHT) / 100
+    imc = peso / altura ** 2
+    sex = table[SEX].to_numpy(dtype=object) if SEX in table else None
+    age = age_column(table).to_numpy()
+    columns = mna_columns(table)
+    columns['imc'] = imc.to_numpy()
+    mna = score_mna(columns, len(table), engine, sex, age)
+
+    metrics = pd.DataFrame(index=table.index)
+    metrics[SOURCE_COLUMN] = table.get(SOURCE_COLUMN)
+    metrics['registro'] = table.get(REGISTRY)
+    metrics['nome'] = table.get(NAME)
+    metrics['imc'] = imc
+    metrics['imc_classificacao'] = engine.imc.labels[engine.imc.codes(imc.to_numpy(), sex, age)]
+    metrics['mna_total'] = columns['mna_total']
+    metrics['mna_calculado'] = mna['calculado']
+    metrics['mna_triagem'] = mna['triagem']
+    metrics['mna_conferencia'] = CHECK_LABELS[mna['conferencia']]
+    metrics['mna_classificacao'] = mna['classificacao']
+
+    for marker, bands in engine.labs.items():
+        values = numeric_column(table, f'{LAB_SECTION}/{engine.lab_field(marker)}')
+        codes = bands.codes(values.to_numpy(), sex, age)
+        # Exame ausente não é considerado alterado
+        metrics[f'alterado_{marker}'] = (codes != LAB_NORMAL) & (codes != MISSING)
+
+    return metrics
+
+
+def goal_metrics(table):
+    """Meta, consumo, diferença (consumo - meta) e atingimento (consumo / meta) de cada nutriente
+
+    O consumo é a média diária do registro alimentar por item, para quem o
+    tem (``intake.cohort_intake``), ou o total informado no histórico
+    (``intake.goal_intake``, o mesmo critério do resumo e do dashboard).
+    Ausentes ficam NaN (no gráfico de metas valem 0); o atingimento só é
+    calculado para metas positivas.
+    """
+    recorded = cohort_intake(table)
+    goals = pd.DataFrame(index=table.index)
+    for nutrient, (target_column, intake_column) in NUTRIENT_GOALS.items():
+        target = numeric_column(table, target_column)
+        intake = goal_intake(nutrient, numeric_column(table, intake_column), recorded)
+        goals[f'meta_{nutrient}'] = target
+        goals[f'consumo_{nutrient}'] = intake
+        goals[f'diferenca_{nutrient}'] = intake - target
+        goals[f'atingimento_{nutrient}'] = intake / target.where(target > 0)
+    return goals
+
+
+def lab_flag_rates(metrics):
+    """Fração de pacientes com cada exame fora da referência"""
+    flags = metrics.filter(like='alterado_')
+    rates = flags.mean()
+    rates.index = [column.removeprefix('alterado_') for column in rates.index]
+    return rates
@@ -0,0 +1,178 @@
+"""Exportação em massa das métricas calculadas de todos os pacientes.
+
+Para cada paciente: IMC e classificação, score e diagnóstico MNA (calculado e
+informado), exames fora da referência e, por nutriente, meta, consumo,
+diferença e atingimento (a lógica do gráfico de metas). As tabelas da coorte
+são processadas em lotes e cada lote é gravado assim que calculado: um row
+group no Parquet ou linhas no XLSX (``constant_memory`` do xlsxwriter), de
+modo que a memória fica limitada a um lote.
+
+    python -m nutricional.export metricas.parquet                 # banco de pacientes
+    python -m nutricional.export metricas.xlsx --source pacientes/
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from .cohort import SOURCE_COLUMN, compute_cohort_metrics, field_column, goal_metrics, load_cohort
+from .formats import iter_export_files, iter_tables, source_format
+
+EXPORT_FORMATS = {'.parquet': 'parquet', '.xlsx': 'xlsx'}
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Linhas por planilha no XLSX (limite do Excel)
+XLSX_MAX_ROWS = 1_048_576
+
+# Colunas de texto da exportação (tipo fixo entre lotes, mesmo se vazias em um deles)
+TEXT_COLUMNS = (SOURCE_COLUMN, 'registro', 'nome', 'data_avaliacao', 'imc_classificacao',
+                'mna_classificacao', 'mna_diagnostico', 'mna_conferencia')
+
+
+def export_format(path):
+    """Formato da exportação pela extensão do arquivo"""
+    suffix = Path(str(path)).suffix.lower()
+    if suffix not in EXPORT_FORMATS:
+        raise ValueError(f"Formato não suportado: {suffix or path} (use {', '.join(EXPORT_FORMATS)})")
+    return EXPORT_FORMATS[suffix]
+
+
+def metrics_table(table, engine=None):
+    """Métricas exportadas de uma tabela da coorte (uma linha por paciente)"""
+    metrics = compute_cohort_metrics(table, engine)
+    if 'data_avaliacao' in table:
+        # Tabelas do banco trazem a data já normalizada
+        metrics.insert(3, 'data_avaliacao', table['data_avaliacao'])
+    else:
+        metrics.insert(3, 'data_avaliacao', table.get(field_column('data_avaliacao')))
+    diagnosis = field_column('mna_diagnostico')
+    metrics.insert(metrics.columns.get_loc('mna_classificacao') + 1, 'mna_diagnostico', table.get(diagnosis))
+    metrics = pd.concat([metrics, goal_metrics(table)], axis=1)
+    for column in TEXT_COLUMNS:
+        metrics[column] = metrics[column].astype('string')
+    return metrics
+
+
+def split_table(table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Fatia uma tabela já carregada em lotes (para exportar a coorte em memória)"""
+    for start in range(0, len(table), chunk_size):
+        yield table.iloc[start:start + chunk_size]
+
+
+def iter_source_tables(sources, chunk_size=DEFAULT_CHUNK_SIZE, errors=None):
+    """Tabelas da coorte em lotes a partir de um diretório ou lista de arquivos
+
+    CSVs são agrupados de ``chunk_size`` em ``chunk_size``; exportações
+    tabulares são lidas em lotes (``formats.iter_tables``). Com ``errors``
+    (lista), arquivos que não podem ser lidos são pulados e registrados como
+    em ``cohort.load_cohort``.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = iter_export_files(sources) if Path(sources).is_dir() else [sources]
+    pending = []
+    for source in sources:
+        name = Path(source).name if isinstance(source, (str, Path)) else getattr(source, 'name', '')
+        if source_format(name) != 'csv':
+            try:
+                yield from iter_tables(source, chunk_size, name)
+            except Exception as e:
+                if errors is None:
+                    raise
+                errors.append({'arquivo': str(source), 'erro': f'{type(e).__name__}: {e}'})
+            continue
+        pending.append(source)
+        if len(pending) >= chunk_size:
+            yield load_cohort(pending, errors)
+            pending = []
+    if pending:
+        yield load_cohort(pending, errors)
+
+
+def _write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for metrics in chunks:
+            if writer is None:
+                batch = pa.Table.from_pandas(metrics, preserve_index=False)
+                writer = pq.ParquetWriter(str(path), batch.schema)
+            else:
+                batch = pa.Table.from_pandas(metrics, schema=writer.schema, preserve_index=False)
+            # Um row group por lote
+            writer.write_table(batch)
+            yield len(metrics)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_xlsx(chunks, path):
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(str(path), {'constant_memory': True}) as workbook:
+        sheet, row = None, XLSX_MAX_ROWS
+        for metrics in chunks:
+            values = metrics.astype(object).where(metrics.notna(), None)
+            for values_row in values.itertuples(index=False, name=None):
+                if row == XLSX_MAX_ROWS:
+                    # Limite de linhas do Excel: continua em uma nova planilha
+                    sheet = workbook.add_worksheet(f'metricas_{len(workbook.worksheets()) + 1}'
+                                                   if workbook.worksheets() else 'metricas')
+                    sheet.write_row(0, 0, list(metrics.columns))
+                    row = 1
+                sheet.write_row(row, 0, values_row)
+                row += 1
+            yield len(metrics)
+
+
+def export_metrics(tables, path, engine=None, progress=None):
+    """Calcula e grava as métricas de cada tabela da coorte em ``path`` (.parquet ou .xlsx)
+
+    ``tables`` é um iterável de tabelas da coorte (``PatientStore.iter_tables``,
+    ``iter_source_tables`` ou ``split_table``), consumido um lote por vez.
+    ``progress`` é chamado com o total de pacientes exportados após cada lote.
+    Retorna o número de pacientes exportados.
+    """
+    writer = _write_parquet if export_format(path) == 'parquet' else _write_xlsx
+    chunks = (metrics_table(table, engine) for table in tables)
+    total = 0
+    for rows in writer(chunks, path):
+        total += rows
+        if progress is not None:
+            progress(total)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta as métricas de todos os pacientes para Parquet ou XLSX")
+    parser.add_argument('output', help="Arquivo de saída (.parquet ou .xlsx)")
+    parser.add_argument('--source', help="Diretório ou arquivo de pacientes (padrão: o banco de pacientes)")
+    parser.add_argument('--db', default=None, help="Arquivo do banco de pacientes")
+    parser.add_argument('--all', action='store_true', help="Todas as avaliações do banco, não só a mais recente")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Pacientes por lote")
+    args = parser.parse_args(argv)
+
+    try:
+        export_format(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.source:
+        tables = iter_source_tables(args.source, args.chunk_size)
+    else:
+        from .store import PatientStore
+
+        tables = PatientStore(args.db).iter_tables(latest_only=not args.all, chunk_size=args.chunk_size)
+
+    start = time.perf_counter()
+    total = export_metrics(tables, args.output, progress=lambda done: print(f"{done} pacientes", file=sys.stderr))
+    print(f"{total} pacientes exportados para {args.output} em {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Leitura de exportações em XLSX, Parquet e Arrow IPC, além do CSV por seções.
+
+Todos os formatos chegam às mesmas representações do CSV: por paciente, o
+dicionário ``{seção: {campo: valor}}``; para a coorte, a tabela larga de
+``load_cohort``, com uma linha por paciente e colunas ``"SEÇÃO/campo"``.
+
+Layouts aceitos:
+
+- XLSX por seções: uma planilha por seção (o nome da planilha), com linhas
+  ``campo | valor``; um paciente por arquivo, como o CSV;
+- XLSX largo, Parquet e Arrow IPC (arquivo ou stream; Feather v2): uma linha
+  por paciente e uma coluna ``"SEÇÃO/campo"`` por campo.
+
+Parquet e Arrow IPC lidos de um caminho são mapeados em memória, e uploads
+são lidos direto do buffer recebido. As colunas numéricas da tabela do
+pandas ficam apoiadas nos buffers do Arrow (``pd.ArrowDtype``), sem cópia;
+só as colunas usadas pelas métricas são convertidas.
+"""
+import io
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+from .cache import content_hash
+from .parser import coerce_value, parse_sections
+
+FORMATS = {
+    '.csv': 'csv',
+    '.xlsx': 'xlsx',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+# Extensões aceitas no upload (sem o ponto, como no ``file_uploader``)
+UPLOAD_TYPES = [suffix.lstrip('.') for suffix in FORMATS]
+
+
+def source_format(name):
+    """Formato pelo nome do arquivo (``csv`` quando desconhecido)"""
+    return FORMATS.get(Path(str(name)).suffix.lower(), 'csv')
+
+
+def iter_export_files(directory):
+    """Lista os arquivos de pacientes de um diretório em qualquer formato aceito (recursivamente)"""
+    return sorted(
+        path for path in Path(directory).rglob('*')
+        if path.suffix.lower() in FORMATS and path.is_file()
+    )
+
+
+def patient_key(sections):
+    """Hash de um paciente lido de uma exportação tabular (o conteúdo normalizado)"""
+    return content_hash(json.dumps(sections, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+
+
+def normalize_value(value):
+    """Valor de uma célula no mesmo formato do parser do CSV (None se vazio)"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, str):
+        value = value.strip()
+        return coerce_value(value) if value else None
+    if hasattr(value, 'item'):
+        # Escalares do NumPy
+        return value.item()
+    return value
+
+
+def unflatten_row(row):
+    """Converte uma linha ``{"SEÇÃO/campo": valor}`` no dicionário de seções"""
+    sections = {}
+    for column, value in row.items():
+        if not isinstance(column, str):
+            continue
+        section, separator, key = column.partition('/')
+        if not separator:
+            continue
+        value = normalize_value(value)
+        if value is not None:
+            sections.setdefault(section, {})[key] = value
+    return sections
+
+
+def _open(source):
+    """Caminho, ou buffer sem cópia do arquivo aberto (upload)"""
+    if isinstance(source, (str, Path)):
+        return str(source)
+    import pyarrow as pa
+
+    if hasattr(source, 'getbuffer'):
+        return pa.BufferReader(pa.py_buffer(source.getbuffer()))
+    source.seek(0)
+    return pa.BufferReader(source.read())
+
+
+def read_arrow_table(source, fmt):
+    """Lê Parquet ou Arrow IPC como ``pyarrow.Table`` (caminhos mapeados em memória)"""
+    import pyarrow as pa
+
+    target = _open(source)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        return pq.read_table(target, memory_map=isinstance(target, str))
+    if isinstance(target, str):
+        target = pa.memory_map(target)
+    try:
+        return pa.ipc.open_file(target).read_all()
+    except pa.ArrowInvalid:
+        # Formato stream do IPC (sem o rodapé do formato arquivo)
+        target.seek(0)
+        return pa.ipc.open_stream(target).read_all()
+
+
+def arrow_to_pandas(table):
+    """Tabela do pandas com as colunas numéricas apoiadas nos buffers do Arrow
+
+    Textos e datas são convertidos (objetos Python), como no CSV.
+    """
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+    def types_mapper(arrow_type):
+        if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+            return pd.ArrowDtype(arrow_type)
+        return None
+
+    frame = table.to_pandas(types_mapper=types_mapper)
+    for column in frame.columns:
+        if frame[column].dtype == object:
+            # Normaliza cada valor distinto uma vez (sexo, datas, dietas se repetem)
+            codes, uniques = pd.factorize(frame[column])
+            values = np.array([normalize_value(value) for value in uniques] + [None], dtype=object)
+            frame[column] = values[codes]
+    return frame
+
+
+def _cell_rows(sheet):
+    for row in sheet.iter_rows(values_only=True):
+        if any(value is not None and str(value).strip() for value in row):
+            yield row
+
+
+def _is_wide(header):
+    return any(isinstance(value, str) and '/' in value for value in header)
+
+
+def read_workbook(source):
+    """Lê um XLSX: ``('secoes', seções)`` ou ``('tabela', cabeçalho, linhas)`` para o layout largo"""
+    from openpyxl import load_workbook
+
+    if not isinstance(source, (str, Path)):
+        source.seek(0)
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        first = next(_cell_rows(workbook.worksheets[0]), ())
+        if _is_wide(first):
+            rows = _cell_rows(workbook.worksheets[0])
+            header = [None if value is None else str(value).strip() for value in next(rows)]
+            return 'tabela', header, list(rows)
+
+        sections = {}
+        for sheet in workbook.worksheets:
+            values = {}
+            for row in _cell_rows(sheet):
+                if len(row) < 2 or row[0] is None:
+                    continue
+                value = normalize_value(row[1])
+                if value is not None:
+                    values[str(row[0]).strip()] = value
+            if values:
+                sections[sheet.title.strip()] = values
+        return 'secoes', sections
+    finally:
+        workbook.close()
+
+
+def read_patients(source, name=None):
+    """Lê um arquivo (caminho ou aberto) e retorna a lista de pacientes (dicionários de seções)"""
+    fmt = source_format(name or getattr(source, 'name', source))
+    if fmt == 'csv':
+        if isinstance(source, (str, Path)):
+            with open(source, 'rb') as file:
+                return [parse_sections(file)]
+        source.seek(0)
+        return [parse_sections(source)]
+    if fmt == 'xlsx':
+        layout, *content = read_workbook(source)
+        if layout == 'secoes':
+            return [content[0]]
+        header, rows = content
+        return [unflatten_row(dict(zip(header, row))) for row in rows]
+    table = read_arrow_table(source, fmt)
+    return [unflatten_row(row) for row in table.to_pylist()]
+
+
+def read_table(source, name=None):
+    """Lê um arquivo na tabela larga da coorte (uma linha por paciente, colunas ``"SEÇÃO/campo"``)"""
+    import pandas as pd
+
+    from .cohort import SOURCE_COLUMN, flatten_sections
+
+    name = name or getattr(source, 'name', None) or Path(str(source)).name
+    fmt = source_format(name)
+    if fmt in ('parquet', 'arrow'):
+        frame = arrow_to_pandas(read_arrow_table(source, fmt))
+    elif fmt == 'xlsx':
+        layout, *content = read_workbook(source)
+        if layout == 'secoes':
+            frame = pd.DataFrame.from_records([flatten_sections(content[0])])
+        else:
+            header, rows = content
+            frame = pd.DataFrame.from_records(
+                [[normalize_value(value) for value in row] for row in rows], columns=header
+            )
+    else:
+        frame = pd.DataFrame.from_records([flatten_sections(patient) for patient in read_patients(source, name)])
+    if SOURCE_COLUMN not in frame:
+        frame[SOURCE_COLUMN] = Path(str(name)).name
+    return frame
+
+
+def iter_tables(source, chunk_size, name=None):
+    """Lê um arquivo na tabela larga da coorte em lotes de até ``chunk_size`` linhas
+
+    Parquet é lido por lotes e Arrow IPC, fatiado sobre o arquivo mapeado em
+    memória; os demais formatos são lidos de uma vez (um paciente por CSV).
+    """
+    from .cohort import SOURCE_COLUMN
+
+    name = name or getattr(source, 'name', None) or Path(str(source)).name
+    fmt = source_format(name)
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        target = _open(source)
+        batches = pq.ParquetFile(target, memory_map=isinstance(target, str)).iter_batches(batch_size=chunk_size)
+        tables = (pa.Table.from_batches([batch]) for batch in batches)
+    elif fmt == 'arrow':
+        table = read_arrow_table(source, fmt)
+        tables = (table.slice(offset, chunk_size) for offset in range(0, table.num_rows, chunk_size))
+    else:
+        yield read_table(source, name)
+        return
+    for table in tables:
+        frame = arrow_to_pandas(table)
+        if SOURCE_COLUMN not in frame:
+            frame[SOURCE_COLUMN] = Path(str(name)).name
+        yield frame
+
+
+def load_patients(file):
+    """Lê um upload em qualquer formato, reaproveitando o parse pelo hash do conteúdo
+
+    Retorna a lista de ``(hash, seções)`` dos pacientes do arquivo; no CSV o
+    hash é o do arquivo, como em ``load_sections``.
+    """
+    from .cache import load_sections, parse_cache
+
+    if source_format(getattr(file, 'name', '')) == 'csv':
+        return [load_sections(file)]
+    file.seek(0)
+    raw = file.getvalue() if hasattr(file, 'getvalue') else file.read()
+    key = ('patients', content_hash(raw))
+    patients = parse_cache.get(key)
+    if patients is None:
+        source = io.BytesIO(raw)
+        source.name = file.name
+        patients = [(patient_key(sections), sections) for sections in read_patients(source)]
+        parse_cache.put(key, patients, size=len(raw))
+    return patients
@@ -0,0 +1,251 @@
+"""Importação em massa de exportações de pacientes, com relatório de validação.
+
+Percorre um diretório (incluindo arquivos ZIP dentro dele) ou um ZIP de
+exportações em qualquer formato de ``nutricional.formats`` (CSV, XLSX,
+Parquet e Arrow), faz o parse e a validação em um pool de processos, em lotes
+de arquivos para diluir o custo de comunicação, e grava as avaliações no banco
+de pacientes. Para cada paciente (um por CSV; um por linha nas exportações
+tabulares) é gerada uma linha JSON com tempo, seções e campos ausentes e
+falhas de conversão numérica.
+
+    python -m nutricional.ingest pacientes/ --report validacao.jsonl
+    python -m nutricional.ingest exportacao.zip --db pacientes.db --workers 8
+    python -m nutricional.ingest pacientes/ --report validacao.jsonl --dry-run
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from pathlib import Path
+
+from .cache import content_hash
+from .formats import FORMATS, patient_key, read_patients, source_format
+from .parser import parse_sections
+from .record import PatientRecord, is_valid, validate_record
+from .store import PatientStore, assessment_row
+
+DEFAULT_CHUNK_SIZE = 200
+# Lotes maiores para membros de ZIP: cada lote abre o ZIP de novo, e abrir lê o
+# diretório central inteiro (~0,1 s com 20 mil arquivos)
+ZIP_CHUNK_SIZE = 5000
+
+
+def iter_sources(path):
+    """Lista os arquivos a importar: caminhos ou tuplas ``(zip, membro)``
+
+    ``path`` pode ser um diretório (percorrido recursivamente, abrindo também
+    os ZIPs encontrados), um ZIP ou um único arquivo. São importadas as
+    extensões de ``formats.FORMATS``, também dentro dos ZIPs.
+    """
+    path = Path(path)
+    if path.is_dir():
+        sources = []
+        for child in sorted(path.rglob('*')):
+            if child.suffix.lower() == '.zip':
+                sources.extend(iter_sources(child))
+            elif child.suffix.lower() in FORMATS and child.is_file():
+                sources.append(str(child))
+        return sources
+    # O XLSX também é um ZIP: só é aberto como pacote o que não é exportação
+    if path.suffix.lower() not in FORMATS and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            return [
+                (str(path), name)
+                for name in sorted(archive.namelist())
+                if Path(name).suffix.lower() in FORMATS and not name.endswith('/')
+            ]
+    return [str(path)]
+
+
+def source_name(source):
+    """Identificação do arquivo no relatório (``zip!membro`` para arquivos em ZIP)"""
+    return f'{source[0]}!{source[1]}' if isinstance(source, tuple) else str(source)
+
+
+def _read_source(source, archives):
+    if isinstance(source, tuple):
+        zip_path, member = source
+        if zip_path not in archives:
+            archives[zip_path] = zipfile.ZipFile(zip_path)
+        return archives[zip_path].read(member)
+    with open(source, 'rb') as file:
+        return file.read()
+
+
+def _read_patients(raw, name):
+    """Pacientes ``[(hash, seções)]`` de um arquivo; o hash do CSV é o do arquivo, como em ``load_sections``"""
+    if source_format(name) == 'csv':
+        return [(content_hash(raw), parse_sections(io.BytesIO(raw)))]
+    buffer = io.BytesIO(raw)
+    buffer.name = name
+    return [(patient_key(sections), sections) for sections in read_patients(buffer, name)]
+
+
+def _new_result(source, line=None):
+    return {
+        'arquivo': source_name(source), 'linha': line, 'content_hash': None, 'segundos': None, 'valido': False,
+        'secoes_ausentes': [], 'campos_ausentes': [], 'falhas_conversao': [], 'erro': None,
+    }
+
+
+def ingest_file(source, archives=None, with_row=True):
+    """Lê, faz o parse e valida um arquivo
+
+    Retorna a lista de ``(resultado, linha)``, uma por paciente do arquivo: o
+    resultado é a entrada do relatório e a linha é a tupla da tabela
+    ``avaliacoes`` (ou None, em caso de erro). Nas exportações tabulares o
+    resultado indica a ``linha`` do paciente (a partir de 1), e o tempo de
+    leitura é dividido entre os pacientes. Qualquer erro no arquivo é
+    registrado em um único resultado, sem interromper o lote. ``archives``
+    (ZIPs já abertos) pertence a quem chama; sem ele, o ZIP aberto aqui é
+    fechado ao final.
+    """
+    if archives is None:
+        with open_archives() as archives:
+            return ingest_file(source, archives, with_row)
+    start = time.perf_counter()
+    name = Path(source[1] if isinstance(source, tuple) else source).name
+    try:
+        patients = _read_patients(_read_source(source, archives), name)
+    except Exception as e:
+        # Inclui compressões de ZIP não suportadas (NotImplementedError) e arquivos ilegíveis
+        result = _new_result(source)
+        result.update(erro=f'{type(e).__name__}: {e}', segundos=time.perf_counter() - start)
+        return [(result, None)]
+    read_seconds = (time.perf_counter() - start) / max(len(patients), 1)
+    single = source_format(name) == 'csv' or len(patients) == 1
+
+    pairs = []
+    for line, (key, sections) in enumerate(patients, start=1):
+        start = time.perf_counter()
+        result, row = _new_result(source, None if single else line), None
+        try:
+            validation = validate_record(PatientRecord.from_sections(sections))
+            result.update(validation, content_hash=key, valido=is_valid(validation))
+            if with_row:
+                row = assessment_row(key, sections, name)
+        except Exception as e:
+            # Valores inesperados em um paciente não interrompem os demais
+            result['erro'] = f'{type(e).__name__}: {e}'
+        result['segundos'] = read_seconds + time.perf_counter() - start
+        pairs.append((result, row))
+    return pairs
+
+
+@contextmanager
+def open_archives():
+    """ZIPs abertos por ``_read_source`` ({caminho: ZipFile}), fechados ao sair"""
+    archives = {}
+    try:
+        yield archives
+    finally:
+        for archive in archives.values():
+            archive.close()
+
+
+def ingest_chunk(chunk, with_rows=True):
+    """Processa um lote de arquivos (executado no processo do pool)
+
+    Cada ZIP é aberto uma vez por lote e fechado ao final dele.
+    """
+    with open_archives() as archives:
+        return [pair for source in chunk for pair in ingest_file(source, archives, with_rows)]
+
+
+def run_ingest(sources, store=None, workers=None, chunk_size=None, progress=None):
+    """Importa e valida os arquivos em um pool de processos
+
+    ``sources`` é um caminho (diretório, ZIP ou CSV) ou uma lista de fontes
+    de ``iter_sources``. Com ``store`` (``PatientStore``), as avaliações sem
+    erro são gravadas a cada lote concluído, em uma transação por lote.
+    ``progress`` é chamado com ``(arquivos concluídos, total, resultados_do_lote)``.
+    Retorna a lista de resultados, um por paciente.
+    """
+    if isinstance(sources, (str, Path)):
+        sources = iter_sources(sources)
+    sources = list(sources)
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # Lotes pequenos o bastante para equilibrar a carga entre os processos
+        limit = ZIP_CHUNK_SIZE if any(isinstance(source, tuple) for source in sources) else DEFAULT_CHUNK_SIZE
+        chunk_size = max(1, min(limit, len(sources) // (workers * 4)))
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+
+    results = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(ingest_chunk, chunk, store is not None): len(chunk) for chunk in chunks}
+        for future in as_completed(futures):
+            chunk_results = future.result()
+            if store is not None:
+                store.add_rows([row for _, row in chunk_results if row is not None])
+            results.extend(result for result, _ in chunk_results)
+            done += futures[future]
+            if progress is not None:
+                progress(done, len(sources), [result for result, _ in chunk_results])
+    return results
+
+
+def summarize(results, seconds):
+    """Resumo da importação para o relatório e a saída do CLI"""
+    errors = sum(1 for r in results if r['erro'])
+    valid = sum(1 for r in results if r['valido'])
+    files = len({r['arquivo'] for r in results})
+    return {
+        'arquivos': files,
+        'pacientes': len(results),
+        'validos': valid,
+        'com_pendencias': len(results) - valid - errors,
+        'erros': errors,
+        'segundos': seconds,
+        'arquivos_por_segundo': files / seconds if seconds else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa e valida exportações de pacientes em massa")
+    parser.add_argument('source', help="Diretório, arquivo ZIP ou exportação (CSV, XLSX, Parquet ou Arrow)")
+    parser.add_argument('--report', help="Relatório por arquivo em JSON Lines (padrão: não grava)")
+    parser.add_argument('--db', default=None, help="Banco de pacientes (padrão: NUTRICIONAL_STORE ou pacientes.db)")
+    parser.add_argument('--dry-run', action='store_true', help="Apenas valida, sem gravar no banco")
+    parser.add_argument('--workers', type=int, default=None, help="Número de processos (padrão: núcleos da CPU)")
+    parser.add_argument('--chunk-size', type=int, default=None, help="Arquivos por tarefa do pool")
+    args = parser.parse_args(argv)
+
+    store = None
+    if not args.dry_run:
+        store = PatientStore(args.db)
+
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+
+    def progress(done, total, chunk_results):
+        if report is not None:
+            for result in chunk_results:
+                report.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        for result in chunk_results:
+            if result['erro']:
+                line = f"#{result['linha']}" if result['linha'] else ''
+                print(f"ERRO {result['arquivo']}{line}: {result['erro']}", file=sys.stderr)
+        print(f"[{done}/{total}]", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        results = run_ingest(args.source, store=store, workers=args.workers,
+                             chunk_size=args.chunk_size, progress=progress)
+    finally:
+        if report is not None:
+            report.close()
+    summary = summarize(results, time.perf_counter() - start)
+    if store is not None:
+        summary['no_banco'] = store.count()
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 1 if summary['erros'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""Consumo alimentar por item: registro alimentar x tabela de composição.
+
+O registro alimentar (seção ``REGISTRO ALIMENTAR``) tem um item por linha,
+numerado, com o dia, a refeição, o alimento e a quantidade em gramas::
+
+    REGISTRO ALIMENTAR
+    1,1,Café da Manhã,"Pão, trigo, francês",50
+    2,1,Café da Manhã,"Leite, de vaca, integral",200
+
+Os alimentos são buscados, sem acentos e maiúsculas, na tabela de
+composição por 100 g (``data/composicao_alimentos.csv``, no formato da TACO;
+outra tabela pode ser indicada em NUTRICIONAL_FOOD_TABLE). A busca e o
+cálculo são vetorizados: os nomes são fatorados uma vez, cada item vira um
+índice da matriz alimentos x nutrientes, e os nutrientes de todos os itens,
+de um ou de muitos pacientes, saem de uma indexação e uma multiplicação.
+"""
+import csv
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cache import intake_cache
+from .record import FOOD_RECORD
+from .search import normalize
+
+DEFAULT_FOOD_TABLE = Path(__file__).resolve().parent / 'data' / 'composicao_alimentos.csv'
+
+# Coluna da tabela de composição (por 100 g) -> rótulo
+NUTRIENTS = {
+    'energia_kcal': 'Energia (kcal)',
+    'proteina_g': 'Proteínas (g)',
+    'carboidrato_g': 'Carboidratos (g)',
+    'lipidio_g': 'Gorduras (g)',
+    'fibra_g': 'Fibras (g)',
+    'calcio_mg': 'Cálcio (mg)',
+    'ferro_mg': 'Ferro (mg)',
+    'sodio_mg': 'Sódio (mg)',
+    'vitamina_c_mg': 'Vitamina C (mg)',
+}
+
+# Nutriente das metas da prescrição -> coluna da tabela de composição
+GOAL_NUTRIENTS = {
+    'calorias': 'energia_kcal',
+    'proteinas': 'proteina_g',
+    'carboidratos': 'carboidrato_g',
+    'gorduras': 'lipidio_g',
+}
+
+# Ordem de exibição das refeições (as demais vêm depois, na ordem do registro)
+MEALS = ('Café da Manhã', 'Lanche da Manhã', 'Almoço', 'Lanche da Tarde', 'Jantar', 'Ceia')
+
+ITEM_COLUMNS = ('dia', 'refeicao', 'alimento', 'quantidade_g')
+
+
+class FoodTable:
+    """Tabela de composição: nutrientes por 100 g em uma matriz alimentos x nutrientes"""
+
+    def __init__(self, names, values, nutrients=tuple(NUTRIENTS), fingerprint=''):
+        self.names = list(names)
+        self.nutrients = list(nutrients)
+        # Linha extra de NaN para os alimentos não encontrados (índice ``len(self)``)
+        self.values = np.vstack([np.asarray(values, dtype=np.float64), np.full(len(self.nutrients), np.nan)])
+        self.fingerprint = fingerprint
+        self._index = {normalize(name): code for code, name in enumerate(self.names)}
+
+    @classmethod
+    def from_csv(cls, path):
+        """Lê a tabela (coluna ``alimento`` e uma coluna por nutriente de ``NUTRIENTS``)"""
+        raw = Path(path).read_bytes()
+        rows = list(csv.DictReader(raw.decode('utf-8-sig').splitlines()))
+        nutrients = [column for column in NUTRIENTS if rows and column in rows[0]]
+        values = [[float(row[column]) if row[column].strip() else 0.0 for column in nutrients] for row in rows]
+        return cls([row['alimento'] for row in rows], values, nutrients, hashlib.sha256(raw).hexdigest())
+
+    def __len__(self):
+        return len(self.names)
+
+    def codes(self, foods):
+        """Índice de cada alimento na tabela (``len(self)`` se não encontrado)
+
+        Os nomes são fatorados, de modo que cada alimento distinto é
+        normalizado e buscado uma única vez.
+        """
+        labels, uniques = pd.factorize(np.asarray(foods, dtype=object))
+        lookup = np.array([self._index.get(normalize(food), len(self)) for food in uniques] + [len(self)])
+        return lookup[labels]
+
+    def amounts(self, codes, grams):
+        """Nutrientes de cada item: composição por 100 g x quantidade"""
+        return self.values[codes] * (np.asarray(grams, dtype=np.float64)[:, None] / 100)
+
+
+@lru_cache(maxsize=None)
+def _load_food_table(path):
+    return FoodTable.from_csv(path)
+
+
+def food_table(path=None):
+    """Tabela de composição (NUTRICIONAL_FOOD_TABLE ou a incluída no pacote), lida uma vez"""
+    return _load_food_table(str(path or os.environ.get('NUTRICIONAL_FOOD_TABLE') or DEFAULT_FOOD_TABLE))
+
+
+# Item válido: dia, refeição, alimento (que pode conter vírgulas) e quantidade
+ITEM_PATTERN = r'^\s*\d+(\.0*)?\s*,[^,]*,.*,\s*\d+(\.\d*)?\s*$'
+
+
+def parse_items(values):
+    """Separa os textos dos itens do registro em colunas, de forma vetorizada (``pyarrow.compute``)
+
+    O alimento pode conter vírgulas (nomes da TACO): o dia e a refeição são
+    os dois primeiros campos e a quantidade, o último. Retorna as posições
+    dos itens válidos em ``values`` e a tabela ``dia``, ``refeicao``,
+    ``alimento``, ``quantidade_g`` (refeição e alimento categóricos).
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        text = pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        text = pa.array([None if value is None else str(value) for value in values], type=pa.string())
+    valid = pc.fill_null(pc.match_substring_regex(text, ITEM_PATTERN), False)
+    positions = np.flatnonzero(valid.to_numpy(zero_copy_only=False))
+    text = text.filter(valid)
+
+    head = pc.split_pattern(text, ',', max_splits=2)
+    tail = pc.split_pattern(pc.list_element(head, 2), ',', max_splits=1, reverse=True)
+
+    def field(parts, index):
+        return pc.utf8_trim_whitespace(pc.list_element(parts, index))
+
+    def categorical(array):
+        encoded = pc.dictionary_encode(array)
+        return pd.Categorical.from_codes(
+            encoded.indices.to_numpy(zero_copy_only=False), encoded.dictionary.to_pylist()
+        )
+
+    items = pd.DataFrame({
+        'dia': pc.cast(field(head, 0), pa.float64()).to_numpy(zero_copy_only=False).astype(np.int64),
+        'refeicao': categorical(field(head, 1)),
+        'alimento': categorical(field(tail, 0)),
+        'quantidade_g': pc.cast(field(tail, 1), pa.float64()).to_numpy(zero_copy_only=False),
+    })
+    return positions, items
+
+
+def intake_items(values, patients=None, table=None):
+    """Itens com os nutrientes calculados, em uma tabela longa
+
+    ``values`` são os textos dos itens do registro (``"dia,refeição,alimento,g"``)
+    e ``patients``, o paciente de cada um (opcional). Retorna uma linha por
+    item válido: ``paciente``, ``dia``, ``refeicao``, ``alimento``,
+    ``quantidade_g``, ``encontrado`` e uma coluna por nutriente.
+    """
+    table = table or food_table()
+    positions, items = parse_items(values)
+    if patients is not None:
+        items.insert(0, 'paciente', np.asarray(patients)[positions])
+    # Cada alimento distinto é buscado uma vez; os itens herdam o índice pelo código da categoria
+    foods = items['alimento'].cat
+    codes = table.codes(foods.categories)[foods.codes] if len(items) else np.zeros(0, dtype=np.int64)
+    items['encontrado'] = codes < len(table)
+    amounts = table.amounts(codes, items['quantidade_g'].to_numpy())
+    for position, nutrient in enumerate(table.nutrients):
+        items[nutrient] = amounts[:, position]
+    return items
+
+
+def meal_order(meals):
+    """Refeições na ordem de ``MEALS`` e as demais em seguida"""
+    known = [meal for meal in MEALS if meal in set(meals)]
+    return known + [meal for meal in dict.fromkeys(meals) if meal not in MEALS]
+
+
+def summarize_intake(items, nutrients):
+    """Consumo por refeição e por dia, média diária e alimentos não encontrados
+
+    A média diária fica NaN quando nenhum alimento foi encontrado na tabela.
+    """
+    per_meal = items.groupby(['dia', 'refeicao'], observed=True, sort=False)[nutrients].sum()
+    per_day = items.groupby('dia')[nutrients].sum()
+    meals = items.groupby('refeicao', observed=True, sort=False)[nutrients].sum() / len(per_day)
+    daily = per_day.mean()
+    # Nenhum alimento encontrado na tabela: sem média (NaN), como em ``daily_averages``
+    if not items['encontrado'].any():
+        daily[:] = np.nan
+    return {
+        'itens': items,
+        'refeicoes': per_meal.sort_index(level='dia', sort_remaining=False),
+        'dias': per_day,
+        'media_refeicoes': meals.reindex(meal_order(list(meals.index))),
+        'media_diaria': daily,
+        'nao_encontrados': sorted(set(items.loc[~items['encontrado'], 'alimento'])),
+    }
+
+
+def patient_intake(sections, key=None, table=None):
+    """Consumo calculado do registro alimentar do paciente, ou None sem registro
+
+    Com ``key`` (hash do conteúdo), o resultado fica no cache compartilhado
+    por sessões, indexado também pela tabela de composição. Retorna os itens
+    e os detalhamentos de ``summarize_intake``.
+    """
+    table = table or food_table()
+    if key is not None:
+        cached = intake_cache.get((key, table.fingerprint))
+        if cached is not None:
+            return cached
+    values = list(sections.get(FOOD_RECORD, {}).values())
+    result = None
+    if values:
+        items = intake_items(values, table=table)
+        if len(items):
+            result = summarize_intake(items, table.nutrients)
+    if key is not None and result is not None:
+        intake_cache.put((key, table.fingerprint), result, size=int(result['itens'].memory_usage(deep=True).sum()))
+    return result
+
+
+def daily_averages(patients, days, amounts, count):
+    """Média diária de cada nutriente por paciente, a partir dos itens (``np.bincount``)
+
+    ``patients`` (0..count-1) e ``days`` identificam cada item; alimentos não
+    encontrados (NaN) não somam. Pacientes sem nenhum alimento encontrado
+    ficam NaN.
+    """
+    keys, groups = np.unique(patients * (int(days.max()) + 1) + days, return_inverse=True)
+    group_patient = keys // (int(days.max()) + 1)
+    found = np.bincount(patients[~np.isnan(amounts[:, 0])], minlength=count)
+    amounts = np.nan_to_num(amounts)
+    day_totals = np.column_stack([
+        np.bincount(groups, weights=amounts[:, j], minlength=len(keys)) for j in range(amounts.shape[1])
+    ])
+    days_per_patient = np.bincount(group_patient, minlength=count).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.column_stack([
+            np.bincount(group_patient, weights=day_totals[:, j], minlength=count) for j in range(amounts.shape[1])
+        ]) / days_per_patient[:, None]
+    averages[found == 0] = np.nan
+    return averages
+
+
+def daily_intake(sections, table=None):
+    """Média diária dos nutrientes do registro alimentar do paciente, ou None sem registro
+
+    O mesmo cálculo de ``cohort_intake`` para um único paciente, sem os
+    detalhamentos de ``patient_intake``: é o caminho de cada importação.
+    """
+    table = table or food_table()
+    values = list(sections.get(FOOD_RECORD, {}).values())
+    items = intake_items(values, table=table) if values else ()
+    if not len(items):
+        return None
+    averages = daily_averages(
+        np.zeros(len(items), dtype=np.intp), items['dia'].to_numpy(), items[table.nutrients].to_numpy(), 1
+    )
+    return pd.Series(averages[0], index=table.nutrients)
+
+
+def goal_intake(nutrient, reported, recorded=None):
+    """Consumo de um nutriente das metas da prescrição
+
+    Vale a média diária do registro alimentar por item (``recorded``, indexado
+    pelas colunas da tabela de composição) e, sem registro ou sem alimentos
+    encontrados (NaN), o total informado no histórico alimentar (``reported``).
+    Aceita os valores de um paciente ou as colunas da coorte.
+    """
+    if recorded is None:
+        return reported
+    value = recorded[GOAL_NUTRIENTS[nutrient]]
+    if isinstance(value, pd.Series):
+        return value.fillna(reported)
+    return reported if np.isnan(value) else value
+
+
+def cohort_intake(cohort, table=None):
+    """Média diária dos nutrientes de cada paciente da tabela da coorte
+
+    Os itens das colunas ``"REGISTRO ALIMENTAR/n"`` de todos os pacientes são
+    processados de uma vez. Retorna uma tabela com o mesmo índice da coorte
+    e uma coluna por nutriente (NaN para quem não tem registro), ou None se
+    nenhum paciente tiver registro alimentar.
+    """
+    table = table or food_table()
+    columns = [column for column in cohort.columns if str(column).startswith(f'{FOOD_RECORD}/')]
+    if not columns:
+        return None
+    records = cohort[columns].to_numpy(dtype=object)
+    rows, positions = np.nonzero(pd.notna(records))
+    items = intake_items(records[rows, positions], patients=rows, table=table)
+    if not len(items):
+        return None
+    averages = daily_averages(
+        items['paciente'].to_numpy(), items['dia'].to_numpy(), items[table.nutrients].to_numpy(), len(cohort)
+    )
+    return pd.DataFrame(averages, index=cohort.index, columns=table.nutrients)
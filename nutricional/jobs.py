@@ -0,0 +1,163 @@
+"""Fila de tarefas em segundo plano para a geração de relatórios.
+
+A sessão que pede um relatório recebe um ID de tarefa e consulta o estado a
+cada renderização, sem bloquear enquanto o PDF é gerado. Um número limitado
+de threads executa as tarefas; as etapas pesadas em CPU (ReportLab) vão para
+um pool de processos, fora do processo do servidor, para não disputar o GIL
+com as sessões interativas. Pedidos com a mesma chave (o mesmo relatório em
+várias sessões) compartilham a tarefa, e os resultados ficam disponíveis por
+``ttl`` segundos após a conclusão.
+
+    NUTRICIONAL_REPORT_WORKERS=2   tarefas simultâneas (padrão: 2)
+    NUTRICIONAL_REPORT_TTL=600     retenção dos resultados, em segundos
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+PENDING = 'pendente'
+RUNNING = 'executando'
+DONE = 'concluido'
+FAILED = 'erro'
+
+DEFAULT_WORKERS = int(os.environ.get('NUTRICIONAL_REPORT_WORKERS', '2'))
+DEFAULT_TTL = float(os.environ.get('NUTRICIONAL_REPORT_TTL', '600'))
+
+
+class Job:
+    """Uma tarefa da fila: estado, tempos, resultado ou erro"""
+
+    __slots__ = ('id', 'key', 'state', 'created', 'started', 'finished', 'result', 'error', 'done')
+
+    def __init__(self, key=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.state = PENDING
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        # Sinalizado ao terminar (concluída ou com erro)
+        self.done = threading.Event()
+
+    def status(self):
+        """Estado da tarefa para exibição (sem o resultado)"""
+        return {
+            'id': self.id,
+            'estado': self.state,
+            'criado_em': self.created,
+            'segundos': (self.finished or time.time()) - (self.started or self.created),
+            'erro': self.error,
+        }
+
+
+class JobQueue:
+    """Executa tarefas em segundo plano com concorrência limitada"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, ttl=DEFAULT_TTL):
+        self.max_workers = max(1, max_workers)
+        self.ttl = ttl
+        self._jobs = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='nutricional-job')
+        self._processes = None
+
+    def submit(self, func, *args, key=None, **kwargs):
+        """Enfileira ``func(*args, **kwargs)`` e retorna o ID da tarefa
+
+        Se já houver uma tarefa com a mesma ``key`` pendente, em execução ou
+        concluída (e não expirada), o ID dela é retornado.
+        """
+        with self._lock:
+            self._purge()
+            if key is not None and key in self._keys:
+                job = self._jobs[self._keys[key]]
+                if job.state != FAILED:
+                    return job.id
+            job = Job(key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._keys[key] = job.id
+        self._threads.submit(self._run, job, func, args, kwargs)
+        return job.id
+
+    def _run(self, job, func, args, kwargs):
+        job.started = time.time()
+        job.state = RUNNING
+        try:
+            job.result = func(*args, **kwargs)
+            job.state = DONE
+        except Exception as e:
+            job.error = f'{type(e).__name__}: {e}'
+            job.state = FAILED
+        finally:
+            job.finished = time.time()
+            job.done.set()
+
+    def run_in_process(self, func, *args):
+        """Executa ``func`` em um processo do pool e aguarda o resultado
+
+        Chamado de dentro de uma tarefa; ``func`` deve ser importável (nível de
+        módulo) e os argumentos, serializáveis. Os processos são iniciados com
+        ``spawn``: o servidor tem várias threads, e um ``fork`` copiaria locks
+        em uso por outras threads (risco de deadlock no processo filho).
+        """
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+        return self._processes.submit(func, *args).result()
+
+    def get(self, job_id):
+        """Tarefa pelo ID, ou None se não existir ou tiver expirado"""
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        """Aguarda o fim da tarefa; retorna False se ela não existir ou não terminar em ``timeout``"""
+        job = self.get(job_id)
+        return job is not None and job.done.wait(timeout)
+
+    def status(self, job_id):
+        """Estado da tarefa (dicionário de ``Job.status``), ou None"""
+        job = self.get(job_id)
+        return job.status() if job is not None else None
+
+    def result(self, job_id):
+        """Resultado da tarefa concluída, ou None se ainda não estiver pronta"""
+        job = self.get(job_id)
+        return job.result if job is not None and job.state == DONE else None
+
+    def _purge(self):
+        """Remove as tarefas concluídas há mais de ``ttl`` segundos (com o lock)"""
+        limit = time.time() - self.ttl
+        expired = [job for job in self._jobs.values() if job.finished is not None and job.finished < limit]
+        for job in expired:
+            del self._jobs[job.id]
+            if job.key is not None and self._keys.get(job.key) == job.id:
+                del self._keys[job.key]
+
+    def stats(self):
+        """Tarefas por estado"""
+        with self._lock:
+            self._purge()
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.state] += 1
+        return counts
+
+    def shutdown(self, wait=True):
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+
+
+# Fila compartilhada por todas as sessões do servidor
+report_queue = JobQueue()
@@ -0,0 +1,337 @@
+"""Pontuação da Mini Avaliação Nutricional (MNA) a partir das respostas.
+
+A triagem (itens A-F) vale até 14 pontos e a avaliação global (G-R), até 16;
+o total vai a 30. Cada item aceita apenas os pontos do questionário (D vale
+0 ou 2, K e M vão de meio em meio ponto, ...); respostas fora disso contam
+como inválidas. Os itens F (IMC), Q (circunferência do braço) e R
+(circunferência da panturrilha) saem das medidas quando a resposta traz a
+própria medida (um valor acima dos pontos do item) ou quando não foram
+respondidos; sem IMC, F usa a panturrilha, como no MNA reduzido.
+
+A pontuação é vetorizada: as respostas de todos os pacientes formam uma
+matriz pacientes x itens e as somas, a conferência com o total informado
+('Pontuação Total') e as faixas saem de operações sobre a matriz inteira, de
+modo que reclassificar todo o banco após uma mudança de regras é um único
+cálculo sobre as colunas do índice em memória. ``score_one`` aplica as mesmas
+regras a um único paciente, com escalares (importação e dashboard):
+
+    python -m nutricional.mna                          # banco de pacientes
+    python -m nutricional.mna --rules regras.json --divergentes
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+import numpy as np
+
+from .classification import MISSING, RuleEngine, default_engine
+
+Item = namedtuple('Item', 'letter field label points')
+
+SCREENING = (
+    Item('A', 'mna_a', 'Ingesta Alimentar', (0, 1, 2)),
+    Item('B', 'mna_b', 'Perda de Peso', (0, 1, 2, 3)),
+    Item('C', 'mna_c', 'Mobilidade', (0, 1, 2)),
+    Item('D', 'mna_d', 'Stress/Doença', (0, 2)),
+    Item('E', 'mna_e', 'Neuropsicológico', (0, 1, 2)),
+    Item('F', 'mna_f', 'IMC', (0, 1, 2, 3)),
+)
+ASSESSMENT = (
+    Item('G', 'mna_g', 'Vive em Casa', (0, 1)),
+    Item('H', 'mna_h', 'Medicamentos', (0, 1)),
+    Item('I', 'mna_i', 'Lesões de Pele', (0, 1)),
+    Item('J', 'mna_j', 'Refeições', (0, 1, 2)),
+    Item('K', 'mna_k', 'Consumo Proteico', (0, 0.5, 1)),
+    Item('L', 'mna_l', 'Frutas e Hortaliças', (0, 1)),
+    Item('M', 'mna_m', 'Líquidos', (0, 0.5, 1)),
+    Item('N', 'mna_n', 'Modo de Alimentar-se', (0, 1, 2)),
+    Item('O', 'mna_o', 'Autopercepção Nutricional', (0, 1, 2)),
+    Item('P', 'mna_p', 'Autopercepção de Saúde', (0, 0.5, 1, 2)),
+    Item('Q', 'mna_q', 'Circunferência do Braço', (0, 0.5, 1)),
+    Item('R', 'mna_r', 'Circunferência da Panturrilha', (0, 1)),
+)
+ITEMS = SCREENING + ASSESSMENT
+
+SCREENING_MAX = 14
+ASSESSMENT_MAX = 16
+MAX_POINTS = np.array([max(item.points) for item in ITEMS], dtype=np.float64)
+LETTERS = [item.letter for item in ITEMS]
+
+# Pontos aceitos em cada item, em meios pontos: ACCEPTED[item, 2 * pontos]
+ACCEPTED = np.zeros((len(ITEMS), int(2 * MAX_POINTS.max()) + 1), dtype=bool)
+for _position, _item in enumerate(ITEMS):
+    ACCEPTED[_position, [int(2 * value) for value in _item.points]] = True
+del _position, _item
+ITEM_POSITIONS = np.arange(len(ITEMS))
+
+# Item -> (campo medido, limites, pontos por faixa), com limite inferior inclusivo
+MEASURED = {
+    'F': ('imc', [19, 21, 23], [0, 1, 2, 3]),
+    # 21 <= CB <= 22 vale meio ponto
+    'Q': ('circunferencia_braco', [21, np.nextafter(22, np.inf)], [0, 0.5, 1]),
+    'R': ('circunferencia_panturrilha', [31], [0, 1]),
+}
+# Sem IMC, a triagem usa a panturrilha no item F (MNA reduzido)
+CALF_FOR_BMI = ('circunferencia_panturrilha', [31], [0, 3])
+
+# Diferença aceita entre o total calculado e o informado
+TOLERANCE = 0.01
+
+CHECK_OK, CHECK_DIVERGENT, CHECK_INCOMPLETE, CHECK_NO_TOTAL = 0, 1, 2, 3
+CHECK_LABELS = np.array(['Confere', 'Divergente', 'Incompleto', 'Sem total informado'], dtype=object)
+
+
+def measured_points(values, edges, points):
+    """Pontos de uma medida pelas faixas do item (NaN se ausente)"""
+    values = np.asarray(values, dtype=np.float64)
+    # Equivale a ``np.digitize`` (limites crescentes), sem o custo fixo dele
+    result = np.asarray(points, dtype=np.float64)[np.searchsorted(edges, values, side='right')]
+    result[np.isnan(values)] = np.nan
+    return result
+
+
+def _column(columns, name, size):
+    values = columns.get(name)
+    if values is None:
+        return np.full(size, np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+def answer_matrix(columns, size):
+    """Respostas dos itens em uma matriz pacientes x ``ITEMS`` (NaN onde ausente)"""
+    answers = np.full((size, len(ITEMS)), np.nan)
+    for position, item in enumerate(ITEMS):
+        values = columns.get(item.field)
+        if values is not None:
+            answers[:, position] = values
+    return answers
+
+
+def item_points(columns, size, answers=None):
+    """Pontos de cada item (matriz pacientes x ``ITEMS``) e as respostas inválidas por paciente
+
+    ``columns`` mapeia os campos do registro (``mna_a`` ... ``mna_r``,
+    ``imc``, ``circunferencia_braco``, ``circunferencia_panturrilha``) para
+    arrays de ``size`` valores, com NaN onde ausente. ``answers`` dispensa
+    montar a matriz das respostas quando ela já existe (um paciente).
+    """
+    if answers is None:
+        answers = answer_matrix(columns, size)
+    # Respostas em meios pontos, validadas de uma vez contra a tabela de pontos aceitos
+    halves = answers * 2
+    candidate = (halves >= 0) & (halves < ACCEPTED.shape[1]) & (halves == np.floor(halves))
+    valid = candidate & ACCEPTED[ITEM_POSITIONS, np.where(candidate, halves, 0).astype(np.intp)]
+    points = np.where(valid, answers, np.nan)
+    pending = ~valid & ~np.isnan(answers)
+    for letter, (field, edges, scores) in MEASURED.items():
+        position = LETTERS.index(letter)
+        column = answers[:, position]
+        # A própria medida no lugar dos pontos (IMC, CB ou CP em cm)
+        as_measure = pending[:, position] & (column > MAX_POINTS[position])
+        if as_measure.any():
+            points[as_measure, position] = measured_points(column[as_measure], edges, scores)
+            pending[as_measure, position] = False
+        unanswered = np.isnan(column)
+        if not unanswered.any():
+            continue
+        points[unanswered, position] = measured_points(_column(columns, field, size)[unanswered], edges, scores)
+        if letter == 'F':
+            calf = unanswered & np.isnan(points[:, position])
+            field, edges, scores = CALF_FOR_BMI
+            points[calf, position] = measured_points(_column(columns, field, size)[calf], edges, scores)
+    return points, pending.sum(axis=1)
+
+
+def score_mna(columns, size=None, engine=None, sex=None, age=None, answers=None):
+    """Triagem, avaliação global e total do MNA de cada paciente, conferidos com o total informado
+
+    ``columns`` e ``answers`` como em ``item_points``, mais ``mna_total``
+    (total informado).
+    Retorna um dicionário de arrays:
+
+    - ``pontos``: matriz pacientes x ``ITEMS``;
+    - ``triagem``, ``avaliacao`` e ``calculado``: somas (NaN se faltar algum item);
+    - ``invalidos``: respostas fora dos pontos do questionário;
+    - ``conferencia``: código de ``CHECK_LABELS`` (o total informado é
+      comparado com o calculado ou, sem a avaliação global, com a triagem);
+    - ``pontuacao``: total usado na classificação, o calculado ou, se
+      incompleto, o informado (NaN quando o informado é só a triagem);
+    - ``faixa`` e ``classificacao``: faixa do total pelas regras do MNA ou,
+      sem total ou com total só da triagem, da triagem calculada pelas
+      regras da triagem.
+    """
+    engine = engine or default_engine()
+    if size is None:
+        size = len(answers) if answers is not None else len(next(iter(columns.values())))
+    points, invalid = item_points(columns, size, answers)
+    screening = points[:, :len(SCREENING)].sum(axis=1)
+    assessment = points[:, len(SCREENING):].sum(axis=1)
+    computed = screening + assessment
+    informed = _column(columns, 'mna_total', size)
+
+    # Sem a avaliação global, um total informado de até 14 pontos é conferido com a triagem
+    screening_total = np.isnan(assessment) & ~np.isnan(screening) & (informed <= SCREENING_MAX)
+    compared = np.where(np.isnan(computed), np.where(screening_total, screening, np.nan), computed)
+    check = np.where(np.abs(compared - informed) <= TOLERANCE, CHECK_OK, CHECK_DIVERGENT)
+    check[np.isnan(compared)] = CHECK_INCOMPLETE
+    check[np.isnan(informed)] = CHECK_NO_TOTAL
+
+    score = np.where(np.isnan(computed), informed, computed)
+    # Total só da triagem (mesmo divergente): a classificação usa a triagem calculada
+    score[screening_total] = np.nan
+    bands = engine.mna.codes(score, sex, age)
+    screening_bands = engine.mna_screening.codes(screening, sex, age)
+    use_screening = (bands == MISSING) & (screening_bands != MISSING)
+    labels = engine.mna.labels[bands]
+    labels[use_screening] = engine.mna_screening.labels[screening_bands[use_screening]]
+    return {
+        'pontos': points,
+        'triagem': screening,
+        'avaliacao': assessment,
+        'calculado': computed,
+        'invalidos': invalid,
+        'conferencia': check.astype(np.int8),
+        'pontuacao': score,
+        'faixa': np.where(use_screening, screening_bands, bands).astype(np.int8),
+        'classificacao': labels,
+    }
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not math.isnan(value) else None
+
+
+def score_one(answers, informed=None, measures=None, engine=None, sex=None, age=None):
+    """``score_mna`` de um único paciente, com escalares
+
+    Mesmas regras, sem montar arrays: é o caminho de cada importação e de
+    cada paciente aberto no dashboard. ``answers`` e ``measures`` mapeiam os
+    campos do registro para valores (ausentes ou não numéricos são ignorados).
+    Retorna ``pontos`` por letra e ``triagem``, ``avaliacao``, ``calculado``,
+    ``pontuacao`` (None onde NaN), ``invalidos``, ``conferencia`` (código),
+    ``faixa`` e ``classificacao``.
+    """
+    engine = engine or default_engine()
+    measures = measures or {}
+    points, invalid = {}, 0
+    for position, item in enumerate(ITEMS):
+        value = _number(answers.get(item.field))
+        measured = MEASURED.get(item.letter)
+        result = None
+        if value is not None and value in item.points:
+            result = float(value)
+        elif measured is not None and (value is None or value > MAX_POINTS[position]):
+            # A própria medida no lugar dos pontos ou, sem resposta, a medida do registro
+            field, edges, scores = measured
+            if value is None:
+                value = _number(measures.get(field))
+                if value is None and item.letter == 'F':
+                    field, edges, scores = CALF_FOR_BMI
+                    value = _number(measures.get(field))
+            if value is not None:
+                result = float(scores[bisect_right(edges, value)])
+        elif value is not None:
+            invalid += 1
+        points[item.letter] = result
+
+    screening = assessment = None
+    if all(points[item.letter] is not None for item in SCREENING):
+        screening = float(sum(points[item.letter] for item in SCREENING))
+    if all(points[item.letter] is not None for item in ASSESSMENT):
+        assessment = float(sum(points[item.letter] for item in ASSESSMENT))
+    computed = screening + assessment if screening is not None and assessment is not None else None
+    informed = _number(informed)
+
+    # Sem a avaliação global, um total informado de até 14 pontos é conferido com a triagem
+    screening_total = (assessment is None and screening is not None
+                       and informed is not None and informed <= SCREENING_MAX)
+    compared = computed if computed is not None else screening if screening_total else None
+    if informed is None:
+        check = CHECK_NO_TOTAL
+    elif compared is None:
+        check = CHECK_INCOMPLETE
+    else:
+        check = CHECK_OK if abs(compared - informed) <= TOLERANCE else CHECK_DIVERGENT
+
+    score = computed if computed is not None else informed
+    if screening_total:
+        score = None
+    sex = None if sex is None else [sex]
+    age = None if age is None else [age]
+    band, table = MISSING, engine.mna
+    if score is not None:
+        band = int(table.codes([score], sex, age)[0])
+    if band == MISSING and screening is not None:
+        table = engine.mna_screening
+        band = int(table.codes([screening], sex, age)[0])
+    return {
+        'pontos': points,
+        'triagem': screening,
+        'avaliacao': assessment,
+        'calculado': computed,
+        'invalidos': invalid,
+        'conferencia': check,
+        'pontuacao': score,
+        'faixa': band,
+        'classificacao': table.labels[band],
+    }
+
+
+def array_columns(values):
+    """Colunas de ``score_mna`` a partir do array estruturado dos campos numéricos (com o IMC)"""
+    columns = {name: values[name] for name in values.dtype.names}
+    height = columns['altura'] / 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns['imc'] = np.where(height > 0, columns['peso_atual'] / height ** 2, np.nan)
+    return columns
+
+
+def score_summary(scores):
+    """Contagens por classificação e por resultado da conferência"""
+    labels, counts = np.unique(scores['classificacao'][scores['faixa'] != MISSING].astype(str), return_counts=True)
+    checks = np.bincount(scores['conferencia'], minlength=len(CHECK_LABELS))
+    return {
+        'pacientes': len(scores['faixa']),
+        'classificacao': dict(zip(labels.tolist(), counts.tolist())),
+        'conferencia': dict(zip(CHECK_LABELS.tolist(), checks.tolist())),
+        'respostas_invalidas': int(scores['invalidos'].sum()),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recalcula o MNA de todos os pacientes do banco")
+    parser.add_argument('--db', default=None, help="Arquivo do banco de pacientes")
+    parser.add_argument('--rules', default=None, help="Regras de classificação (JSON no formato de DEFAULT_RULES)")
+    parser.add_argument('--all', action='store_true', help="Todas as avaliações, não só a mais recente")
+    parser.add_argument('--divergentes', action='store_true', help="Lista os pacientes com total divergente")
+    args = parser.parse_args(argv)
+
+    from .store import PatientStore
+
+    engine = RuleEngine.from_json(args.rules) if args.rules else default_engine()
+    start = time.perf_counter()
+    patients, values = PatientStore(args.db).load_values(latest_only=not args.all)
+    loaded = time.perf_counter()
+    scores = score_mna(array_columns(values), len(values), engine)
+    scored = time.perf_counter()
+
+    result = score_summary(scores)
+    result['leitura_ms'] = (loaded - start) * 1000
+    result['calculo_ms'] = (scored - loaded) * 1000
+    if args.divergentes:
+        # Sem a avaliação global, o total informado foi conferido com a triagem
+        computed = np.where(np.isnan(scores['calculado']), scores['triagem'], scores['calculado'])
+        result['divergentes'] = [
+            {**patients[i], 'informado': float(values['mna_total'][i]), 'calculado': float(computed[i])}
+            for i in np.flatnonzero(scores['conferencia'] == CHECK_DIVERGENT)
+        ]
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Parser incremental do CSV por seções exportado pelo sistema de prontuário.
+
+O arquivo é composto por blocos: uma linha com o nome da seção, seguida de
+linhas ``chave,valor``; uma linha vazia (ou ``""``) encerra o bloco.
+"""
+import csv
+import io
+
+
+def coerce_value(value):
+    """Converte o valor para número quando possível"""
+    try:
+        if '.' in value:
+            return float(value)
+        return int(value) if value.isdigit() else value
+    except ValueError:
+        return value
+
+
+def iter_records(file, encoding='utf-8-sig'):
+    """Lê o arquivo incrementalmente e gera tuplas (seção, chave, valor)"""
+    text = io.TextIOWrapper(file, encoding=encoding, newline='')
+    try:
+        current_section = None
+        for row in csv.reader(text):
+            # Linha vazia ou "" encerra a seção atual
+            if not any(field.strip() for field in row):
+                continue
+
+            # Linha com um único campo é o título de uma nova seção
+            if len(row) == 1:
+                current_section = row[0].strip()
+                continue
+
+            if current_section is None:
+                continue
+
+            key = row[0].strip()
+            value = ','.join(row[1:]).strip()
+            if value:
+                yield current_section, key, coerce_value(value)
+    finally:
+        text.detach()
+
+
+def parse_sections(file, encoding='utf-8-sig'):
+    """Agrupa os registros do arquivo em um dicionário de seções"""
+    data = {}
+    for section, key, value in iter_records(file, encoding):
+        data.setdefault(section, {})[key] = value
+    return data
@@ -0,0 +1,161 @@
+"""Dados de um paciente e as métricas derivadas deles, sem dependência de interface."""
+from datetime import date
+
+from .classification import default_engine
+from .mna import CHECK_LABELS, ITEMS, score_one
+from .record import FOOD_RECORD, LABS, NUTRITION_GOALS, PATIENT, PatientRecord
+
+# Campos aceitos como data da avaliação, em ordem de preferência
+ASSESSMENT_DATE_FIELDS = ('Data da Avaliação', 'Data de Avaliação', 'Data da Consulta', 'Data do Atendimento')
+
+
+class PatientData:
+    """Seções do CSV de um paciente com acesso às métricas calculadas"""
+
+    def __init__(self, data=None, rules=None):
+        self.data = data if data is not None else {}
+        self.rules = rules or default_engine()
+
+    @property
+    def data(self):
+        """Seções do CSV ({seção: {campo: valor}})"""
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._record = None
+
+    @property
+    def record(self):
+        """``PatientRecord`` com os campos do esquema, montado sob demanda a partir das seções"""
+        if self._record is None:
+            self._record = PatientRecord.from_sections(self._data)
+        return self._record
+
+    def get_patient_info(self):
+        """Extrai informações básicas do paciente (pelo registro, que aceita 'DADOS DO PACIENTE')"""
+        return self.record.section(PATIENT)
+
+    def get_anthropometry_data(self):
+        """Extrai dados antropométricos"""
+        if 'ANTROPOMETRIA' in self.data:
+            return self.data['ANTROPOMETRIA']
+        return {}
+
+    def get_biochemical_data(self):
+        """Extrai dados de exames bioquímicos"""
+        if 'EXAMES BIOQUÍMICOS' in self.data:
+            return self.data['EXAMES BIOQUÍMICOS']
+        return {}
+
+    def get_mna_data(self):
+        """Extrai dados da avaliação MNA"""
+        if 'AVALIAÇÃO MNA' in self.data:
+            return self.data['AVALIAÇÃO MNA']
+        return {}
+
+    def calculate_imc(self):
+        """Calcula o IMC"""
+        record = self.record
+        # Valores não numéricos (falhas de conversão) não geram IMC
+        if isinstance(record.peso_atual, (int, float)) and isinstance(record.altura, (int, float)) and record.altura:
+            peso = record.peso_atual
+            altura = record.altura / 100
+            return peso / (altura ** 2)
+        return None
+
+    def get_patient_age(self):
+        """Calcula a idade aproximada a partir do ano de nascimento"""
+        birth_date = str(self.record.data_nascimento or '')
+        if birth_date[:4].isdigit():
+            return date.today().year - int(birth_date[:4])
+        return None
+
+    def classify_imc(self, imc):
+        """Classifica o IMC"""
+        sex = self.record.sexo
+        return self.rules.imc.classify_one(imc, sex=sex, age=self.get_patient_age())
+
+    def classify_mna(self, score):
+        """Retorna a faixa da pontuação MNA (MNA_MALNOURISHED, MNA_RISK ou MNA_NORMAL)"""
+        return int(self.rules.mna.codes([score])[0])
+
+    def get_mna_score(self):
+        """Pontuação do MNA calculada das respostas e conferida com o total informado (``mna.score_one``)"""
+        record = self.record
+        imc = self.calculate_imc()
+        scores = score_one(
+            {item.field: getattr(record, item.field) for item in ITEMS},
+            record.mna_total,
+            {'imc': imc, 'circunferencia_braco': record.circunferencia_braco,
+             'circunferencia_panturrilha': record.circunferencia_panturrilha},
+            self.rules, record.sexo, self.get_patient_age(),
+        )
+        scores['conferencia'] = CHECK_LABELS[scores['conferencia']]
+        return scores
+
+    def classify_labs(self):
+        """Classifica os exames com faixa de referência definida nas regras"""
+        record = self.record
+        sex = record.sexo
+        age = self.get_patient_age()
+        results = {}
+        for name, bands in self.rules.labs.items():
+            value = record.get(LABS, self.rules.lab_field(name))
+            if not isinstance(value, (int, float)):
+                continue
+            label, color = bands.classify_one(value, sex=sex, age=age)
+            results[name] = {'valor': value, 'classificacao': label, 'cor': color}
+        return results
+
+    def get_metrics(self):
+        """Reúne as métricas calculadas do paciente em um dicionário serializável"""
+        imc = self.calculate_imc()
+        imc_label, imc_color = self.classify_imc(imc) if imc else (None, None)
+        record = self.record
+        mna = self.get_mna_score()
+        return {
+            'imc': imc,
+            'imc_classificacao': imc_label,
+            'imc_cor': imc_color,
+            'mna_total': record.mna_total,
+            'mna_calculado': mna['calculado'],
+            'mna_triagem': mna['triagem'],
+            'mna_conferencia': mna['conferencia'],
+            'mna_classificacao': mna['classificacao'],
+            'mna_diagnostico': record.mna_diagnostico,
+            'exames': self.classify_labs(),
+        }
+
+    def get_intake(self):
+        """Consumo calculado do registro alimentar por item (``intake.patient_intake``), ou None sem registro"""
+        from .intake import patient_intake
+
+        return patient_intake(self.data)
+
+    def get_daily_intake(self):
+        """Média diária dos nutrientes do registro alimentar (``intake.daily_intake``), ou None sem registro"""
+        from .intake import daily_intake
+
+        return daily_intake(self.data)
+
+    def get_goal_intake(self):
+        """Consumo de cada nutriente das metas (``intake.goal_intake``): registro alimentar ou histórico"""
+        reported = {nutrient: getattr(self.record, f'consumo_{nutrient}') for nutrient in NUTRITION_GOALS}
+        if FOOD_RECORD not in self.data:
+            return reported
+        from .intake import goal_intake
+
+        recorded = self.get_daily_intake()
+        return {nutrient: goal_intake(nutrient, value, recorded) for nutrient, value in reported.items()}
+
+    def get_assessment_date(self):
+        """Data da avaliação (AAAA-MM-DD) informada em qualquer seção, se houver"""
+        if self.record.data_avaliacao is not None:
+            return str(self.record.data_avaliacao)[:10]
+        for values in self.data.values():
+            for field in ASSESSMENT_DATE_FIELDS:
+                if field in values:
+                    return str(values[field])[:10]
+        return None
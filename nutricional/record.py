@@ -0,0 +1,293 @@
+"""Registro tipado e compacto de um paciente.
+
+Cada campo conhecido do CSV é mapeado, no parse, para um slot fixo de
+``PatientRecord`` (``__slots__``) e lido como atributo (``record.peso_atual``),
+em vez de dois níveis de dicionários indexados por textos longos. As grafias
+exportadas pelo prontuário ('ADOS DO PACIENTE', 'Createina (mg/dL)',
+'Restrições Alimentare') e as corrigidas são aceitas como aliases; as
+perguntas do MNA são reconhecidas pela letra (``"G. ..."``). Campos fora do
+esquema são preservados em ``extras``.
+
+Para muitos pacientes, ``records_to_array`` reúne os campos numéricos em um
+array estruturado do NumPy (uma coluna float64 por campo).
+"""
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from .parser import iter_records
+
+Field = namedtuple('Field', 'name section key aliases numeric', defaults=((), False))
+
+PATIENT = 'ADOS DO PACIENTE'
+ANAMNESIS = 'ANAMNESE'
+ANTHROPOMETRY = 'ANTROPOMETRIA'
+MNA = 'AVALIAÇÃO MNA'
+LABS = 'EXAMES BIOQUÍMICOS'
+PRESCRIPTION = 'PRESCRIÇÃO DIETÉTICA'
+FOOD_HISTORY = 'HISTÓRICO ALIMENTAR'
+# Registro alimentar por item (``nutricional.intake``); fica em ``extras``
+FOOD_RECORD = 'REGISTRO ALIMENTAR'
+
+# Grafias alternativas das seções -> nome exportado pelo prontuário
+SECTION_ALIASES = {'DADOS DO PACIENTE': PATIENT}
+
+SCHEMA = (
+    Field('nome', PATIENT, 'Nome'),
+    Field('data_nascimento', PATIENT, 'Data de Nascimento'),
+    Field('sexo', PATIENT, 'Sexo'),
+    Field('telefone', PATIENT, 'Telefone'),
+    Field('registro', PATIENT, 'Número de Registro'),
+    Field('data_avaliacao', PATIENT, 'Data da Avaliação',
+          ('Data de Avaliação', 'Data da Consulta', 'Data do Atendimento')),
+    Field('queixa_principal', ANAMNESIS, 'Queixa Principal'),
+    Field('peso_atual', ANTHROPOMETRY, 'Peso Atual (kg)', numeric=True),
+    Field('peso_usual', ANTHROPOMETRY, 'Peso Usual (kg)', numeric=True),
+    Field('altura', ANTHROPOMETRY, 'Altura (cm)', numeric=True),
+    Field('circunferencia_braco', ANTHROPOMETRY, 'Circunferência do Braço (cm)', numeric=True),
+    Field('circunferencia_panturrilha', ANTHROPOMETRY, 'Circunferência da Panturrilha (cm)', numeric=True),
+    Field('gordura_corporal', ANTHROPOMETRY, 'Percentual de Gordura Corporal (%)', numeric=True),
+    Field('massa_muscular', ANTHROPOMETRY, 'Massa Muscular (kg)', numeric=True),
+    Field('relacao_cintura_quadril', ANTHROPOMETRY, 'Relação Cintura/Quadril', numeric=True),
+    Field('mna_a', MNA, 'A. Nos últimos três meses houve diminuição da ingesta alimentar devido a perda de '
+                        'apetite, problemas digestivos ou dificuldade para mastigar ou deglutir?', numeric=True),
+    Field('mna_b', MNA, 'B. Perda de peso nos últimos 3 meses', numeric=True),
+    Field('mna_c', MNA, 'C. Mobilidade', numeric=True),
+    Field('mna_d', MNA, 'D. Passou por algum stress psicológico ou doença aguda nos últimos três meses?',
+          numeric=True),
+    Field('mna_e', MNA, 'E. Problemas neuropsicológicos', numeric=True),
+    Field('mna_f', MNA, 'F. Índice de Massa Corporal (IMC)', numeric=True),
+    Field('mna_g', MNA, 'G. O paciente vive em sua própria casa (não em casa geriátrica ou hospital)', numeric=True),
+    Field('mna_h', MNA, 'H. Utiliza mais de três medicamentos diferentes por dia?', numeric=True),
+    Field('mna_i', MNA, 'I. Lesões de pele ou escaras?', numeric=True),
+    Field('mna_j', MNA, 'J. Quantas refeições faz por dia?', numeric=True),
+    Field('mna_k', MNA, 'K. O paciente consome: pelo menos uma porção diária de leite ou derivados, duas ou '
+                        'mais porções semanais de leguminosas ou ovos e carne, peixe ou aves todos os dias?',
+          numeric=True),
+    Field('mna_l', MNA, 'L. O paciente consome duas ou mais porções diárias de frutas ou produtos hortícolas?',
+          numeric=True),
+    Field('mna_m', MNA, 'M. Quantos copos de líquidos (água, suco, café, chá, leite) o paciente consome por dia?',
+          numeric=True),
+    Field('mna_n', MNA, 'N. Modo de se alimentar', numeric=True),
+    Field('mna_o', MNA, 'O. O paciente acredita ter algum problema nutricional?', numeric=True),
+    Field('mna_p', MNA, 'P. Em comparação a outras pessoas da mesma idade, como o paciente considera a sua '
+                        'própria saúde?', numeric=True),
+    Field('mna_q', MNA, 'Q. Circunferência do braço (CB) em cm', numeric=True),
+    Field('mna_r', MNA, 'R. Circunferência da panturrilha (CP) em cm', numeric=True),
+    Field('mna_total', MNA, 'Pontuação Total', numeric=True),
+    Field('mna_diagnostico', MNA, 'Diagnóstico'),
+    Field('glicose', LABS, 'Glicose (mg/dL)', numeric=True),
+    Field('colesterol_total', LABS, 'Colesterol total (mg/dL)', numeric=True),
+    Field('hdl', LABS, 'HDL (mg/dL)', numeric=True),
+    Field('ldl', LABS, 'LDL (mg/dL)', numeric=True),
+    Field('albumina', LABS, 'Albumina (g/dL)', numeric=True),
+    Field('hemoglobina', LABS, 'Hemoglobina (g/dL)', numeric=True),
+    Field('ferritina', LABS, 'Ferritina (ng/mL)', numeric=True),
+    Field('ureia', LABS, 'Ureia (mg/dL)', numeric=True),
+    Field('creatinina', LABS, 'Createina (mg/dL)', ('Creatinina (mg/dL)',), numeric=True),
+    Field('tipo_dieta', PRESCRIPTION, 'Tipo de Dieta'),
+    Field('meta_calorias', PRESCRIPTION, 'Meta Calórica (Kcal/dia)', numeric=True),
+    Field('meta_proteinas', PRESCRIPTION, 'Meta de Proteína (g/dia)', numeric=True),
+    Field('meta_carboidratos', PRESCRIPTION, 'Meta de Carboidratos (g/dia)', numeric=True),
+    Field('meta_gorduras', PRESCRIPTION, 'Meta de Gordura (g/dia)', numeric=True),
+    Field('restricoes_alimentares', PRESCRIPTION, 'Restrições Alimentare', ('Restrições Alimentares',)),
+    Field('suplementos', PRESCRIPTION, 'Suplementos Nutricionais'),
+    Field('plano_alimentar', PRESCRIPTION, 'Plano Alimentar Detalhado'),
+    Field('consumo_calorias', FOOD_HISTORY, 'Total de Calorias', numeric=True),
+    Field('consumo_proteinas', FOOD_HISTORY, 'Total de Proteínas', numeric=True),
+    Field('consumo_carboidratos', FOOD_HISTORY, 'Total de Carboidratos', numeric=True),
+    Field('consumo_gorduras', FOOD_HISTORY, 'Total de Gorduras', numeric=True),
+)
+
+FIELD_NAMES = tuple(field.name for field in SCHEMA)
+NUMERIC_FIELDS = tuple(field.name for field in SCHEMA if field.numeric)
+FIELDS = {field.name: field for field in SCHEMA}
+
+# (seção, chave) -> slot, incluindo os aliases de seção e de campo
+FIELD_INDEX = {}
+for _field in SCHEMA:
+    _sections = [_field.section] + [alias for alias, section in SECTION_ALIASES.items() if section == _field.section]
+    for _section in _sections:
+        for _key in (_field.key,) + _field.aliases:
+            FIELD_INDEX[(_section, _key)] = _field.name
+del _field, _sections, _section, _key
+
+# Item do MNA pela letra inicial ("G. ..."), qualquer que seja o texto da pergunta
+MNA_ITEM_KEY = re.compile(r'\s*([A-R])\s*[.)]')
+
+
+def mna_item_field(key):
+    """Campo do registro (``mna_a`` a ``mna_r``) de uma pergunta do MNA, pela letra, ou None"""
+    match = MNA_ITEM_KEY.match(key)
+    return f'mna_{match.group(1).lower()}' if match else None
+
+
+def field_name(section, key):
+    """Campo do registro de um par (seção, chave) do CSV, ou None se estiver fora do esquema"""
+    name = FIELD_INDEX.get((section, key))
+    if name is None and SECTION_ALIASES.get(section, section) == MNA:
+        name = mna_item_field(key)
+    return name
+
+
+# Nutrientes com meta na prescrição (``meta_*``) e total no histórico alimentar (``consumo_*``)
+NUTRITION_GOALS = ('calorias', 'proteinas', 'carboidratos', 'gorduras')
+
+# Seções que toda exportação deve conter
+EXPECTED_SECTIONS = (PATIENT, ANAMNESIS, ANTHROPOMETRY, MNA, LABS, PRESCRIPTION, FOOD_HISTORY)
+
+# Campos sem os quais as métricas principais não podem ser calculadas
+REQUIRED_FIELDS = ('nome', 'registro', 'data_nascimento', 'sexo', 'peso_atual', 'altura', 'mna_total')
+
+# Uma coluna float64 por campo numérico (NaN quando ausente)
+RECORD_DTYPE = np.dtype([(name, np.float64) for name in NUMERIC_FIELDS])
+
+
+class PatientRecord:
+    """Dados de um paciente em slots fixos, um por campo do esquema"""
+
+    __slots__ = FIELD_NAMES + ('extras',)
+
+    def __init__(self, **values):
+        for name in FIELD_NAMES:
+            setattr(self, name, values.pop(name, None))
+        # Campos fora do esquema: {seção: {chave: valor}}, ou None se não houver
+        self.extras = values.pop('extras', None)
+        if values:
+            raise TypeError(f"Campos desconhecidos: {', '.join(values)}")
+
+    @classmethod
+    def from_items(cls, items):
+        """Monta o registro a partir de tuplas (seção, chave, valor)"""
+        record = cls()
+        for section, key, value in items:
+            record.set(section, key, value)
+        return record
+
+    @classmethod
+    def from_sections(cls, sections):
+        """Monta o registro a partir do dicionário de seções do parser"""
+        return cls.from_items(
+            (section, key, value)
+            for section, values in sections.items()
+            for key, value in values.items()
+        )
+
+    def set(self, section, key, value):
+        """Grava um valor pelo par (seção, chave) do CSV, resolvendo os aliases"""
+        name = field_name(section, key)
+        if name is not None:
+            setattr(self, name, value)
+            return
+        if self.extras is None:
+            self.extras = {}
+        self.extras.setdefault(SECTION_ALIASES.get(section, section), {})[key] = value
+
+    def get(self, section, key, default=None):
+        """Lê um valor pelo par (seção, chave) do CSV, resolvendo os aliases"""
+        name = field_name(section, key)
+        if name is not None:
+            value = getattr(self, name)
+        elif self.extras is not None:
+            value = self.extras.get(SECTION_ALIASES.get(section, section), {}).get(key)
+        else:
+            value = None
+        return default if value is None else value
+
+    def section(self, section):
+        """Valores de uma seção ({chave: valor}, chaves exportadas), resolvendo o alias da seção"""
+        section = SECTION_ALIASES.get(section, section)
+        values = {}
+        for field in SCHEMA:
+            if field.section == section and getattr(self, field.name) is not None:
+                values[field.key] = getattr(self, field.name)
+        values.update((self.extras or {}).get(section, ()))
+        return values
+
+    def to_sections(self):
+        """Converte de volta para o dicionário de seções, com as chaves exportadas"""
+        sections = {}
+        for field in SCHEMA:
+            value = getattr(self, field.name)
+            if value is not None:
+                sections.setdefault(field.section, {})[field.key] = value
+        for section, values in (self.extras or {}).items():
+            sections.setdefault(section, {}).update(values)
+        return sections
+
+    def __eq__(self, other):
+        if not isinstance(other, PatientRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f'PatientRecord(registro={self.registro!r}, nome={self.nome!r})'
+
+
+def parse_record(file, encoding='utf-8-sig'):
+    """Lê o CSV do paciente diretamente para um ``PatientRecord``"""
+    return PatientRecord.from_items(iter_records(file, encoding))
+
+
+def records_to_array(records):
+    """Reúne os campos numéricos de vários registros em um array estruturado
+
+    Valores ausentes ou não numéricos viram NaN.
+    """
+    records = list(records)
+    array = np.full(len(records), np.nan, dtype=RECORD_DTYPE)
+    for name in NUMERIC_FIELDS:
+        array[name] = [
+            value if isinstance(value, (int, float)) else np.nan
+            for value in (getattr(record, name) for record in records)
+        ]
+    return array
+
+
+def numeric_values(record):
+    """Valores dos campos numéricos na ordem de ``NUMERIC_FIELDS`` (None se ausente ou não numérico)"""
+    return [
+        value if isinstance(value, (int, float)) else None
+        for value in (getattr(record, name) for name in NUMERIC_FIELDS)
+    ]
+
+
+def values_to_array(rows):
+    """Array estruturado a partir de listas de ``numeric_values`` (None vira NaN)"""
+    matrix = np.array(rows, dtype=np.float64).reshape(-1, len(NUMERIC_FIELDS))
+    array = np.empty(len(matrix), dtype=RECORD_DTYPE)
+    for column, name in enumerate(NUMERIC_FIELDS):
+        array[name] = matrix[:, column]
+    return array
+
+
+def validate_record(record):
+    """Confere o registro com o esquema esperado
+
+    Retorna ``{'secoes_ausentes', 'campos_ausentes', 'falhas_conversao'}``;
+    campos são identificados como ``"SEÇÃO/campo"`` (grafia exportada).
+    """
+    present = {field.section for field in SCHEMA if getattr(record, field.name) is not None}
+    present.update(record.extras or ())
+    missing_fields = [
+        f'{FIELDS[name].section}/{FIELDS[name].key}'
+        for name in REQUIRED_FIELDS
+        if getattr(record, name) is None
+    ]
+    # Campos numéricos que continuaram texto após a conversão do parser
+    coercion_failures = [
+        {'campo': f'{field.section}/{field.key}', 'valor': value}
+        for field in SCHEMA
+        if field.numeric and isinstance(value := getattr(record, field.name), str)
+    ]
+    return {
+        'secoes_ausentes': [section for section in EXPECTED_SECTIONS if section not in present],
+        'campos_ausentes': missing_fields,
+        'falhas_conversao': coercion_failures,
+    }
+
+
+def is_valid(validation):
+    """Um arquivo é válido sem seções ou campos obrigatórios ausentes e sem falhas de conversão"""
+    return not any(validation.values())
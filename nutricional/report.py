@@ -0,0 +1,378 @@
+"""Relatórios nutricionais em PDF (ReportLab): um paciente ou a coorte consolidada.
+
+Estilos de parágrafo e de tabela são criados uma vez no módulo e
+compartilhados por todas as tabelas e relatórios.
+"""
+import hashlib
+import os
+from array import array
+from collections import deque
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+
+from .patient import PatientData
+
+# Incrementar sempre que o layout do relatório mudar, invalidando os PDFs em cache
+REPORT_TEMPLATE_VERSION = 2
+
+CHART_WIDTH = 6.5 * inch
+
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    spaceAfter=30,
+    textColor=colors.HexColor('#2E8B57'),
+    alignment=1
+)
+
+# Tabelas "rótulo: valor" das seções do paciente
+FIELD_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+# Tabelas com cabeçalho do resumo da coorte
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E8F5E9')),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.HexColor('#2E8B57')),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+# Pacientes por parte do relatório consolidado (memória da montagem pelo ReportLab)
+COHORT_PART_SIZE = 500
+
+
+def report_cache_key(content_hash, rules, charts=(), food_table=''):
+    """Chave do relatório: conteúdo do paciente, regras, versão do layout, gráficos
+    e, se o consumo calculado entra nos gráficos, a tabela de composição (fingerprint)"""
+    parts = [content_hash, rules.fingerprint, str(REPORT_TEMPLATE_VERSION), *charts]
+    if food_table:
+        parts.append(food_table)
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def render_pdf(sections, charts=()):
+    """PDF (bytes) do paciente a partir das seções do CSV (executável em um processo do pool)"""
+    buffer = BytesIO()
+    build_pdf_report(PatientData(sections), buffer, charts=charts)
+    return buffer.getvalue()
+
+
+def field_table(rows, col_widths):
+    """Tabela "rótulo: valor" com o estilo compartilhado"""
+    table = Table(rows, colWidths=col_widths)
+    table.setStyle(FIELD_TABLE_STYLE)
+    return table
+
+
+def patient_story(patient, title=None):
+    """Seções de um paciente (dados, antropometria, MNA e prescrição) como flowables
+
+    ``title`` é um cabeçalho opcional da seção do paciente no relatório consolidado.
+    """
+    story = []
+    if title is not None:
+        story.append(Paragraph(title, STYLES['Heading1']))
+
+    # Informações do paciente
+    patient_info = patient.get_patient_info()
+    if patient_info:
+        story.append(Paragraph("Dados do Paciente", STYLES['Heading2']))
+
+        patient_data = [
+            ['Nome:', patient_info.get('Nome', 'N/A')],
+            ['Data de Nascimento:', patient_info.get('Data de Nascimento', 'N/A')],
+            ['Sexo:', patient_info.get('Sexo', 'N/A')],
+            ['Telefone:', patient_info.get('Telefone', 'N/A')],
+            ['Registro:', str(patient_info.get('Número de Registro', 'N/A'))]
+        ]
+        story.append(field_table(patient_data, [2*inch, 3*inch]))
+        story.append(Spacer(1, 20))
+
+    # Dados antropométricos
+    anthro = patient.get_anthropometry_data()
+    if anthro:
+        story.append(Paragraph("Avaliação Antropométrica", STYLES['Heading2']))
+
+        imc = patient.calculate_imc()
+        imc_classification, _ = patient.classify_imc(imc) if imc is not None else ("N/A", "")
+
+        anthro_data = [
+            ['Peso Atual:', f"{anthro.get('Peso Atual (kg)', 'N/A')} kg"],
+            ['Altura:', f"{anthro.get('Altura (cm)', 'N/A')} cm"],
+            ['IMC:', "N/A" if imc is None else f"{imc:.1f}"],
+            ['Classificação IMC:', imc_classification],
+            ['Circunferência do Braço:', f"{anthro.get('Circunferência do Braço (cm)', 'N/A')} cm"],
+            ['% Gordura Corporal:', f"{anthro.get('Percentual de Gordura Corporal (%)', 'N/A')}%"]
+        ]
+        story.append(field_table(anthro_data, [2.5*inch, 2.5*inch]))
+        story.append(Spacer(1, 20))
+
+    # Avaliação MNA
+    mna = patient.get_mna_data()
+    if mna:
+        story.append(Paragraph("Avaliação MNA", STYLES['Heading2']))
+
+        score = patient.get_mna_score()
+        mna_data = [
+            ['Triagem (A-F):', 'N/A' if score['triagem'] is None else f"{score['triagem']:g} / 14"],
+            ['Avaliação Global (G-R):', 'N/A' if score['avaliacao'] is None else f"{score['avaliacao']:g} / 16"],
+            ['Pontuação Calculada:', 'N/A' if score['calculado'] is None else f"{score['calculado']:g} / 30"],
+            ['Pontuação Total:', str(mna.get('Pontuação Total', 'N/A'))],
+            ['Conferência:', score['conferencia']],
+            ['Diagnóstico:', mna.get('Diagnóstico', 'N/A')]
+        ]
+        story.append(field_table(mna_data, [2.5*inch, 2.5*inch]))
+        story.append(Spacer(1, 20))
+
+    # Prescrição dietética
+    if 'PRESCRIÇÃO DIETÉTICA' in patient.data:
+        prescription = patient.data['PRESCRIÇÃO DIETÉTICA']
+        story.append(Paragraph("Prescrição Dietética", STYLES['Heading2']))
+
+        restrictions = patient.record.restricoes_alimentares
+        prescription_data = [
+            ['Tipo de Dieta:', prescription.get('Tipo de Dieta', 'N/A')],
+            ['Meta Calórica:', f"{prescription.get('Meta Calórica (Kcal/dia)', 'N/A')} kcal/dia"],
+            ['Meta de Proteína:', f"{prescription.get('Meta de Proteína (g/dia)', 'N/A')} g/dia"],
+            ['Restrições:', 'Nenhuma' if restrictions is None else restrictions]
+        ]
+        story.append(field_table(prescription_data, [2.5*inch, 2.5*inch]))
+    return story
+
+
+def build_pdf_report(patient, output, charts=()):
+    """Gera o relatório em PDF de um paciente no arquivo ``output``
+
+    ``patient`` é um ``PatientData``; ``output`` pode ser um caminho ou um
+    objeto de arquivo binário. ``charts`` é uma lista de ``(título, png,
+    proporção altura/largura)`` incluída ao final do relatório.
+    """
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    story = [Paragraph("Relatório Nutricional", TITLE_STYLE), Spacer(1, 20)]
+    story.extend(patient_story(patient))
+
+    # Gráficos do dashboard como imagens estáticas
+    if charts:
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Gráficos", STYLES['Heading2']))
+        for title, png, aspect in charts:
+            story.append(Paragraph(title, STYLES['Heading3']))
+            story.append(Image(BytesIO(png), width=CHART_WIDTH, height=CHART_WIDTH * aspect))
+            story.append(Spacer(1, 12))
+
+    doc.build(story)
+    return output
+
+
+def summary_table(header, rows, col_widths):
+    """Tabela do resumo da coorte com o estilo compartilhado"""
+    table = Table([header, *rows], colWidths=col_widths, repeatRows=1)
+    table.setStyle(SUMMARY_TABLE_STYLE)
+    return table
+
+
+def summary_story(metrics):
+    """Tabelas de resumo da coorte a partir de ``compute_cohort_metrics``"""
+    from .cohort import lab_flag_rates
+
+    total = len(metrics)
+    story = [
+        Paragraph("Resumo da Coorte", STYLES['Heading2']),
+        summary_table(['Indicador', 'Valor'], [
+            ['Pacientes', str(total)],
+            ['IMC médio', f"{metrics['imc'].mean():.1f}" if metrics['imc'].notna().any() else 'N/A'],
+            ['Score MNA médio', f"{metrics['mna_total'].mean():.1f}" if metrics['mna_total'].notna().any() else 'N/A'],
+            ['Risco/Desnutrição (MNA < 24)', str(int(metrics['mna_total'].lt(24).sum()))],
+            ['MNA divergente das respostas', str(int(metrics['mna_conferencia'].eq('Divergente').sum()))],
+        ], [3.5*inch, 1.5*inch]),
+        Spacer(1, 20),
+    ]
+    for column, title in (('imc_classificacao', "Classificação do IMC"), ('mna_classificacao', "Diagnóstico MNA")):
+        counts = metrics[column].value_counts()
+        story.append(Paragraph(title, STYLES['Heading3']))
+        story.append(summary_table(
+            ['Classificação', 'Pacientes', '%'],
+            [[str(label), str(count), f"{count / total * 100:.1f}"] for label, count in counts.items()],
+            [3*inch, 1*inch, 1*inch],
+        ))
+        story.append(Spacer(1, 20))
+
+    rates = lab_flag_rates(metrics)
+    if len(rates):
+        story.append(Paragraph("Exames Fora da Referência", STYLES['Heading3']))
+        story.append(summary_table(
+            ['Exame', '% de pacientes'],
+            [[marker, f"{rate * 100:.1f}"] for marker, rate in rates.items()],
+            [3*inch, 2*inch],
+        ))
+    return story
+
+
+class PdfConcatenator:
+    """Concatena PDFs em um único arquivo, gravando os objetos de cada parte ao anexá-la
+
+    Cada parte é lida com o pypdf e copiada para ``output`` (caminho ou
+    arquivo binário) com os objetos renumerados; ficam em memória apenas a
+    parte atual e, até ``close()``, a posição de cada objeto gravado e o
+    número de cada página.
+    """
+
+    def __init__(self, output, title=None):
+        self._owns_file = isinstance(output, (str, os.PathLike))
+        self._file = open(output, 'wb') if self._owns_file else output
+        self.title = title
+        self._position = 0
+        # Posição de cada objeto (número - 1); o catálogo (1) e a árvore de
+        # páginas (2) são gravados no final, quando as páginas são conhecidas
+        self._offsets = array('q', [0, 0])
+        self._pages = array('q')
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self._file.write(data)
+        self._position += len(data)
+
+    def _write_object(self, number, obj):
+        self._offsets[number - 1] = self._position
+        buffer = BytesIO()
+        buffer.write(f'{number} 0 obj\n'.encode())
+        obj.write_to_stream(buffer)
+        buffer.write(b'\nendobj\n')
+        self._write(buffer.getvalue())
+
+    def _reserve(self):
+        self._offsets.append(0)
+        return len(self._offsets)
+
+    def append(self, source):
+        """Anexa as páginas de um PDF (caminho ou arquivo binário) e grava seus objetos"""
+        from pypdf import PdfReader
+        from pypdf.generic import IndirectObject, NameObject
+
+        reader = PdfReader(source)
+        numbers = {}
+        pending = deque()
+
+        def renumber(reference):
+            key = (reference.idnum, reference.generation)
+            if key not in numbers:
+                numbers[key] = self._reserve()
+                pending.append(reference)
+            return IndirectObject(numbers[key], 0, None)
+
+        def remap(obj):
+            if isinstance(obj, IndirectObject):
+                return renumber(obj)
+            if isinstance(obj, dict):
+                for key, value in list(dict.items(obj)):
+                    obj[key] = remap(value)
+            elif isinstance(obj, list):
+                for i, value in enumerate(obj):
+                    obj[i] = remap(value)
+            return obj
+
+        page_numbers = set()
+        for page in reader.pages:
+            number = renumber(page.indirect_reference).idnum
+            self._pages.append(number)
+            page_numbers.add(number)
+        while pending:
+            reference = pending.popleft()
+            number = numbers[(reference.idnum, reference.generation)]
+            obj = reference.get_object()
+            if number in page_numbers:
+                # A página passa a pertencer à árvore do PDF final (objeto 2)
+                del obj[NameObject('/Parent')]
+                remap(obj)
+                obj[NameObject('/Parent')] = IndirectObject(2, 0, None)
+            else:
+                remap(obj)
+            self._write_object(number, obj)
+
+    def close(self):
+        """Grava a árvore de páginas, o catálogo e a tabela de referências"""
+        from pypdf.generic import DictionaryObject, NameObject, create_string_object
+
+        kids = b' '.join(b'%d 0 R' % number for number in self._pages)
+        self._offsets[1] = self._position
+        self._write(b'2 0 obj\n<< /Type /Pages /Count %d /Kids [ %s ] >>\nendobj\n' % (len(self._pages), kids))
+        self._offsets[0] = self._position
+        self._write(b'1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n')
+        info = DictionaryObject({NameObject('/Producer'): create_string_object('Dashboard Nutricional')})
+        if self.title:
+            info[NameObject('/Title')] = create_string_object(self.title)
+        info_number = self._reserve()
+        self._write_object(info_number, info)
+
+        xref = self._position
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(self._offsets) + 1))
+        for start in range(0, len(self._offsets), 10_000):
+            self._write(b''.join(b'%010d 00000 n \n' % offset for offset in self._offsets[start:start + 10_000]))
+        self._write(
+            b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (len(self._offsets) + 1, info_number, xref)
+        )
+        if self._owns_file:
+            self._file.close()
+
+
+def render_story(story):
+    """PDF (em memória) de uma parte do relatório consolidado"""
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4).build(story)
+    buffer.seek(0)
+    return buffer
+
+
+def build_cohort_report(patients, output, metrics=None, title="Relatório Nutricional da Coorte", progress=None):
+    """Gera o relatório consolidado da coorte: resumo e uma seção por paciente
+
+    ``patients`` é um iterável de dicionários de seções, consumido em partes
+    de ``COHORT_PART_SIZE`` pacientes: cada parte é montada pelo ReportLab e
+    anexada ao PDF final (``PdfConcatenator``) antes da leitura da próxima,
+    de modo que a memória depende do tamanho da parte e não da coorte.
+    ``metrics`` (``compute_cohort_metrics``) gera as tabelas de resumo no
+    início. ``output`` pode ser um caminho ou um objeto de arquivo binário.
+    ``progress`` é chamado com o número de pacientes já incluídos, ao final
+    de cada parte. Retorna o número de pacientes.
+    """
+    story = [Paragraph(title, TITLE_STYLE), Spacer(1, 20)]
+    if metrics is not None and len(metrics):
+        story.extend(summary_story(metrics))
+    merger = PdfConcatenator(output, title)
+    done = 0
+    for sections in patients:
+        patient = PatientData(sections)
+        info = patient.get_patient_info()
+        heading = info.get('Nome', 'Paciente')
+        if info.get('Número de Registro') is not None:
+            heading = f"{heading} ({info['Número de Registro']})"
+        if story:
+            story.append(PageBreak())
+        story.extend(patient_story(patient, title=heading))
+        done += 1
+        if done % COHORT_PART_SIZE == 0:
+            merger.append(render_story(story))
+            story = []
+            if progress is not None:
+                progress(done)
+    if story:
+        merger.append(render_story(story))
+        if progress is not None:
+            progress(done)
+    merger.close()
+    return done
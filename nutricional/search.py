@@ -0,0 +1,125 @@
+"""Índice em memória para filtrar e buscar os pacientes armazenados.
+
+Montado uma vez a partir da avaliação mais recente de cada paciente do banco
+(coluna ``valores``, sem o parse das seções) e compartilhado por todas as
+sessões:
+
+- campos numéricos: valores ordenados e a permutação que os ordena, de modo
+  que uma faixa (``albumina < 3.5``) é resolvida com duas buscas binárias e
+  vira uma máscara booleana, combinada com as demais por AND;
+- nome e número de registro: tokens normalizados (sem acentos, minúsculos)
+  em um array ordenado, onde a busca por prefixo também é binária.
+"""
+import threading
+import unicodedata
+
+import numpy as np
+
+from .record import NUMERIC_FIELDS
+
+# Sentinela maior que qualquer caractere, para o fim do intervalo de um prefixo
+_PREFIX_END = '\U0010ffff'
+
+
+def normalize(text):
+    """Texto para a busca: minúsculo e sem acentos"""
+    decomposed = unicodedata.normalize('NFKD', str(text).casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return normalize(text).split()
+
+
+class PatientIndex:
+    """Filtros por faixa e busca por prefixo sobre uma lista fixa de pacientes"""
+
+    def __init__(self, patients, values):
+        """``patients`` são dicionários (``registro``, ``nome``, ...) e ``values`` o array
+        estruturado dos campos numéricos (``records_to_array``/``values_to_array``)"""
+        self.patients = list(patients)
+        self.columns = {name: values[name] for name in NUMERIC_FIELDS}
+        height = self.columns['altura'] / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.columns['imc'] = np.where(height > 0, self.columns['peso_atual'] / height ** 2, np.nan)
+
+        # Por campo: permutação que ordena os valores e os valores ordenados (NaN ao final, fora das faixas)
+        self._order = {}
+        self._sorted = {}
+        for name, column in self.columns.items():
+            order = np.argsort(column, kind='stable')
+            valid = np.count_nonzero(~np.isnan(column))
+            self._order[name] = order[:valid]
+            self._sorted[name] = column[order[:valid]]
+
+        tokens, positions = [], []
+        for position, patient in enumerate(self.patients):
+            for token in set(tokenize(patient.get('nome') or '') + tokenize(patient.get('registro') or '')):
+                tokens.append(token)
+                positions.append(position)
+        order = np.argsort(np.array(tokens, dtype=str), kind='stable')
+        self._tokens = np.array(tokens, dtype=str)[order]
+        self._token_positions = np.array(positions, dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self.patients)
+
+    def bounds(self, field):
+        """Menor e maior valor do campo, ou None se nenhum paciente o tiver"""
+        values = self._sorted[field]
+        return (float(values[0]), float(values[-1])) if len(values) else None
+
+    def range_mask(self, field, low=None, high=None):
+        """Máscara dos pacientes com ``low <= campo <= high`` (limites opcionais)"""
+        values = self._sorted[field]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = len(values) if high is None else np.searchsorted(values, high, side='right')
+        mask = np.zeros(len(self.patients), dtype=bool)
+        mask[self._order[field][start:stop]] = True
+        return mask
+
+    def prefix_mask(self, text):
+        """Máscara dos pacientes em que cada palavra de ``text`` inicia algum token do nome ou registro"""
+        mask = np.ones(len(self.patients), dtype=bool)
+        for word in tokenize(text):
+            start = np.searchsorted(self._tokens, word, side='left')
+            stop = np.searchsorted(self._tokens, word + _PREFIX_END, side='left')
+            matches = np.zeros(len(self.patients), dtype=bool)
+            matches[self._token_positions[start:stop]] = True
+            mask &= matches
+        return mask
+
+    def query(self, text='', ranges=None):
+        """Posições dos pacientes que atendem à busca e a todas as faixas
+
+        ``ranges`` é ``{campo: (mínimo, máximo)}``, com None para um limite aberto.
+        """
+        mask = self.prefix_mask(text) if text and text.strip() else np.ones(len(self.patients), dtype=bool)
+        for field, (low, high) in (ranges or {}).items():
+            mask &= self.range_mask(field, low, high)
+        return np.flatnonzero(mask)
+
+    def select(self, positions):
+        """Pacientes nas posições dadas"""
+        return [self.patients[position] for position in positions]
+
+
+_index_lock = threading.Lock()
+_indexes = {}
+
+
+def patient_index(store):
+    """Índice da avaliação mais recente de cada paciente do banco, compartilhado pelo processo
+
+    O banco só recebe avaliações novas, então o índice é reconstruído quando
+    o número de avaliações muda.
+    """
+    count = store.count()
+    with _index_lock:
+        cached = _indexes.get(store.path)
+        if cached is not None and cached[0] == count:
+            return cached[1]
+    index = PatientIndex(*store.load_values())
+    with _index_lock:
+        _indexes[store.path] = (count, index)
+    return index
@@ -0,0 +1,462 @@
+"""Banco persistente de avaliações de pacientes (SQLite).
+
+Cada avaliação importada é gravada uma única vez (pelo hash do conteúdo do
+arquivo), indexada por ``Número de Registro`` e data da avaliação (NULL quando
+o arquivo não informa a data; a hora da importação fica em ``importado_em``),
+para que reabrir um paciente ou listar a coorte seja uma consulta e não um novo upload.
+O resumo agregado da coorte (``nutricional.summary``) é atualizado na mesma
+transação de cada importação.
+
+    python -m nutricional.store ingest pacientes/
+    python -m nutricional.store list
+    python -m nutricional.store summary --rebuild
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+from .cache import load_sections
+from .classification import default_engine
+from .patient import PatientData
+from .record import FIELDS, NUMERIC_FIELDS, SECTION_ALIASES, numeric_values
+from .summary import assessment_summary, summary_counters, summary_view
+
+DEFAULT_STORE_PATH = os.environ.get('NUTRICIONAL_STORE', 'pacientes.db')
+
+# Colunas gravadas por ``assessment_row``, na ordem da tupla
+ROW_COLUMNS = (
+    'content_hash', 'registro', 'data_avaliacao', 'nome', 'arquivo', 'importado_em', 'secoes', 'resumo', 'valores',
+)
+
+# Ordem dos campos na coluna ``valores``; se o esquema do registro mudar, a coluna é recalculada
+VALUES_LAYOUT = ','.join(NUMERIC_FIELDS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS avaliacoes (
+    content_hash TEXT PRIMARY KEY,
+    registro TEXT,
+    data_avaliacao TEXT,
+    nome TEXT,
+    arquivo TEXT,
+    importado_em TEXT NOT NULL,
+    secoes TEXT NOT NULL,
+    resumo TEXT,
+    valores TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_avaliacoes_registro_data ON avaliacoes (registro, data_avaliacao);
+CREATE INDEX IF NOT EXISTS idx_avaliacoes_data ON avaliacoes (data_avaliacao);
+CREATE INDEX IF NOT EXISTS idx_avaliacoes_nome ON avaliacoes (nome);
+CREATE TABLE IF NOT EXISTS resumo_coorte (
+    metrica TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    pacientes INTEGER NOT NULL,
+    soma REAL NOT NULL,
+    PRIMARY KEY (metrica, categoria)
+);
+CREATE TABLE IF NOT EXISTS configuracao (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+INSERT_ROW = (
+    f'INSERT OR IGNORE INTO avaliacoes ({", ".join(ROW_COLUMNS)}) '
+    f'VALUES ({", ".join("?" * len(ROW_COLUMNS))})'
+)
+
+# Soma (ou subtrai, com pacientes negativo) uma contribuição ao resumo
+COUNTER_UPSERT = """
+INSERT INTO resumo_coorte (metrica, categoria, pacientes, soma) VALUES (?, ?, ?, ?)
+ON CONFLICT (metrica, categoria) DO UPDATE SET
+    pacientes = pacientes + excluded.pacientes,
+    soma = soma + excluded.soma
+"""
+
+# Avaliação mais recente de cada paciente (sem registro, cada avaliação conta como um paciente)
+LATEST_QUERY = """
+SELECT * FROM (
+    SELECT *, ROW_NUMBER() OVER (
+        PARTITION BY COALESCE(registro, content_hash) ORDER BY data_avaliacao DESC, importado_em DESC
+    ) AS ordem
+    FROM avaliacoes
+) WHERE ordem = 1
+"""
+
+
+def json_field(name):
+    """Expressão SQL que lê um campo do registro do JSON de ``secoes`` (com os aliases)"""
+    field = FIELDS[name]
+    sections = [field.section] + [alias for alias, section in SECTION_ALIASES.items() if section == field.section]
+    paths = [
+        f"json_extract(secoes, '$.\"{section}\".\"{key}\"')"
+        for section in sections for key in (field.key,) + field.aliases
+    ]
+    return paths[0] if len(paths) == 1 else f'COALESCE({", ".join(paths)})'
+
+
+def recency(data_avaliacao, importado_em):
+    """Chave de ordenação das avaliações de um paciente; sem data, a avaliação é a mais antiga
+
+    Equivale ao ``ORDER BY data_avaliacao, importado_em`` do SQLite, em que NULL
+    vem antes de qualquer data.
+    """
+    return data_avaliacao is not None, data_avaliacao or '', importado_em
+
+
+# Campos de texto usados pelas métricas (faixas por sexo e idade) e pela exportação
+TEXT_FIELDS = ('sexo', 'data_nascimento', 'mna_diagnostico')
+
+
+def assessment_row(content_hash, sections, source_name=None):
+    """Monta a linha da tabela ``avaliacoes`` a partir das seções do CSV
+
+    Inclui a contribuição da avaliação para o resumo da coorte e os campos
+    numéricos em uma lista compacta (ordem de ``NUMERIC_FIELDS``), calculados
+    aqui (nos processos da importação em massa) e não no banco.
+    """
+    patient = PatientData(sections)
+    info = patient.get_patient_info()
+    registro = info.get('Número de Registro')
+    return (
+        content_hash,
+        None if registro is None else str(registro),
+        patient.get_assessment_date(),
+        info.get('Nome'),
+        source_name,
+        datetime.now().isoformat(timespec='seconds'),
+        json.dumps(sections, ensure_ascii=False),
+        json.dumps(assessment_summary(patient), ensure_ascii=False),
+        json.dumps(numeric_values(patient.record)),
+    )
+
+
+class PatientStore:
+    """Acesso ao banco de avaliações; abre uma conexão por operação"""
+
+    def __init__(self, path=None):
+        self.path = str(path or DEFAULT_STORE_PATH)
+        with closing(self._connect()) as conn:
+            # WAL (persistente no arquivo) permite leituras concorrentes de
+            # várias sessões durante as importações
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            config = {row['chave']: row['valor'] for row in conn.execute('SELECT chave, valor FROM configuracao')}
+        # As categorias dependem das faixas de classificação: regras novas
+        # (NUTRICIONAL_RULES) exigem recalcular o resumo uma vez
+        if config.get('regras') != default_engine().fingerprint:
+            self.rebuild_summary()
+        if config.get('campos') != VALUES_LAYOUT:
+            self.rebuild_values()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add_rows(self, rows):
+        """Grava várias avaliações em uma única transação; ignora as já existentes
+
+        O resumo da coorte é atualizado na mesma transação. Retorna o número
+        de avaliações novas.
+        """
+        added = 0
+        # Variação dos contadores do resumo, somada em memória e gravada uma vez por contador
+        deltas = {}
+        with closing(self._connect()) as conn, conn:
+            for row in rows:
+                cursor = conn.execute(INSERT_ROW, row)
+                if cursor.rowcount:
+                    added += 1
+                    self._update_summary(conn, row, deltas)
+            self._write_counters(conn, deltas)
+        return added
+
+    def _update_summary(self, conn, row, deltas):
+        """Soma a ``deltas`` uma avaliação recém-gravada, se ela for a mais recente do paciente"""
+        content_hash, registro, data_avaliacao, _, _, importado_em, _, resumo, _ = row
+        if registro is not None:
+            previous = conn.execute(
+                'SELECT data_avaliacao, importado_em, resumo FROM avaliacoes '
+                'WHERE registro = ? AND content_hash != ? '
+                'ORDER BY data_avaliacao DESC, importado_em DESC LIMIT 1',
+                [registro, content_hash],
+            ).fetchone()
+            if previous is not None:
+                if recency(previous['data_avaliacao'], previous['importado_em']) > recency(data_avaliacao, importado_em):
+                    # Avaliação antiga do paciente: não altera o resumo
+                    return
+                self._add_counters(deltas, previous['resumo'], -1)
+        self._add_counters(deltas, resumo, 1)
+
+    @staticmethod
+    def _add_counters(deltas, resumo, sign):
+        if resumo is None:
+            return
+        for metric, category, patients, total in summary_counters(json.loads(resumo)):
+            delta = deltas.setdefault((metric, category), [0, 0.0])
+            delta[0] += sign * patients
+            delta[1] += sign * total
+
+    @staticmethod
+    def _write_counters(conn, deltas):
+        conn.executemany(COUNTER_UPSERT, [
+            (metric, category, patients, total)
+            for (metric, category), (patients, total) in deltas.items()
+        ])
+
+    def rebuild_summary(self):
+        """Recalcula as contribuições e o resumo de toda a coorte (regras novas)"""
+        with closing(self._connect()) as conn, conn:
+            for row in conn.execute('SELECT content_hash, secoes FROM avaliacoes').fetchall():
+                summary = assessment_summary(PatientData(json.loads(row['secoes'])))
+                conn.execute(
+                    'UPDATE avaliacoes SET resumo = ? WHERE content_hash = ?',
+                    [json.dumps(summary, ensure_ascii=False), row['content_hash']],
+                )
+            conn.execute('DELETE FROM resumo_coorte')
+            deltas = {}
+            for row in conn.execute(f'SELECT resumo FROM ({LATEST_QUERY})').fetchall():
+                self._add_counters(deltas, row['resumo'], 1)
+            self._write_counters(conn, deltas)
+            conn.execute(
+                "INSERT OR REPLACE INTO configuracao VALUES ('regras', ?)", [default_engine().fingerprint]
+            )
+
+    def rebuild_values(self):
+        """Recalcula a coluna ``valores`` de todas as avaliações (esquema do registro novo)"""
+        with closing(self._connect()) as conn, conn:
+            for row in conn.execute('SELECT content_hash, secoes FROM avaliacoes').fetchall():
+                record = PatientData(json.loads(row['secoes'])).record
+                conn.execute(
+                    'UPDATE avaliacoes SET valores = ? WHERE content_hash = ?',
+                    [json.dumps(numeric_values(record)), row['content_hash']],
+                )
+            conn.execute("INSERT OR REPLACE INTO configuracao VALUES ('campos', ?)", [VALUES_LAYOUT])
+
+    def summary(self):
+        """Resumo da coorte (avaliação mais recente de cada paciente); ver ``summary_view``"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT metrica, categoria, pacientes, soma FROM resumo_coorte').fetchall()
+        return summary_view([tuple(row) for row in rows])
+
+    def add(self, content_hash, sections, source_name=None):
+        """Grava uma avaliação já processada"""
+        return self.add_rows([assessment_row(content_hash, sections, source_name)])
+
+    def ingest(self, sources):
+        """Importa arquivos (caminhos ou arquivos abertos) em uma única escrita
+
+        Exportações tabulares (XLSX, Parquet, Arrow) gravam uma avaliação por linha.
+        """
+        from .formats import patient_key, read_patients, source_format
+
+        rows = []
+        for source in sources:
+            name = Path(source).name if isinstance(source, (str, Path)) else getattr(source, 'name', None)
+            if source_format(name or '') != 'csv':
+                rows.extend(
+                    assessment_row(patient_key(sections), sections, name)
+                    for sections in read_patients(source, name)
+                )
+                continue
+            if isinstance(source, (str, Path)):
+                with open(source, 'rb') as file:
+                    key, sections = load_sections(file)
+                name = Path(source).name
+            else:
+                key, sections = load_sections(source)
+                name = getattr(source, 'name', None)
+            rows.append(assessment_row(key, sections, name))
+        return self.add_rows(rows)
+
+    def get_assessment(self, registro, content_hash=None):
+        """Retorna ``(content_hash, seções)`` da avaliação do paciente
+
+        Sem ``content_hash`` (ver ``list_assessments``), retorna a mais
+        recente; ``None`` se não houver. A data não identifica a avaliação:
+        o paciente pode ter duas na mesma data, ou nenhuma data informada.
+        Sem ``registro``, a avaliação é buscada apenas pelo ``content_hash``.
+        """
+        if registro is None:
+            if content_hash is None:
+                return None
+            query = 'SELECT content_hash, secoes FROM avaliacoes WHERE registro IS NULL'
+            params = []
+        else:
+            query = 'SELECT content_hash, secoes FROM avaliacoes WHERE registro = ?'
+            params = [str(registro)]
+        if content_hash is not None:
+            query += ' AND content_hash = ?'
+            params.append(content_hash)
+        query += ' ORDER BY data_avaliacao DESC, importado_em DESC LIMIT 1'
+        with closing(self._connect()) as conn:
+            row = conn.execute(query, params).fetchone()
+        if row is None:
+            return None
+        return row['content_hash'], json.loads(row['secoes'])
+
+    def list_assessments(self, registro):
+        """Lista as avaliações de um paciente (sem as seções), da mais recente à mais antiga"""
+        if registro is None:
+            # Avaliações sem registro não são agrupadas por paciente
+            return []
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                'SELECT content_hash, registro, data_avaliacao, nome, arquivo, importado_em '
+                'FROM avaliacoes WHERE registro = ? ORDER BY data_avaliacao DESC, importado_em DESC',
+                [str(registro)],
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_patients(self):
+        """Lista os pacientes com a data da avaliação mais recente de cada um"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT registro, nome, data_avaliacao, content_hash FROM ({LATEST_QUERY}) ORDER BY nome'
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_table(self, latest_only=True, registros=None):
+        """Carrega as avaliações na tabela colunar do modo coorte
+
+        Por padrão, apenas a avaliação mais recente de cada paciente. Com
+        ``latest_only=False``, as avaliações vêm na ordem de importação.
+        """
+        import pandas as pd
+
+        from .cohort import SOURCE_COLUMN, flatten_sections
+
+        where, params = '', []
+        if registros is not None:
+            params = [str(r) for r in registros]
+            where = f' WHERE registro IN ({",".join("?" * len(params))})'
+        if latest_only:
+            query = f'SELECT * FROM ({LATEST_QUERY}){where}'
+        else:
+            # Ordem de importação (rowid desempata no mesmo segundo): ``build_history``
+            # mantém a última avaliação de cada (registro, data)
+            query = f'SELECT * FROM avaliacoes{where} ORDER BY importado_em, rowid'
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        records = []
+        for row in rows:
+            record = flatten_sections(json.loads(row['secoes']))
+            record[SOURCE_COLUMN] = row['arquivo']
+            record['data_avaliacao'] = row['data_avaliacao']
+            record['importado_em'] = row['importado_em']
+            record['content_hash'] = row['content_hash']
+            records.append(record)
+        return pd.DataFrame.from_records(records)
+
+    def load_values(self, latest_only=True):
+        """Carrega os campos numéricos das avaliações sem o parse das seções
+
+        Retorna ``(avaliações, valores)``: dicionários com ``registro``, ``nome``,
+        ``data_avaliacao`` e ``content_hash`` e o array estruturado
+        (``RECORD_DTYPE``) com os campos numéricos, na mesma ordem.
+        """
+        from .record import values_to_array
+
+        query = LATEST_QUERY if latest_only else 'SELECT * FROM avaliacoes'
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f'SELECT registro, nome, data_avaliacao, content_hash, valores FROM ({query}) ORDER BY nome'
+            ).fetchall()
+        assessments = [
+            {'registro': row['registro'], 'nome': row['nome'],
+             'data_avaliacao': row['data_avaliacao'], 'content_hash': row['content_hash']}
+            for row in rows
+        ]
+        return assessments, values_to_array([json.loads(row['valores']) for row in rows])
+
+    def iter_tables(self, latest_only=True, chunk_size=10_000):
+        """Gera as avaliações em tabelas da coorte de até ``chunk_size`` linhas
+
+        As tabelas têm as colunas numéricas (da coluna ``valores``) e as de
+        identificação, sexo, nascimento e diagnóstico MNA (lidas pelo SQLite do
+        JSON), sem o parse das seções em Python; a memória fica limitada a um
+        lote por vez.
+        """
+        import pandas as pd
+
+        from .cohort import NAME, REGISTRY, SOURCE_COLUMN, field_column
+        from .record import values_to_array
+
+        query = LATEST_QUERY if latest_only else 'SELECT * FROM avaliacoes'
+        text_columns = ', '.join(f'{json_field(name)} AS {name}' for name in TEXT_FIELDS)
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                f'SELECT registro, nome, arquivo, data_avaliacao, content_hash, valores, {text_columns} '
+                f'FROM ({query})'
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                values = values_to_array([json.loads(row['valores']) for row in rows])
+                table = pd.DataFrame({field_column(name): values[name] for name in NUMERIC_FIELDS})
+                table[NAME] = [row['nome'] for row in rows]
+                table[REGISTRY] = [row['registro'] for row in rows]
+                for name in TEXT_FIELDS:
+                    table[field_column(name)] = [row[name] for row in rows]
+                table[SOURCE_COLUMN] = [row['arquivo'] for row in rows]
+                table['data_avaliacao'] = [row['data_avaliacao'] for row in rows]
+                table['content_hash'] = [row['content_hash'] for row in rows]
+                yield table
+
+    def load_history(self, registros=None):
+        """Séries temporais de todas as avaliações (ver ``nutricional.timeseries``)"""
+        from .timeseries import build_history
+
+        return build_history(self.load_table(latest_only=False, registros=registros))
+
+    def count(self):
+        """Número de avaliações armazenadas"""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM avaliacoes').fetchone()[0]
+
+
+@lru_cache(maxsize=1)
+def default_store():
+    """Banco de pacientes padrão (NUTRICIONAL_STORE), compartilhado pelo processo"""
+    return PatientStore()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de avaliações de pacientes")
+    parser.add_argument('--db', default=None, help=f"Arquivo do banco (padrão: {DEFAULT_STORE_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="Importa as exportações (CSV, XLSX, Parquet, Arrow e ZIPs) de um diretório (em paralelo)")
+    ingest.add_argument('directory')
+    commands.add_parser('list', help="Lista os pacientes armazenados")
+    summary = commands.add_parser('summary', help="Mostra o resumo agregado da coorte")
+    summary.add_argument('--rebuild', action='store_true', help="Recalcula o resumo de todas as avaliações")
+    args = parser.parse_args(argv)
+
+    store = PatientStore(args.db)
+    if args.command == 'ingest':
+        from .ingest import run_ingest
+
+        before = store.count()
+        results = run_ingest(args.directory, store=store)
+        files = len({result['arquivo'] for result in results})
+        print(f"{store.count() - before} avaliações novas de {files} arquivos ({store.count()} no banco)")
+    elif args.command == 'summary':
+        if args.rebuild:
+            store.rebuild_summary()
+        print(json.dumps(store.summary(), indent=2, ensure_ascii=False))
+    else:
+        for patient in store.list_patients():
+            print(f"{patient['registro']}\t{patient['data_avaliacao'] or '-'}\t{patient['nome']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
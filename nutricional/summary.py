@@ -0,0 +1,101 @@
+"""Resumo agregado da coorte armazenada, mantido de forma incremental.
+
+Cada avaliação guarda, ao ser importada, sua contribuição para o resumo
+(classe de IMC, faixa do MNA, exames alterados e atingimento das metas de
+calorias e proteínas). O banco mantém contadores por (métrica, categoria)
+somente da avaliação mais recente de cada paciente: uma importação soma a
+nova contribuição e subtrai a que ela substitui, sem recalcular a população.
+
+O consumo das metas é o mesmo da coorte e do dashboard: a média do registro
+alimentar por item, quando houver, ou o total do histórico alimentar. Depois
+de trocar a tabela de composição (NUTRICIONAL_FOOD_TABLE), recalcule o resumo
+com ``python -m nutricional.store summary --rebuild``.
+"""
+from bisect import bisect_right
+
+from .classification import LAB_LABELS, LAB_NORMAL, BandTable
+
+# Nutrientes cujo atingimento (consumo / meta) entra no resumo
+GOALS = ('calorias', 'proteinas')
+
+# Consumo atual / meta prescrita
+GOAL_BANDS = BandTable(
+    edges=[0.75, 1.0],
+    labels=['< 75%', '75-99%', '≥ 100%'],
+    colors=['#dc3545', '#fd7e14', '#28a745'],
+)
+
+# Limites como lista: a faixa de um único valor sai de uma busca binária,
+# sem o custo de montar arrays a cada avaliação importada
+_GOAL_EDGES = GOAL_BANDS.edges.tolist()
+
+ALTERED = 'alterado'
+NORMAL = 'normal'
+
+
+def assessment_summary(patient):
+    """Contribuição de uma avaliação (``PatientData``) para o resumo da coorte"""
+    metrics = patient.get_metrics()
+    record = patient.record
+    # Mesmo consumo de ``cohort.goal_metrics`` e do gráfico de metas
+    consumed = patient.get_goal_intake()
+    goals = {}
+    for goal in GOALS:
+        target, intake = getattr(record, f'meta_{goal}'), consumed[goal]
+        if isinstance(target, (int, float)) and isinstance(intake, (int, float)) and target > 0:
+            goals[goal] = intake / target
+    return {
+        'imc': metrics['imc_classificacao'],
+        'mna': metrics['mna_classificacao'],
+        'exames': {
+            name: result['classificacao'] != LAB_LABELS[LAB_NORMAL]
+            for name, result in metrics['exames'].items()
+        },
+        'metas': goals,
+    }
+
+
+def summary_counters(summary):
+    """Linhas ``(métrica, categoria, pacientes, soma)`` com que a avaliação contribui"""
+    rows = [('pacientes', 'total', 1, 0.0)]
+    if summary.get('imc'):
+        rows.append(('imc', summary['imc'], 1, 0.0))
+    if summary.get('mna'):
+        rows.append(('mna', summary['mna'], 1, 0.0))
+    for name, altered in summary.get('exames', {}).items():
+        rows.append((f'exame:{name}', ALTERED if altered else NORMAL, 1, 0.0))
+    for goal, ratio in summary.get('metas', {}).items():
+        # Mesmo critério de ``BandTable.codes`` (np.digitize): limite inferior inclusivo
+        label = GOAL_BANDS.labels[bisect_right(_GOAL_EDGES, ratio)]
+        rows.append((f'meta:{goal}', label, 1, ratio))
+    return rows
+
+
+def summary_view(rows):
+    """Organiza as linhas do resumo para exibição
+
+    Retorna ``pacientes``, as contagens por classe de ``imc`` e ``mna``, a
+    fração de alterados por exame em ``exames`` e, em ``metas``, as contagens
+    por faixa e a média do atingimento de cada meta.
+    """
+    view = {'pacientes': 0, 'imc': {}, 'mna': {}, 'exames': {}, 'metas': {}}
+    labs = {}
+    for metric, category, patients, total in rows:
+        if patients <= 0:
+            continue
+        if metric == 'pacientes':
+            view['pacientes'] = patients
+        elif metric in ('imc', 'mna'):
+            view[metric][category] = patients
+        elif metric.startswith('exame:'):
+            labs.setdefault(metric.removeprefix('exame:'), {})[category] = patients
+        elif metric.startswith('meta:'):
+            goal = view['metas'].setdefault(metric.removeprefix('meta:'), {'faixas': {}, 'pacientes': 0, 'soma': 0.0})
+            goal['faixas'][category] = patients
+            goal['pacientes'] += patients
+            goal['soma'] += total
+    for name, counts in labs.items():
+        view['exames'][name] = counts.get(ALTERED, 0) / sum(counts.values())
+    for goal in view['metas'].values():
+        goal['media'] = goal.pop('soma') / goal['pacientes']
+    return view
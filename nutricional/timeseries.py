@@ -0,0 +1,142 @@
+"""Evolução longitudinal: avaliações repetidas do mesmo paciente como séries temporais.
+
+As exportações com o mesmo ``Número de Registro`` são unidas em uma tabela
+ordenada pela data da avaliação. As estatísticas móveis são calculadas sobre
+as séries completas (pandas/NumPy) e só os pontos exibidos são reduzidos no
+servidor (LTTB), para que históricos longos não pesem no navegador.
+"""
+import numpy as np
+import pandas as pd
+
+from .classification import default_engine
+from .cohort import HEIGHT, LAB_SECTION, MNA_TOTAL, REGISTRY, WEIGHT, numeric_column
+
+DATE_COLUMN = 'data_avaliacao'
+IMPORTED_COLUMN = 'importado_em'
+
+# Séries acompanhadas: coluna -> (título, unidade)
+TREND_SERIES = {
+    'peso': ('Peso', 'kg'),
+    'imc': ('IMC', 'kg/m²'),
+    'albumina': ('Albumina', 'g/dL'),
+    'hemoglobina': ('Hemoglobina', 'g/dL'),
+    'mna_total': ('Score MNA', 'pontos'),
+}
+
+# Exames das séries, pelo nome nas regras de classificação
+TREND_LABS = {'albumina': 'Albumina', 'hemoglobina': 'Hemoglobina'}
+
+# Pontos enviados ao gráfico por série
+MAX_POINTS = 500
+
+
+def build_history(table, engine=None):
+    """Monta as séries a partir da tabela de avaliações (uma linha por avaliação)
+
+    ``table`` é a tabela colunar do modo coorte com a coluna ``data_avaliacao``
+    (por exemplo, ``PatientStore.load_table(latest_only=False)``). Retorna uma
+    linha por (registro, data), ordenada; avaliações do mesmo paciente na
+    mesma data ficam com a última importada (coluna ``importado_em``, quando
+    houver; senão, a última da tabela).
+    """
+    engine = engine or default_engine()
+    peso = numeric_column(table, WEIGHT)
+    altura = numeric_column(table, HEIGHT) / 100
+
+    history = pd.DataFrame(index=table.index)
+    history['registro'] = table[REGISTRY].astype(str) if REGISTRY in table else ''
+    dates = table[DATE_COLUMN] if DATE_COLUMN in table else pd.Series(None, index=table.index, dtype=object)
+    history[DATE_COLUMN] = pd.to_datetime(dates, errors='coerce')
+    history['peso'] = peso
+    history['imc'] = peso / altura ** 2
+    for column, lab in TREND_LABS.items():
+        field = engine.rules['labs'].get(lab, {}).get('field', f'{lab} (g/dL)')
+        history[column] = numeric_column(table, f'{LAB_SECTION}/{field}')
+    history['mna_total'] = numeric_column(table, MNA_TOTAL)
+
+    if IMPORTED_COLUMN in table:
+        # Ordenação estável: no mesmo instante de importação, vale a ordem da tabela
+        history = history.iloc[table[IMPORTED_COLUMN].reset_index(drop=True).sort_values(kind='stable').index]
+    history = history.dropna(subset=[DATE_COLUMN])
+    history = history.drop_duplicates(subset=['registro', DATE_COLUMN], keep='last')
+    return history.sort_values(['registro', DATE_COLUMN], kind='stable').reset_index(drop=True)
+
+
+def rolling_stats(history, column, window='90D'):
+    """Média, desvio padrão, mínimo e máximo móveis de uma série, por paciente
+
+    ``window`` é uma janela de tempo do pandas (``'90D'``, ``'365D'``) e é
+    aplicada sobre as datas reais das avaliações, que não são igualmente
+    espaçadas. Retorna as colunas ``registro``, ``data_avaliacao``, ``media``,
+    ``desvio``, ``minimo`` e ``maximo``.
+    """
+    series = history[['registro', DATE_COLUMN, column]].dropna()
+    stats = (
+        series.set_index(DATE_COLUMN)
+        .groupby('registro')[column]
+        .rolling(window)
+        .agg(['mean', 'std', 'min', 'max'])
+        .reset_index()
+    )
+    return stats.rename(columns={'mean': 'media', 'std': 'desvio', 'min': 'minimo', 'max': 'maximo'})
+
+
+def cohort_trend(history, column, freq='MS'):
+    """Mediana e intervalo interquartil da série na coorte, por período (mês, por padrão)"""
+    series = history[[DATE_COLUMN, column]].dropna().set_index(DATE_COLUMN)[column]
+    grouped = series.resample(freq)
+    trend = pd.DataFrame({
+        'mediana': grouped.median(),
+        'p25': grouped.quantile(0.25),
+        'p75': grouped.quantile(0.75),
+        'pacientes': grouped.count(),
+    })
+    return trend[trend['pacientes'] > 0].reset_index()
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: índices de até ``threshold`` pontos que preservam a forma
+
+    ``x`` deve ser crescente. O primeiro e o último ponto são sempre mantidos;
+    de cada balde intermediário fica o ponto que forma o maior triângulo com o
+    ponto escolhido no balde anterior e a média do balde seguinte.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 baldes entre o primeiro e o último ponto
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / counts
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / counts
+    # O "balde seguinte" do último balde é o último ponto
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - next_x[i]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(dates, values, max_points=MAX_POINTS):
+    """Reduz uma série (datas, valores) a até ``max_points`` pontos, ignorando ausentes"""
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values) & ~np.isnat(dates)
+    dates, values = dates[valid], values[valid]
+    index = lttb(dates.astype('datetime64[ns]').astype(np.int64), values, max_points)
+    return dates[index], values[index]
@@ -0,0 +1,177 @@
+"""Medição de tempo por etapa (parse, gráficos, serialização, PDF, renderização).
+
+Os tempos ficam em memória no processo do servidor, compartilhados por todas
+as sessões, e podem ser exportados no formato texto do Prometheus:
+
+    NUTRICIONAL_METRICS_FILE=metricas.prom   grava o arquivo a cada renderização
+    NUTRICIONAL_PROFILE=rerun.prof           captura um cProfile de uma única renderização
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Limites (segundos) dos buckets do histograma
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Amostras recentes por etapa usadas nos percentis
+WINDOW = 2048
+
+METRICS_FILE = os.environ.get('NUTRICIONAL_METRICS_FILE')
+PROFILE_FILE = os.environ.get('NUTRICIONAL_PROFILE')
+
+
+class StageTimer:
+    """Histograma de durações por etapa, seguro entre threads"""
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = buckets
+        self.window = window
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """Registra uma duração da etapa"""
+        with self._lock:
+            data = self._stages.get(stage)
+            if data is None:
+                data = self._stages[stage] = {
+                    'count': 0, 'sum': 0.0,
+                    'buckets': [0] * len(self.buckets),
+                    'recent': deque(maxlen=self.window),
+                }
+            data['count'] += 1
+            data['sum'] += seconds
+            data['recent'].append(seconds)
+            for i, limit in enumerate(self.buckets):
+                if seconds <= limit:
+                    data['buckets'][i] += 1
+
+    @contextmanager
+    def measure(self, stage):
+        """Mede o bloco ``with`` como uma execução da etapa"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage=None):
+        """Decorador que mede cada chamada da função (etapa = nome da função)"""
+        def decorator(func):
+            name = stage or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self):
+        """Resumo por etapa: execuções, total e percentis (ms) das amostras recentes"""
+        with self._lock:
+            stages = {stage: (data['count'], data['sum'], list(data['recent'])) for stage, data in self._stages.items()}
+        rows = []
+        for stage, (count, total, recent) in sorted(stages.items()):
+            p50, p95 = np.percentile(recent, [50, 95]) * 1000
+            rows.append({
+                'etapa': stage,
+                'execucoes': count,
+                'total_ms': total * 1000,
+                'p50_ms': p50,
+                'p95_ms': p95,
+                'max_ms': max(recent) * 1000,
+            })
+        return rows
+
+    def prometheus_text(self, prefix='nutricional'):
+        """Exporta as etapas no formato texto do Prometheus
+
+        Um histograma (``_duration_seconds``) com os buckets acumulados desde o
+        início do processo e um summary (``_seconds``) com p50/p95 das
+        amostras recentes.
+        """
+        with self._lock:
+            stages = {
+                stage: (data['count'], data['sum'], list(data['buckets']), list(data['recent']))
+                for stage, data in self._stages.items()
+            }
+        histogram = f'{prefix}_stage_duration_seconds'
+        quantiles = f'{prefix}_stage_seconds'
+        lines = [
+            f'# HELP {histogram} Duração de cada etapa do dashboard.',
+            f'# TYPE {histogram} histogram',
+        ]
+        for stage, (count, total, buckets, _) in sorted(stages.items()):
+            for limit, value in zip(self.buckets, buckets):
+                lines.append(f'{histogram}_bucket{{stage="{stage}",le="{limit}"}} {value}')
+            lines.append(f'{histogram}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{histogram}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{histogram}_count{{stage="{stage}"}} {count}')
+        lines += [
+            f'# HELP {quantiles} Percentis das {self.window} durações mais recentes de cada etapa.',
+            f'# TYPE {quantiles} summary',
+        ]
+        for stage, (count, total, _, recent) in sorted(stages.items()):
+            for q, value in zip(('0.5', '0.95'), np.percentile(recent, [50, 95])):
+                lines.append(f'{quantiles}{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{quantiles}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{quantiles}_count{{stage="{stage}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Grava o texto do Prometheus de forma atômica (para o node_exporter/textfile)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+
+
+stage_timer = StageTimer()
+timed = stage_timer.timed
+measure = stage_timer.measure
+
+_profile_lock = threading.Lock()
+_profile_done = False
+last_profile = None
+
+
+@contextmanager
+def profile_once(path=PROFILE_FILE):
+    """Captura um cProfile do bloco uma única vez por processo, se ``path`` for informado
+
+    O resultado vai para ``path`` (``python -m pstats``/snakeviz) e o resumo
+    das funções mais custosas fica em ``last_profile``.
+    """
+    global _profile_done, last_profile
+    with _profile_lock:
+        active = bool(path) and not _profile_done
+        _profile_done = _profile_done or active
+    if not active:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(25)
+        last_profile = output.getvalue()